@@ -1,63 +1,74 @@
 # Jack -> Machine code compiler. @DimitarYordanov17
 
-# To use: python3 compiler.py {-add_bootstrap_code} {-keep_xml} {-keep_vm} {-keep_asm}
+# To use: python3 compiler.py {-add_bootstrap_code} {-keep_xml} {-keep_vm} {-keep_asm} {-use_cache} {-jobs} {-keep_hack} {-binary} {-big_endian} {-profile} {-profile_memory} {-shared_calls} {-shared_comparisons} {-direct_memory} {-cache_stack_top} {-peephole} {-watch}
 # - compiles the current directory
+# To serve: python3 compiler.py --serve {socket=path, compiler.sock by default}
+# - compiles JSON requests, received on a Unix socket, keeping the caches warm between them (see lib/build_system/compileServer.py)
+# To batch: python3 compiler.py --batch {project directories} {summary=path, the standard output by default} {the parameters below, except watch}
+# - compiles every project directory, jobs of them at a time, and writes a JSON summary of their status, timing and output size (see lib/build_system/batchCompiler.py).
+#   The projects are untrusted (e.g. student submissions), so use_cache is no by default - their .jackcache directories are neither read nor written
 
 # Parameters:
 # add_bootstrap_code: add binary code which initializes the stack pointer to 256. (yes by default) WARNING: If this is not initialized manually and the argument is False, the program might not work
-# keep_xml: keep medium .xml files, which were used in the compilation proccess. (no by default)
+# keep_xml: write a .xml file with the parse tree of every .jack file. (no by default)
 # keep_vm: keep medium .vm files, which were used in the compilation proccess. (no by default)
 # keep_asm: if the path is a dir, a .asm file will be kept for every .jack file (no by default)
+# use_cache: reuse the artifacts of unchanged classes from the .jackcache directory, making repeated compilations incremental - with no, .jackcache is neither read nor written. (yes by default)
+# jobs: number of worker processes, used to translate the .jack files in parallel. (1 by default)
+# keep_hack: write the machine code as out.hack text - a line of 16 binary digits per instruction. (yes by default)
+# binary: write the machine code as out.bin - a packed image of 16 bit words, see lib/assembler/hackBinary.py. (no by default)
+# big_endian: use big endian byte order for out.bin. (no by default - little endian)
+# profile: write profile.json - the wall/CPU time of every compilation phase and the token, node, VM command and instruction counts of every file (see lib/build_system/compileProfiler.py). (no by default)
+# profile_memory: profile, adding the peak and retained memory (traced with tracemalloc - a lot slower) of every phase and file to profile.json. (no by default)
+# shared_calls: translate every call/return as a jump to a single shared routine, instead of inlining the frame save/restore - a much smaller program. (no by default)
+# shared_comparisons: translate eq/gt/lt as a call of a shared routine, or as a compare-and-jump, if they only decide a branch - fewer instructions and labels. (no by default)
+# direct_memory: translate push/pop with direct addressing, without passing every address through R13 - fewer and faster instructions. (no by default)
+# cache_stack_top: keep the stack top in the D register within straight-line code, instead of writing every value to the stack and reading it back. (no by default)
+# peephole: rewrite redundant VM command sequences (e.g. not not, goto to the next label, unreachable code) before the VM translation and print the hits of every rule, see lib/virtual_machine_translator/virtualMachinePeephole.py. (no by default)
+# watch: keep running, recompiling the directory whenever a source file changes - only the changed classes are translated again. (no by default)
 
 
 import sys
 import time
-import os
 
-from lib.front_end_translator.jackTranslator import JackTranslator
-from lib.virtual_machine_translator.virtualMachine import VirtualMachineTranslator
-from lib.assembler.assembler import Assembler
+from lib.build_system.jackCompiler import JackCompiler, CompileResult # CompileResult is re-exported together with compile_sources
+from lib.build_system.compileServer import CompileServer
+from lib.build_system.projectWatcher import ProjectWatcher
+from lib.build_system.batchCompiler import BatchCompiler
+from lib.virtual_machine_translator.virtualMachinePeephole import VirtualMachinePeephole
 
-def compile(add_bootstrap_code, keep_xml, keep_vm, keep_asm):
+# Library use (in memory, nothing is read or written): from compiler import compile_sources, CompileResult
+# compile_sources({file_name: Jack code}) -> CompileResult (vm_code, asm_code, words; see lib/build_system/jackCompiler.py)
+compile_sources = JackCompiler.compile_sources
+
+COMPILE_ARGUMENTS_NAMES = ["add_bootstrap_code", "keep_xml", "keep_vm", "keep_asm", "use_cache", "jobs", "keep_hack", "binary", "big_endian", "profile", "profile_memory", "shared_calls", "shared_comparisons", "direct_memory", "cache_stack_top", "peephole"]
+
+def compile(add_bootstrap_code, keep_xml, keep_vm, keep_asm, use_cache, jobs, keep_hack, binary, big_endian, profile, profile_memory, shared_calls, shared_comparisons, direct_memory, cache_stack_top, peephole, path='.', output_directory=None):
     """
-    Compile a file/dir. Keeping of medium files and addition of bootstrap code is optional.
+    Compile a file/dir. Keeping of medium files and addition of bootstrap code is optional (see JackCompiler.compile_directory).
     """
     starting_time = time.time()
-    file_names = []
-
-    for root, dirs, files in os.walk('.'):
-        for file_name in files:
-            if file_name.endswith(".jack"):
-                file_names.append(file_name.split('.')[0])
-        break 
-
-    # Jack -> VM (+ XML optionally)
-    JackTranslator.translate('.', generate_xml=keep_xml)
-
-    # VM -> Hack
-    VirtualMachineTranslator.translate('.', keep_asm, add_bootstrap_code)
+    peephole = VirtualMachinePeephole() if peephole else None # Collects the rule hits
 
-    if not keep_vm:
-        for file_name in file_names:
-            os.system(f"rm {file_name}.vm")
-
-    # Hack -> Machine code
-    Assembler.assemble("out.asm")
-    
-    if not keep_asm:
-        os.system("rm out.asm")
+    JackCompiler.compile_directory(path, output_directory, add_bootstrap_code=add_bootstrap_code, keep_xml=keep_xml, keep_vm=keep_vm, keep_asm=keep_asm,
+                                   use_cache=use_cache, jobs=jobs, keep_hack=keep_hack, binary=binary, big_endian=big_endian, profile=profile,
+                                   profile_memory=profile_memory, shared_calls=shared_calls, shared_comparisons=shared_comparisons,
+                                   direct_memory=direct_memory, cache_stack_top=cache_stack_top, peephole=peephole)
 
     print(f"The compilation finished under {time.time() - starting_time} seconds")
 
-def get_arguments():
+    if peephole is not None:
+        print(f"Peephole rule hits: {', '.join(f'{rule_name} {count}' for rule_name, count in peephole.hits.items())}")
+
+def get_arguments(arguments=None):
     """
-    Validate input arguments and prepare them for passing to compile()
+    Validate input arguments (the command line arguments by default) and prepare them for passing to compile()
     """
 
-    optional_arguments = dict(arg.split('=') for arg in sys.argv[1:])
+    optional_arguments = dict(arg.split('=') for arg in (sys.argv[1:] if arguments is None else arguments))
 
-    optional_arguments_names = ["add_bootstrap_code", "keep_xml", "keep_vm", "keep_asm"]
-    optional_arguments_values = [True, False, False, False]
+    optional_arguments_names = COMPILE_ARGUMENTS_NAMES + ["watch"]
+    optional_arguments_values = [True, False, False, False, True, 1, True, False, False, False, False, False, False, False, False, False, False]
     
     # Validate optional arguments
     for argument_name, argument_value in optional_arguments.items():
@@ -67,14 +78,83 @@ def get_arguments():
             print(f"Incorrect argument name {argument_name}")
             exit()
 
+        argument_index = optional_arguments_names.index(argument_name)
+
+        if type(optional_arguments_values[argument_index]) is int: # Numeric argument
+            if not argument_value.isdigit() or int(argument_value) < 1:
+                print(f"Incorrect value for argument {argument_name}")
+                exit()
+
+            optional_arguments_values[argument_index] = int(argument_value)
+            continue
+
         if "yes" not in argument_value and "no" not in argument_value:
             print(f"Incorrect value for argument {argument_name}")
             exit()
 
-        argument_index = optional_arguments_names.index(argument_name)
         optional_arguments_values[argument_index] = "yes" in argument_value
     
     return optional_arguments_values
 
-optional_arguments_values = get_arguments()
-compile(*optional_arguments_values)
+def serve():
+    """
+    Validate the server arguments and serve compilations until interrupted
+    """
+
+    server_arguments = dict(arg.split('=') for arg in sys.argv[1:] if arg != "--serve")
+
+    for argument_name in server_arguments:
+        if argument_name != "socket":
+            print(f"Incorrect argument name {argument_name}")
+            exit()
+
+    CompileServer(server_arguments.get("socket", "compiler.sock")).serve_forever()
+
+def batch():
+    """
+    Validate the batch arguments, compile every given project directory and write the summary. Exit with status 1 if any project failed
+    """
+
+    arguments = [arg for arg in sys.argv[1:] if arg != "--batch"]
+    project_paths = [arg for arg in arguments if '=' not in arg]
+    summary_file_name = None
+
+    for arg in arguments:
+        if arg.startswith("summary="):
+            summary_file_name = arg[len("summary="):]
+
+    compile_arguments = [arg for arg in arguments if '=' in arg and not arg.startswith("summary=")]
+
+    if not any(arg.startswith("use_cache=") for arg in compile_arguments): # The projects are untrusted, do not touch their caches unless asked to
+        compile_arguments.append("use_cache=no")
+
+    *compile_arguments_values, watch = get_arguments(compile_arguments)
+
+    if watch or not project_paths:
+        print("Incorrect arguments - give the project directories (watch is not supported)")
+        exit()
+
+    compile_options = dict(zip(COMPILE_ARGUMENTS_NAMES, compile_arguments_values))
+    jobs = compile_options.pop("jobs") # The projects are spread over the workers, every project is compiled by a single one
+
+    summary = BatchCompiler(jobs, compile_options).write_summary(project_paths, summary_file_name)
+
+    if not summary["ok"]:
+        exit(1)
+
+if __name__ == "__main__": # Worker processes (jobs > 1) may import this module
+    if "--serve" in sys.argv[1:]:
+        serve()
+    elif "--batch" in sys.argv[1:]:
+        batch()
+    else:
+        *compile_arguments_values, watch = get_arguments()
+
+        if watch:
+            ProjectWatcher('.', lambda: compile(*compile_arguments_values)).watch()
+        else:
+            try:
+                compile(*compile_arguments_values)
+            except ValueError as error: # E.g. a program, which exceeds the ROM
+                print(f"The compilation failed - {error}")
+                exit(1)
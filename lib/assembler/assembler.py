@@ -2,136 +2,216 @@
 # To run: python3 assembler.py {your .asm file}
 
 from lib.assembler.assemblerLibrary import AssemblerLibrary
+from lib.assembler.hackBinary import HackBinary
+from array import array
 import os
 import sys
 
+try: # Optional - used to format the machine code of large programs in a single batch
+  import numpy
+except ImportError:
+  numpy = None
+
 class Assembler:
   '''
-  Main assembler class, several functions available, note that the input file should first be cleaned, symbolically preprocessed and finally translated
+  Main assembler class, several functions available. The source is read once and assembled in memory - it is first parsed (cleaned, with the labels
+  resolved into a symbolic table) into a list of instructions, which is then translated in a single pass (variables being allocated on their first use).
+  An instance only holds its cache, every assembly keeps its state to itself, so an instance can be used by many threads at once
   '''
 
-  def assemble(path: str):
+  VARIABLES_START = 16
+  MAX_ADDRESS = 0x7FFF
+
+  BATCH_SIZE = 1 << 14 # The .hack text of programs with at least this many instructions is formatted with numpy (if it is installed)
+  BYTE_BITS = [f"{byte:08b}" for byte in range(256)]
+  BYTE_BITS_LINES = [f"{byte:08b}\n" for byte in range(256)]
+
+  def __init__(self, cache=None, profiler=None):
+    self.cache = cache # If a BuildCache is given, an unchanged program is not assembled again
+    self.profiler = profiler # If a CompileProfiler is given, the cleaning and the translation of the program are measured
+
+  def assemble(self, path: str, keep_hack=True, binary=False, byteorder="little", output_file_name=None):
     '''
-    Clean, apply symbolic preprocessing and translate a file
+    Assemble a file, returning its machine code words and writing them (next to the file, unless an output file name without extension is given) -
+    as a .hack text file (if keep_hack) and/or as a packed .bin image (if binary, see HackBinary)
     '''
-    
-    intermediate_file = "program_intermediate.asm"
-    os.system(f"cp {path} {intermediate_file}")
 
-    output_file = path.split('.')[0] + ".hack"
+    if output_file_name is None:
+      output_file_name = os.path.splitext(path)[0]
 
-    Assembler.clean(intermediate_file)
+    with open(path, "r") as input_file:
+      asm_code = input_file.read()
 
-    Assembler.symbolic_preprocessor(intermediate_file)
-    
-    Assembler.translate(intermediate_file, output_file)
+    words = Assembler.assemble_program(self, asm_code, os.path.basename(output_file_name))
+    Assembler.write(words, output_file_name, keep_hack, binary, byteorder)
 
-    os.system(f"rm {intermediate_file}")
+    return words
 
-  def symbolic_preprocessor(input_file):
+  def assemble_program(self, asm_code, program_name="out"):
     '''
-    1. Construct a jump and variables symbolic table
-    2. Translate via the symbolic table
+    Assemble the text of a program, returning its machine code words - array('H'). The program name identifies the program in the cache
     '''
-    symbolic_table = dict()
-    variables = 0
 
-    with open(input_file, "r+") as f:
-      lines = f.readlines()
-      
-      # Build jump symbolic table part
-      for index, line in enumerate(lines):
-        if line[0] == "(":
-          symbolic_table[line[1:-2]] = index - len(symbolic_table.keys())
+    cache = self.cache
+    words = None
 
-      # Build registers symbolic table part
-      for line in lines:
-        if "@" in line:
-          address = line[1:].strip()
+    if cache is not None:
+      asm_hash = cache.get_hash(asm_code)
+      words = cache.get_machine_code(program_name, asm_hash)
 
-          if (not address.isnumeric()) and (address not in symbolic_table.keys()):
-            address_request = AssemblerLibrary.get_register(address)
+    if words is None:
+      if self.profiler is None:
+        words = Assembler.assemble_words(asm_code)
+      else:
+        words = Assembler._profile_assemble_words(asm_code, self.profiler, program_name)
 
-            if address_request == "VARIABLE":
-              symbolic_table[address] = 16 + variables
-              variables += 1
-      
-      f.seek(0)
-        
-      for line in lines:
-        if line[0] == "@" and not line[1:].strip().isnumeric():
-          address = line[1:].strip()
+      if cache is not None:
+        cache.add_machine_code(program_name, asm_hash, words)
 
-          if address in symbolic_table.keys():
-            bytecode = symbolic_table[address]
-          else:
-            bytecode = AssemblerLibrary.get_register(address)
-          
-          f.write("@" + str(bytecode) + "\n")
+    if self.profiler is not None:
+      self.profiler.count(program_name, "hack_instructions", len(words))
 
-        elif line[0] != "(":
-          f.write(line)
+    return words
+
+  def write(words, output_file_name, keep_hack=True, binary=False, byteorder="little"):
+    '''
+    Write machine code words as {output_file_name}.hack (if keep_hack) and/or {output_file_name}.bin (if binary)
+    '''
 
-      f.truncate()
+    if keep_hack:
+      with open(output_file_name + ".hack", "w") as of:
+        of.write(Assembler.get_hack_code(words))
 
-  def clean(input_file):
+    if binary:
+      HackBinary.write(output_file_name + ".bin", words, byteorder)
+
+  def assemble_code(asm_code):
+    '''
+    Assemble the text of a program, returning the text of its machine code
+    '''
+
+    return Assembler.get_hack_code(Assembler.assemble_words(asm_code))
+
+  def assemble_words(asm_code):
     '''
-    Remove unnecesary whitespaces and comments
+    Assemble the text of a program, returning its machine code words - array('H')
     '''
 
-    with open(input_file, "r+") as f:
-      lines = f.readlines()
-      f.seek(0)
-      for line in lines:
-        spaceless_line = line.replace(" ", "").lstrip()
+    instructions, symbolic_table = Assembler.parse(asm_code.splitlines())
+
+    return Assembler.translate(instructions, symbolic_table)
+
+  def _profile_assemble_words(asm_code, profiler, program_name):
+    '''
+    Assemble the text of a program like assemble_words, measuring its cleaning and its translation
+    '''
+
+    with profiler.measure("clean", program_name):
+      instructions, symbolic_table = Assembler.parse(asm_code.splitlines())
+
+    with profiler.measure("assembly", program_name):
+      words = Assembler.translate(instructions, symbolic_table)
+
+    profiler.count(program_name, "labels", len(symbolic_table))
+
+    return words
+
+  def get_hack_code(words):
+    '''
+    Return the .hack text view of machine code words - a line of 16 binary digits for every word
+    '''
+
+    if numpy is not None and len(words) >= Assembler.BATCH_SIZE:
+      # Unpack the bits of every (big endian) word into a row of 16 ASCII digits, followed by a newline
+      bits = numpy.unpackbits(numpy.asarray(words, dtype='>u2').view(numpy.uint8)).reshape(-1, 16)
+      characters = numpy.empty((len(bits), 17), dtype=numpy.uint8)
+      characters[:, :16] = bits + ord('0')
+      characters[:, 16] = ord('\n')
+
+      return characters.tobytes().decode('ascii')
 
-        if line != '\n':
-            if "/" in spaceless_line:
-              divided_line = spaceless_line.split("/")
-              if divided_line[0] and divided_line[0] != "*":
-                f.write(divided_line[0] + '\n')
+    high_bits, low_bits = Assembler.BYTE_BITS, Assembler.BYTE_BITS_LINES
 
-            elif "*" not in spaceless_line:
-              f.write(spaceless_line)
-              
-      f.truncate()
+    return "".join([high_bits[word >> 8] + low_bits[word & 0xFF] for word in words])
 
-  def translate(input_file, output_file):
+  def parse(lines):
     '''
-    Translate a prepared file
+    Remove unnecesary whitespaces and comments, return the list of the remaining instructions and the jump symbolic table - {label: instruction index}
     '''
 
-    with open(input_file, "r+") as f, open(output_file, 'w') as of:
-      lines = f.readlines()
-      
-      of.seek(0)
-      
-      for line in lines:
-        line = line.strip()
-         
-        instruction_type = '0' if "@" in line else '1'
+    instructions = []
+    symbolic_table = {}
 
-        if instruction_type == '0':
-          address = line[1:]
-          binary_code = f"{int(address):015b}"
-          machine_code = instruction_type + binary_code
+    for line in lines:
+      line = line.replace(" ", "")
+
+      if "/" in line:
+        line = line.split("/")[0]
+
+        if line.strip() == "*":
+          continue
+
+      elif "*" in line:
+        continue
+
+      line = line.strip()
+
+      if not line:
+        continue
+
+      if line[0] == "(":
+        symbolic_table[line[1:-1]] = len(instructions)
+      else:
+        instructions.append(line)
+
+    return instructions, symbolic_table
+
+  def translate(instructions, symbolic_table):
+    '''
+    Translate parsed instructions, returning their machine code words - array('H'). Symbols, which are neither labels nor registers, are allocated as variables
+    '''
+
+    symbolic_table = dict(symbolic_table)
+    registers = AssemblerLibrary.REGISTERS
+    next_variable = Assembler.VARIABLES_START
+
+    words = array('H')
+    c_instructions = AssemblerLibrary.C_INSTRUCTION_WORDS
+
+    for instruction in instructions:
+      if instruction[0] == "@":
+        address = instruction[1:]
+
+        if address.isnumeric():
+          address = int(address)
+
+          if address > Assembler.MAX_ADDRESS:
+            raise ValueError(f"Constant {instruction} does not fit in an A-instruction (max {Assembler.MAX_ADDRESS})")
+
+        elif address in symbolic_table:
+          address = symbolic_table[address]
+
+          if address > Assembler.MAX_ADDRESS: # Variables never get past the check below, so this is a label
+            raise ValueError(f"The program exceeds the 32K ROM ({len(instructions)} instructions, label {instruction[1:]} at {address})")
+
+        elif address in registers:
+          address = registers[address]
 
         else:
-          if "=" in line:
-            splitted_instruction = line.split('=')
-            destination = splitted_instruction[0]
-            computation = splitted_instruction[1]
-            jump = ""
-          else:
-            splitted_instruction = line.split(';')
-            computation = splitted_instruction[0]
-            jump = splitted_instruction[1]
-            destination = ""
-
-          machine_code_destination = AssemblerLibrary.get_destination(destination)
-          machine_code_jump = AssemblerLibrary.get_jump(jump)
-          machine_code_computation = AssemblerLibrary.get_computation(computation)
-
-          machine_code = instruction_type + "11" + machine_code_computation + machine_code_destination + machine_code_jump 
-        
-        of.write(machine_code + '\n')
+          if next_variable > Assembler.MAX_ADDRESS:
+            raise ValueError(f"Variable {instruction[1:]} does not fit in the RAM (max address {Assembler.MAX_ADDRESS})")
+
+          symbolic_table[address] = address = next_variable
+          next_variable += 1
+
+        words.append(address)
+
+      else:
+        word = c_instructions.get(instruction)
+
+        if word is None:
+          word = AssemblerLibrary.get_c_instruction_word(instruction)
+
+        words.append(word)
+
+    return words
@@ -5,102 +5,130 @@ class AssemblerLibrary:
   Main class to map the Hack syntax to internal machine language bytecode
   '''
 
+  JUMPS = {
+    ''   : '000',
+    'JGT': '001',
+    'JEQ': '010',
+    'JGE': '011',
+    'JLT': '100',
+    'JNE': '101',
+    'JLE': '110',
+    'JMP': '111',
+  }
+
+  DESTINATIONS = {
+    ''   : '000',
+    'M'  : '001',
+    'D'  : '010',
+    'MD' : '011',
+    'A'  : '100',
+    'AM' : '101',
+    'AD' : '110',
+    'AMD': '111',
+  }
+
+  COMPUTATIONS = {
+    '0'  : '0101010',
+    '1'  : '0111111',
+    '-1' : '0111010',
+    'D'  : '0001100',
+    'A'  : '0110000',
+    '!D' : '0001101',
+    '!A' : '0110001',
+    '-D' : '0001111',
+    '-A' : '0110011',
+    'D+1': '0011111',
+    'A+1': '0110111',
+    'D-1': '0001110',
+    'A-1': '0110010',
+    'D+A': '0000010',
+    'D-A': '0010011',
+    'A-D': '0000111',
+    'D&A': '0000000',
+    'D|A': '0010101',
+    'M'  : '1110000',
+    '!M' : '1110001',
+    '-M' : '1110011',
+    'M+1': '1110111',
+    'M-1': '1110010',
+    'D+M': '1000010',
+    'D-M': '1010011',
+    'M-D': '1000111',
+    'D&M': '1000000',
+    'D|M': '1010101',
+  }
+
+  # Handle the commutative forms, e.g. 'M+D'=='D+M', '1+A'=='A+1'
+  COMPUTATIONS.update({computation[::-1]: bytecode for computation, bytecode in list(COMPUTATIONS.items()) if len(computation) == 3 and computation[1] in '+&|'})
+
+  REGISTERS = {
+    'SP'    : 0,
+    'LCL'   : 1,
+    'ARG'   : 2,
+    'THIS'  : 3,
+    'THAT'  : 4,
+    'SCREEN': 0x4000,
+    'KBD'   : 0x6000,
+  }
+
+  REGISTERS.update({'R' + str(n): n for n in range(0, 16)})
+
+  C_INSTRUCTIONS = {} # Cache of the full bytecode of every already encoded C-instruction, e.g. {'D=M': '1111110000010000'}
+  C_INSTRUCTION_WORDS = {} # The same cache, holding the bytecode as an int, e.g. {'D=M': 0b1111110000010000}
+
   def get_jump(jump: str):
     '''
     Return bytecode of jump commands
     '''
-    bytecode =  {
-      ''   : '000',
-      'JGT': '001',
-      'JEQ': '010',
-      'JGE': '011',
-      'JLT': '100',
-      'JNE': '101',
-      'JLE': '110',
-      'JMP': '111',
-    }
-
-    return bytecode[jump]
+
+    return AssemblerLibrary.JUMPS[jump]
 
   def get_destination(destination: str):
     '''
     Return bytecode of destination commands
     '''
-    bytecode = {
-      ''   : '000',
-      'M'  : '001',
-      'D'  : '010',
-      'MD' : '011',
-      'A'  : '100',
-      'AM' : '101',
-      'AD' : '110',
-      'AMD': '111',
-    }
-
-    return bytecode[destination]
+
+    return AssemblerLibrary.DESTINATIONS[destination]
 
   def get_computation(computation):
     '''
     Return bytecode of computation commands
     '''
-    bytecode = {
-      '0'  : '0101010',
-      '1'  : '0111111',
-      '-1' : '0111010',
-      'D'  : '0001100',
-      'A'  : '0110000',
-      '!D' : '0001101',
-      '!A' : '0110001',
-      '-D' : '0001111',
-      '-A' : '0110011',
-      'D+1': '0011111',
-      'A+1': '0110111',
-      'D-1': '0001110',
-      'A-1': '0110010',
-      'D+A': '0000010',
-      'D-A': '0010011',
-      'A-D': '0000111',
-      'D&A': '0000000',
-      'D|A': '0010101',
-      'M'  : '1110000',
-      '!M' : '1110001',
-      '-M' : '1110011',
-      'M+1': '1110111',
-      'M-1': '1110010',
-      'D+M': '1000010',
-      'D-M': '1010011',
-      'M-D': '1000111',
-      'D&M': '1000000',
-      'D|M': '1010101',
-    }
-    
-    try: # Handle differences, e.g. 'M+D'=='D+M'
-        return bytecode[computation]
-    except:
-        return bytecode[computation[::-1]]
+
+    return AssemblerLibrary.COMPUTATIONS[computation]
+
+  def get_c_instruction(instruction):
+    '''
+    Return the full bytecode of a (cleaned) C-instruction - dest=comp;jump, dest and jump being optional
+    '''
+
+    bytecode = AssemblerLibrary.C_INSTRUCTIONS.get(instruction)
+
+    if bytecode is None:
+      destination, _, computation = instruction.rpartition('=')
+      computation, _, jump = computation.partition(';')
+
+      bytecode = '111' + AssemblerLibrary.COMPUTATIONS[computation] + AssemblerLibrary.DESTINATIONS[destination] + AssemblerLibrary.JUMPS[jump]
+      AssemblerLibrary.C_INSTRUCTIONS[instruction] = bytecode
+
+    return bytecode
+
+  def get_c_instruction_word(instruction):
+    '''
+    Return the full bytecode of a (cleaned) C-instruction as an int
+    '''
+
+    word = AssemblerLibrary.C_INSTRUCTION_WORDS.get(instruction)
+
+    if word is None:
+      word = int(AssemblerLibrary.get_c_instruction(instruction), 2)
+      AssemblerLibrary.C_INSTRUCTION_WORDS[instruction] = word
+
+    return word
 
   def get_register(register):
     '''
     Return bytecode of built-in registers
     '''
-    bytecode_mnemonics = {
-      'SP'    : 0,
-      'LCL'   : 1,
-      'ARG'   : 2,
-      'THIS'  : 3,
-      'THAT'  : 4,
-      'SCREEN': 0x4000,
-      'KBD'   : 0x6000,
-    }
-    
-    if register in ['R' + str(n) for n in range(0, 16)]:
-      if len(register) == 2:
-        return int(register[1])
-      
-      return int(register[1] + register[2])
-
-    elif register in bytecode_mnemonics.keys():
-      return bytecode_mnemonics[register]
-
-    else:
-      return "VARIABLE"
+
+    return AssemblerLibrary.REGISTERS.get(register, "VARIABLE")
@@ -0,0 +1,71 @@
+# Packed binary images of Hack machine code - 2 bytes per instruction instead of a 17 characters .hack line. @DimitarYordanov17
+
+from array import array
+import mmap
+import sys
+
+class HackBinary:
+  '''
+  Main class to write and load binary ROM images - every instruction is stored as an unsigned 16 bit word, in little (default) or big endian byte order
+  '''
+
+  BYTE_ORDERS = ("little", "big")
+
+  def to_bytes(words, byteorder="little"):
+    '''
+    Return the packed image of machine code words (any iterable of ints)
+    '''
+
+    HackBinary._validate_byteorder(byteorder)
+
+    image = words if isinstance(words, array) and words.typecode == 'H' else array('H', words)
+
+    if byteorder != sys.byteorder:
+      image = array('H', image)
+      image.byteswap()
+
+    return image.tobytes()
+
+  def write(output_file_name, words, byteorder="little"):
+    '''
+    Write machine code words as a packed image
+    '''
+
+    with open(output_file_name, 'wb') as output_file:
+      output_file.write(HackBinary.to_bytes(words, byteorder))
+
+  def load(input_file_name, byteorder="little"):
+    '''
+    Load a packed image, returning its words. The file is memory mapped - if the byte order is the native one, the returned memoryview reads
+    straight from the mapping, without copying or parsing it
+    '''
+
+    HackBinary._validate_byteorder(byteorder)
+
+    with open(input_file_name, 'rb') as input_file:
+      if not input_file.seek(0, 2): # mmap can not map empty files
+        return array('H')
+
+      image = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(image) % 2:
+      image.close()
+      raise ValueError(f"{input_file_name} is not a Hack binary image (odd size)")
+
+    if byteorder == sys.byteorder:
+      return memoryview(image).cast('H')
+
+    words = array('H')
+    words.frombytes(image)
+    image.close()
+    words.byteswap()
+
+    return words
+
+  def _validate_byteorder(byteorder):
+    '''
+    Raise ValueError for an unknown byte order
+    '''
+
+    if byteorder not in HackBinary.BYTE_ORDERS:
+      raise ValueError(f"Unknown byte order {byteorder}, expected one of {', '.join(HackBinary.BYTE_ORDERS)}")
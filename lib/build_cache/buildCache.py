@@ -0,0 +1,236 @@
+# An on-disk artifact cache, making repeated compilations of a mostly unchanged project incremental. @DimitarYordanov17
+
+from lib.build_cache.cacheFiles import CacheFiles
+from array import array
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+
+class BuildCache:
+    """
+    Main class, storing the artifacts of every compilation stage in a cache directory (.jackcache by default):
+
+    classes/{class_name}.json:
+    {"version", "source_hash", "dependencies": {"class_name.subroutine_name": return_type}, "vm"} - the VM code of a class
+
+    assembly/{file_name}.json:
+    {"version", "source_hash", "asm"} - the translated assembly of a .vm file (source_hash being the hash of the VM code)
+
+    machine_code/{file_name}.words:
+    a {"version", "source_hash"} JSON line, followed by the raw machine code words (unsigned 16 bit, in the native byte order) of an assembled .asm file
+
+    The cache directory lives in the compiled project, so its files are untrusted - they are only ever parsed as JSON and raw words (never unpickled),
+    and an entry of unexpected shape is a cache miss. The abstract syntax trees are not stored, a cached class is parsed again only if its tree is needed.
+
+    Every entry is bound to the compiler version (a hash of the compiler sources), so changing the compiler invalidates the whole cache.
+    A class entry is reused only if its source is unchanged and every global scope signature it was translated against is unchanged as well,
+    so editing the body of a subroutine rebuilds only its class, while changing a signature rebuilds the classes, which call it.
+    """
+
+    CLASSES = "classes"
+    ASSEMBLY = "assembly"
+    MACHINE_CODE = "machine_code"
+
+    ENTRY_EXTENSIONS = {CLASSES: ".json", ASSEMBLY: ".json", MACHINE_CODE: ".words"}
+    ENTRY_FIELDS = {CLASSES: {"dependencies": dict, "vm": str}, ASSEMBLY: {"asm": str}, MACHINE_CODE: {}} # The JSON fields of an entry and their types
+
+    KEEPS_SYNTAX_TREES = False # Whether get_class returns the abstract syntax tree ("ast") of a class
+
+    _compiler_version = None
+
+    def __init__(self, cache_directory):
+        self.cache_directory = cache_directory
+
+    def get_compiler_version():
+        """
+        Return the hash of every compiler source file, computed once per process
+        """
+
+        if BuildCache._compiler_version is None:
+            library_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            version_hash = hashlib.sha1()
+            source_files = []
+
+            for root, dirs, files in os.walk(library_directory):
+                for file_name in files:
+                    if file_name.endswith(".py") or file_name.endswith(".txt"):
+                        source_files.append(os.path.relpath(os.path.join(root, file_name), library_directory))
+
+            for source_file_name in sorted(source_files):
+                with open(os.path.join(library_directory, source_file_name), 'rb') as source_file:
+                    version_hash.update(source_file_name.encode())
+                    version_hash.update(source_file.read())
+
+            BuildCache._compiler_version = version_hash.hexdigest()
+
+        return BuildCache._compiler_version
+
+    def get_hash(self, text):
+        """
+        Return the hash, which identifies the content of a file
+        """
+
+        return CacheFiles.get_content_hash(text)
+
+    def get_class(self, class_name, source_hash, global_scope_subroutines):
+        """
+        Return the cached entry of a class, None if the class or a signature it depends on has changed
+        """
+
+        entry = self._read(BuildCache.CLASSES, class_name, source_hash)
+
+        if entry is None:
+            return None
+
+        for full_subroutine_name, return_type in entry["dependencies"].items():
+            callee_class_name, _, callee_subroutine_name = full_subroutine_name.partition(".")
+            signature = global_scope_subroutines.get(callee_class_name, {}).get(callee_subroutine_name)
+
+            if signature is None or signature[1] != return_type:
+                return None
+
+        return entry
+
+    def add_class(self, class_name, source_hash, dependencies, class_node, vm_code):
+        """
+        Cache the VM code of a class (and its abstract syntax tree, if the cache keeps them)
+        """
+
+        entry = {"dependencies": dependencies, "vm": vm_code}
+
+        if self.KEEPS_SYNTAX_TREES:
+            entry["ast"] = class_node
+
+        self._write(BuildCache.CLASSES, class_name, source_hash, entry)
+
+    def get_assembly(self, file_name, vm_hash):
+        """
+        Return the cached assembly text of a .vm file, None if it is not cached
+        """
+
+        entry = self._read(BuildCache.ASSEMBLY, file_name, vm_hash)
+
+        return None if entry is None else entry["asm"]
+
+    def add_assembly(self, file_name, vm_hash, asm_code):
+        """
+        Cache the assembly text of a .vm file
+        """
+
+        self._write(BuildCache.ASSEMBLY, file_name, vm_hash, {"asm": asm_code})
+
+    def get_machine_code(self, file_name, asm_hash):
+        """
+        Return the cached machine code words of a .asm file, None if they are not cached
+        """
+
+        entry = self._read(BuildCache.MACHINE_CODE, file_name, asm_hash)
+
+        return None if entry is None else entry["words"]
+
+    def add_machine_code(self, file_name, asm_hash, words):
+        """
+        Cache the machine code words of a .asm file
+        """
+
+        self._write(BuildCache.MACHINE_CODE, file_name, asm_hash, {"words": words})
+
+    def _read(self, kind, name, source_hash):
+        """
+        Return a cache entry, None if it is missing, unreadable, malformed or outdated
+        """
+
+        try:
+            with open(os.path.join(self.cache_directory, kind, name + BuildCache.ENTRY_EXTENSIONS[kind]), 'rb') as entry_file:
+                header, _, words_bytes = entry_file.read().partition(b"\n")
+
+            entry = json.loads(header)
+
+            if not isinstance(entry, dict):
+                return None
+
+            if kind == BuildCache.MACHINE_CODE:
+                words = array('H')
+                words.frombytes(words_bytes)
+                entry["words"] = words
+
+        except (OSError, ValueError, TypeError): # A missing or corrupted entry is just a cache miss (json.JSONDecodeError is a ValueError)
+            return None
+
+        if entry.get("version") != BuildCache.get_compiler_version() or entry.get("source_hash") != source_hash:
+            return None
+
+        for field_name, field_type in BuildCache.ENTRY_FIELDS[kind].items():
+            if not isinstance(entry.get(field_name), field_type):
+                return None
+
+        return entry
+
+    def _write(self, kind, name, source_hash, entry):
+        """
+        Atomically write a cache entry (an unwritable cache directory only disables the cache)
+        """
+
+        header = dict(entry, version=BuildCache.get_compiler_version(), source_hash=source_hash)
+        words = header.pop("words", None)
+
+        entry_bytes = json.dumps(header).encode() + b"\n" # A single line - JSON escapes the newlines in strings
+
+        if words is not None:
+            entry_bytes += words.tobytes()
+
+        CacheFiles.write_atomically(os.path.join(self.cache_directory, kind, name + BuildCache.ENTRY_EXTENSIONS[kind]), entry_bytes)
+
+
+class MemoryBuildCache(BuildCache):
+    """
+    A BuildCache kept in the memory of a long-lived process (e.g. the compile server). The entries are keyed by their source hash as well, so the classes
+    of many projects (e.g. many Main classes) are cached at once - the least recently used entries are evicted. Entries are stored pickled (only ever
+    by the process itself), so every compilation gets its own copy of a cached abstract syntax tree or machine code
+    """
+
+    MAX_ENTRIES = 1 << 14
+    KEEPS_SYNTAX_TREES = True
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        BuildCache.__init__(self, None)
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _read(self, kind, name, source_hash):
+        """
+        Return a cache entry, None if it is missing
+        """
+
+        with self.lock:
+            entry = self.entries.get((kind, name, source_hash))
+
+            if entry is None:
+                return None
+
+            self.entries.move_to_end((kind, name, source_hash))
+
+        return pickle.loads(entry)
+
+    def _write(self, kind, name, source_hash, entry):
+        """
+        Store a cache entry, evicting the least recently used ones
+        """
+
+        try:
+            entry = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError):
+            return
+
+        with self.lock:
+            self.entries[(kind, name, source_hash)] = entry
+            self.entries.move_to_end((kind, name, source_hash))
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
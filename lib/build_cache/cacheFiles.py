@@ -0,0 +1,48 @@
+# Content hashing and atomic writing of the files, which are kept between compilations. @DimitarYordanov17
+
+import hashlib
+import os
+import tempfile
+
+
+class CacheFiles:
+    """
+    Main class, shared by everything, which keeps files between compilations (the BuildCache, the JackSignatureIndex) or compares file contents
+    between them (the ProjectWatcher), so all of them hash and write the same way
+    """
+
+    def get_content_hash(content):
+        """
+        Return the hash, which identifies the content of a file (text or bytes)
+        """
+
+        return hashlib.sha1(content.encode() if isinstance(content, str) else content).hexdigest()
+
+    def write_atomically(file_path, content):
+        """
+        Write a file (text or bytes) through a unique temporary file, which then replaces it, so concurrent compilations (threads or processes) never write into
+        the same file and a reader never sees a partially written one. Return whether the file was written - an unwritable directory is not an error
+        """
+
+        directory = os.path.dirname(file_path)
+        temporary_file_path = None
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+
+            file_descriptor, temporary_file_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+            with os.fdopen(file_descriptor, 'w' if isinstance(content, str) else 'wb') as temporary_file:
+                temporary_file.write(content)
+
+            os.replace(temporary_file_path, file_path)
+        except OSError:
+            if temporary_file_path is not None:
+                try:
+                    os.remove(temporary_file_path)
+                except OSError:
+                    pass
+
+            return False
+
+        return True
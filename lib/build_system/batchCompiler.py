@@ -0,0 +1,91 @@
+# Compilation of many independent project directories over a pool of worker processes, summarized in JSON. @DimitarYordanov17
+
+from lib.build_system.jackCompiler import JackCompiler
+from lib.virtual_machine_translator.virtualMachinePeephole import VirtualMachinePeephole
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import time
+
+
+class BatchCompiler:
+    """
+    Main class, compiling many project directories (every one of them the same way as compiler.py compiles the current directory) in a single launch.
+    The projects are spread over a pool of worker processes, one project per task, so a failing project is reported in the summary and does not stop the others.
+    The projects are untrusted (e.g. student submissions), so they are compiled without a BuildCache, unless use_cache is given in the compile options.
+
+    The summary is a JSON object:
+    {"ok": true if every project compiled, "succeeded": count, "failed": count, "time": seconds of the whole batch,
+     "projects": [{"project": path, "ok": true, "time": seconds, "instructions": machine code words, "output_size": {file_name: bytes},
+                   "peephole_hits": {rule name: count} (only with the peephole option)} or
+                  {"project": path, "ok": false, "time": seconds, "error": "SyntaxError: ..."}, ...]}
+    (the projects in the given order)
+    """
+
+    def __init__(self, jobs=1, compile_options=None):
+        self.jobs = jobs # Number of worker processes, every project is compiled by a single process
+        self.compile_options = dict({"use_cache": False}, **(compile_options or {})) # Keyword arguments of JackCompiler.compile_directory (without a cache by default)
+
+    def compile_projects(self, project_paths):
+        """
+        Compile every project directory, returning the summary dictionary
+        """
+
+        starting_time = time.time()
+
+        if self.jobs > 1 and len(project_paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(project_paths))) as executor:
+                projects = list(executor.map(BatchCompiler.compile_project, project_paths, [self.compile_options] * len(project_paths)))
+        else:
+            projects = [BatchCompiler.compile_project(project_path, self.compile_options) for project_path in project_paths]
+
+        failed = sum(not project["ok"] for project in projects)
+
+        return {"ok": not failed, "succeeded": len(projects) - failed, "failed": failed, "time": time.time() - starting_time, "projects": projects}
+
+    def write_summary(self, project_paths, summary_file_name=None):
+        """
+        Compile every project directory, writing the summary to the given file (to the standard output if no file name is given) and returning it
+        """
+
+        summary = BatchCompiler.compile_projects(self, project_paths)
+        summary_text = json.dumps(summary, indent=2)
+
+        if summary_file_name is None:
+            print(summary_text)
+        else:
+            with open(summary_file_name, 'w') as summary_file:
+                summary_file.write(summary_text + "\n")
+
+        return summary
+
+    def compile_project(project_path, compile_options):
+        """
+        Compile a single project directory (in a worker process), returning its summary record. Errors in the project are recorded instead of raised
+        """
+
+        starting_time = time.time()
+        peephole = VirtualMachinePeephole() if compile_options.get("peephole") else None # Collects the rule hits
+
+        try:
+            if not os.path.isdir(project_path):
+                raise NotADirectoryError(f"{project_path} is not a project directory")
+
+            words = JackCompiler.compile_directory(project_path, **dict(compile_options, jobs=1, peephole=peephole))
+
+        except Exception as error:
+            return {"project": project_path, "ok": False, "time": time.time() - starting_time, "error": f"{type(error).__name__}: {error}"}
+
+        output_directory = compile_options.get("output_directory") or project_path
+        output_size = {}
+
+        for output_file_name, written in (("out.hack", compile_options.get("keep_hack", True)), ("out.bin", compile_options.get("binary", False))):
+            if written:
+                output_size[output_file_name] = os.path.getsize(os.path.join(output_directory, output_file_name))
+
+        project = {"project": project_path, "ok": True, "time": time.time() - starting_time, "instructions": len(words), "output_size": output_size}
+
+        if peephole is not None:
+            project["peephole_hits"] = peephole.hits
+
+        return project
@@ -0,0 +1,159 @@
+# Per-phase timing and counters of a compilation, reported as JSON. @DimitarYordanov17
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+import tracemalloc
+
+
+class CompileProfiler:
+    """
+    Main class, collecting the wall time, the CPU time (of the measuring thread) and the item counts of every phase of a compilation, in total and per file.
+    The stages take an optional profiler - without one nothing is measured. Phases do not nest, a measured block belongs to exactly one of PHASES:
+
+    clean: removing comments and whitespaces of the assembly and resolving its labels (Jack and VM code are cleaned while they are tokenized/translated)
+    tokenize, parse: Jack code -> tokens -> abstract syntax tree
+    signatures: collecting the subroutine signatures of the classes (including the signature index)
+    codegen: abstract syntax tree -> VM code
+    peephole: VM code -> optimized VM code (see VirtualMachinePeephole, its rule hits are counted as peephole_{rule name})
+    vm_translation: VM code -> assembly
+    assembly: assembly -> machine code words
+    io: reading the sources and writing the output files (formatting the written text included)
+
+    The report is a JSON object:
+    {"time": {"wall": seconds, "cpu": seconds}, "phases": {phase: {"wall": seconds, "cpu": seconds, "calls": count}},
+     "files": {file_name: {"phases": {phase: {"wall": seconds, "cpu": seconds}}, "counts": {"tokens": count, "ast_nodes": count, "vm_commands": count, ...}}}}
+
+    If trace_memory, the allocations are traced with tracemalloc (which slows the compilation down severalfold) and every phase (of the whole compilation and
+    of every file) gets "peak" - the highest amount of memory allocated above the start of a measured block, the maximum of all its blocks, and "retained" -
+    the memory still allocated at the end of its blocks, summed, in bytes. The report gets "memory": {"peak": bytes, "retained": bytes} of the whole compilation.
+    tracemalloc is process wide, so the memory of blocks measured by several threads at once is mixed up
+    """
+
+    PHASES = ("clean", "tokenize", "parse", "signatures", "codegen", "peephole", "vm_translation", "assembly", "io")
+
+    def __init__(self, trace_memory=False):
+        self.phases = {phase: {"wall": 0.0, "cpu": 0.0, "calls": 0} for phase in CompileProfiler.PHASES}
+        self.files = {}
+        self.lock = threading.Lock() # The stages may be used by many threads at once
+
+        self.trace_memory = trace_memory
+        self.started_tracing = trace_memory and not tracemalloc.is_tracing() # Tracing started by someone else is not stopped
+        self.peak_memory = 0
+        self.memory = None # The memory of the whole compilation, kept when the tracing stops
+
+        if self.started_tracing:
+            tracemalloc.start()
+
+        self.starting_memory = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+
+        self.starting_wall_time = time.perf_counter()
+        self.starting_cpu_time = time.process_time()
+
+    @contextmanager
+    def measure(self, phase, file_name=None):
+        """
+        Measure the enclosed block as (a part of) a phase of the whole compilation, and of a file, if its name is given
+        """
+
+        if self.trace_memory:
+            with self.lock:
+                starting_memory, peak_memory = tracemalloc.get_traced_memory()
+                self.peak_memory = max(self.peak_memory, peak_memory) # The peak is reset for every block
+                tracemalloc.reset_peak()
+
+        starting_wall_time, starting_cpu_time = time.perf_counter(), time.thread_time()
+
+        try:
+            yield
+        finally:
+            wall_time, cpu_time = time.perf_counter() - starting_wall_time, time.thread_time() - starting_cpu_time
+
+            with self.lock:
+                phase_totals = self.phases[phase]
+                phase_totals["wall"] += wall_time
+                phase_totals["cpu"] += cpu_time
+                phase_totals["calls"] += 1
+
+                file_phase = None
+
+                if file_name is not None:
+                    file_phase = CompileProfiler._get_file(self, file_name)["phases"].setdefault(phase, {"wall": 0.0, "cpu": 0.0})
+                    file_phase["wall"] += wall_time
+                    file_phase["cpu"] += cpu_time
+
+                if self.trace_memory:
+                    memory, peak_memory = tracemalloc.get_traced_memory()
+                    self.peak_memory = max(self.peak_memory, peak_memory)
+
+                    for totals in (phase_totals, file_phase):
+                        if totals is not None:
+                            totals["peak"] = max(totals.get("peak", 0), peak_memory - starting_memory)
+                            totals["retained"] = totals.get("retained", 0) + memory - starting_memory
+
+    def count(self, file_name, counter, value):
+        """
+        Add to a counter of a file (e.g. "tokens")
+        """
+
+        with self.lock:
+            file_counts = CompileProfiler._get_file(self, file_name)["counts"]
+            file_counts[counter] = file_counts.get(counter, 0) + value
+
+    def get_report(self):
+        """
+        Return the report dictionary (see the class description)
+        """
+
+        with self.lock:
+            report = {"time": {"wall": time.perf_counter() - self.starting_wall_time, "cpu": time.process_time() - self.starting_cpu_time},
+                      "phases": {phase: dict(phase_totals) for phase, phase_totals in self.phases.items()},
+                      "files": {file_name: {"phases": {phase: dict(file_phase) for phase, file_phase in file_profile["phases"].items()}, "counts": dict(file_profile["counts"])}
+                                for file_name, file_profile in self.files.items()}}
+
+            if self.trace_memory and self.memory is None:
+                memory, peak_memory = tracemalloc.get_traced_memory()
+                self.peak_memory = max(self.peak_memory, peak_memory)
+
+                report["memory"] = {"peak": self.peak_memory - self.starting_memory, "retained": memory - self.starting_memory}
+
+            elif self.trace_memory:
+                report["memory"] = dict(self.memory)
+
+            return report
+
+    def write_report(self, output_file_name):
+        """
+        Write the report as a JSON file, returning it
+        """
+
+        report = CompileProfiler.get_report(self)
+
+        with open(output_file_name, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+            output_file.write("\n")
+
+        return report
+
+    def stop(self):
+        """
+        Stop tracing the allocations, if the profiler started it - the report does not change afterwards, except for its time
+        """
+
+        if self.started_tracing:
+            self.memory = CompileProfiler.get_report(self)["memory"]
+            self.started_tracing = False
+            tracemalloc.stop()
+
+    def _get_file(self, file_name):
+        """
+        Return the (new, if needed) profile of a file - the lock has to be held
+        """
+
+        file_profile = self.files.get(file_name)
+
+        if file_profile is None:
+            file_profile = self.files[file_name] = {"phases": {}, "counts": {}}
+
+        return file_profile
@@ -0,0 +1,132 @@
+# A long-lived compile server, answering JSON compile requests over a Unix socket with warm caches. @DimitarYordanov17
+
+from lib.build_system.jackCompiler import JackCompiler
+from lib.build_cache.buildCache import MemoryBuildCache
+from lib.front_end_translator.jackStandardLibrary import JackStandardLibrary
+import base64
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+
+class CompileServer:
+    """
+    Main class, serving compilations on a Unix socket. The parsed standard library, the assembler tables and a MemoryBuildCache with the artifacts
+    of every compiled file stay loaded between the requests, so a request only pays for the classes, which are new or changed.
+
+    The protocol is JSON lines - every request is a single line:
+    {"jack_sources": {file_name: Jack code}, "vm_sources": {file_name: VM code}, "add_bootstrap_code": true, "outputs": ["vm", "asm", "hack", "binary"], "byteorder": "little",
+     "optimizations": ["shared_calls"], "peephole": false}
+    (only jack_sources is required, outputs defaults to ["hack"]) and it is answered with a single line:
+    {"ok": true, "time": seconds, "vm": {file_name: VM code}, "asm": assembly, "hack": machine code text, "binary": base64 of the packed image,
+     "peephole_hits": {rule name: count}}
+    (only the requested outputs, peephole_hits only if "peephole" is true), or {"ok": false, "error": "SyntaxError: ..."}. A connection may send any number of requests
+    """
+
+    OUTPUTS = ("vm", "asm", "hack", "binary")
+
+    def __init__(self, socket_path, cache=None):
+        self.socket_path = socket_path
+        self.cache = MemoryBuildCache() if cache is None else cache
+
+    def serve_forever(self):
+        """
+        Listen on the socket until interrupted, handling every connection in its own thread
+        """
+
+        JackStandardLibrary.load() # Warm up before the first request
+
+        if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode): # Left by a previous server
+            os.remove(self.socket_path)
+
+        compile_server = self
+
+        class CompileRequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+
+                    response = CompileServer.handle_request(compile_server, line)
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, CompileRequestHandler)
+        server.daemon_threads = True
+
+        if threading.current_thread() is threading.main_thread(): # Stop cleanly on kill as well (shutdown() blocks until serve_forever() returns)
+            signal.signal(signal.SIGTERM, lambda signal_number, frame: threading.Thread(target=server.shutdown).start())
+
+        print(f"Serving compilations on {self.socket_path}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.remove(self.socket_path)
+
+    def handle_request(self, request):
+        """
+        Compile a single request (a JSON text or an already decoded dictionary), returning the response dictionary
+        """
+
+        starting_time = time.time()
+
+        try:
+            if not isinstance(request, dict):
+                request = json.loads(request)
+
+            outputs = request.get("outputs", ["hack"])
+
+            for output in outputs:
+                if output not in CompileServer.OUTPUTS:
+                    raise ValueError(f"Unknown output {output}, expected some of {', '.join(CompileServer.OUTPUTS)}")
+
+            compile_result = JackCompiler.compile_sources(request["jack_sources"], request.get("vm_sources"), request.get("add_bootstrap_code", True), self.cache,
+                                                          optimizations=request.get("optimizations", ()),
+                                                          peephole=request.get("peephole", False))
+
+            response = {"ok": True}
+
+            if "vm" in outputs:
+                response["vm"] = compile_result.vm_code
+
+            if "asm" in outputs:
+                response["asm"] = compile_result.asm_code
+
+            if "hack" in outputs:
+                response["hack"] = compile_result.get_hack_code()
+
+            if "binary" in outputs:
+                response["binary"] = base64.b64encode(compile_result.get_binary(request.get("byteorder", "little"))).decode("ascii")
+
+            if compile_result.peephole_hits is not None:
+                response["peephole_hits"] = compile_result.peephole_hits
+
+        except Exception as error: # Any error is reported to the client, the server keeps running
+            response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+
+        response["time"] = time.time() - starting_time
+
+        return response
+
+    def request(socket_path, request):
+        """
+        Send a single request to a running server, returning its response (a client helper)
+        """
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+
+            with client.makefile("rwb") as connection:
+                connection.write(json.dumps(request).encode() + b"\n")
+                connection.flush()
+
+                return json.loads(connection.readline())
@@ -0,0 +1,153 @@
+# A library interface to the whole Jack -> Machine code compilation, working entirely in memory. @DimitarYordanov17
+
+from lib.front_end_translator.jackTranslator import JackTranslator
+from lib.virtual_machine_translator.virtualMachine import VirtualMachineTranslator
+from lib.virtual_machine_translator.virtualMachinePeephole import VirtualMachinePeephole
+from lib.assembler.assembler import Assembler
+from lib.assembler.hackBinary import HackBinary
+from lib.build_cache.buildCache import BuildCache
+from lib.build_system.compileProfiler import CompileProfiler
+from contextlib import nullcontext
+import io
+import os
+
+
+class CompileResult:
+    """
+    The in-memory products of a compilation:
+
+    vm_code: {file_name: VM code} - every translated .jack file (file names without extension), followed by the given .vm files
+    asm_code: the assembly of the whole program (the content of out.asm)
+    words: the machine code - array('H') of 16 bit words
+    syntax_trees: {file_name: abstract syntax tree} - only if they were requested
+    peephole_hits: {rule name: count} - the hits of every VirtualMachinePeephole rule, only if the peephole optimizer was used
+    """
+
+    __slots__ = ("vm_code", "asm_code", "words", "syntax_trees", "peephole_hits")
+
+    def __init__(self, vm_code, asm_code, words, syntax_trees=None, peephole_hits=None):
+        self.vm_code = vm_code
+        self.asm_code = asm_code
+        self.words = words
+        self.syntax_trees = syntax_trees
+        self.peephole_hits = peephole_hits
+
+    def get_hack_code(self):
+        """
+        Return the machine code as .hack text
+        """
+
+        return Assembler.get_hack_code(self.words)
+
+    def get_binary(self, byteorder="little"):
+        """
+        Return the machine code as a packed binary image (see HackBinary)
+        """
+
+        return HackBinary.to_bytes(self.words, byteorder)
+
+
+class JackCompiler:
+    """
+    Main class, compiling the texts of a project, without touching the file system (unless a BuildCache is given), or a project directory.
+    Compilations share no state, so they can run in many threads at once
+    """
+
+    def compile_directory(path='.', output_directory=None, add_bootstrap_code=True, keep_xml=False, keep_vm=False, keep_asm=False, use_cache=True, jobs=1,
+                          keep_hack=True, binary=False, big_endian=False, profile=False, profile_memory=False, shared_calls=False,
+                          shared_comparisons=False, direct_memory=False, cache_stack_top=False, peephole=False):
+        """
+        Compile a directory, writing out.hack (if keep_hack) and/or out.bin (if binary) and the requested medium files (see compiler.py) into the output directory
+        (the compiled directory by default), returning the machine code words. Medium products are passed between the stages in memory and only the requested
+        files are written, so compilations of different directories (or of one directory into different output directories) can run at the same time.
+        If profile, the phases of the compilation are measured and reported in profile.json (see CompileProfiler), profile_memory adds their memory (and implies profile).
+        The optimizations (shared_calls, shared_comparisons, direct_memory, cache_stack_top) are the ones of VirtualMachineTranslator, if peephole, the VM code
+        of the .jack files is optimized by a VirtualMachinePeephole (the written .vm files included) - a given VirtualMachinePeephole collects the rule hits
+        """
+
+        cache = BuildCache(os.path.join(path, JackTranslator.CACHE_DIRECTORY)) if use_cache else None
+        peephole = peephole if isinstance(peephole, VirtualMachinePeephole) else VirtualMachinePeephole() if peephole else None
+        profile = profile or profile_memory
+        profiler = CompileProfiler(trace_memory=profile_memory) if profile else None
+        optimizations = {"shared_calls": shared_calls, "shared_comparisons": shared_comparisons, "direct_memory": direct_memory, "cache_stack_top": cache_stack_top}
+        optimizations = [optimization for optimization, enabled in optimizations.items() if enabled]
+
+        if output_directory is None:
+            output_directory = path
+
+        try:
+            words = JackCompiler._compile_directory(path, output_directory, add_bootstrap_code, keep_xml, keep_vm, keep_asm, cache, jobs, keep_hack, binary, big_endian,
+                                                    profiler, optimizations, peephole)
+        finally:
+            if profile:
+                profiler.stop()
+
+        if profile:
+            profiler.write_report(os.path.join(output_directory, "profile.json"))
+
+        return words
+
+    def _compile_directory(path, output_directory, add_bootstrap_code, keep_xml, keep_vm, keep_asm, cache, jobs, keep_hack, binary, big_endian, profiler, optimizations, peephole):
+        """
+        Compile a directory (see compile_directory), measuring it with the profiler, if one is given
+        """
+
+        measure = profiler.measure if profiler is not None else lambda phase, file_name=None: nullcontext()
+
+        # Jack -> VM (+ XML optionally)
+        vm_code = JackTranslator(cache, jobs, use_signature_index=cache is not None, profiler=profiler, peephole=peephole).translate(path, generate_xml=keep_xml, write_vm=keep_vm, output_directory=output_directory)
+
+        # .vm files, which are not translated from a .jack file (e.g. an implementation of the operating system), are part of the program as well
+        for root, dirs, files in os.walk(path):
+            for file_name in files:
+                if file_name.endswith(".vm") and file_name[:-len(".vm")] not in vm_code:
+                    with measure("io", file_name[:-len(".vm")]), open(os.path.join(root, file_name), 'r') as vm_file:
+                        vm_code[file_name[:-len(".vm")]] = vm_file.read()
+            break
+
+        # VM -> Hack
+        asm_file = io.StringIO()
+        VirtualMachineTranslator(add_bootstrap_code, cache, profiler, optimizations).translate_program(vm_code, asm_file, keep_asm, output_directory)
+        asm_code = asm_file.getvalue()
+
+        if keep_asm:
+            with measure("io", "out"), open(os.path.join(output_directory, "out.asm"), 'w') as output_file:
+                output_file.write(asm_code)
+
+        # Hack -> Machine code
+        words = Assembler(cache, profiler).assemble_program(asm_code, "out")
+
+        with measure("io", "out"):
+            Assembler.write(words, os.path.join(output_directory, "out"), keep_hack, binary, "big" if big_endian else "little")
+
+        return words
+
+    def compile_sources(jack_sources, vm_sources=None, add_bootstrap_code=True, cache=None, jobs=1, keep_syntax_trees=False, optimizations=(), peephole=False):
+        """
+        Compile {file_name: Jack code} (file names with or without the .jack extension), returning a CompileResult.
+        vm_sources - {file_name: VM code} are compiled together with the Jack code (e.g. an implementation of the operating system).
+        A BuildCache and jobs > 1 work the same way as in compiler.py, optimizations are names of VirtualMachineTranslator.OPTIMIZATIONS.
+        If peephole, the VM code of the Jack code is optimized by a VirtualMachinePeephole, whose rule hits are returned as well
+        """
+
+        peephole = VirtualMachinePeephole() if peephole else None
+        translated_files = JackTranslator(cache, jobs, use_signature_index=False, peephole=peephole).translate_sources(jack_sources, keep_syntax_tree=keep_syntax_trees)
+
+        vm_code = {}
+        syntax_trees = {} if keep_syntax_trees else None
+
+        for jack_full_file_name, (class_node, file_vm_code) in translated_files.items():
+            file_name = jack_full_file_name[:-len(".jack")] if jack_full_file_name.endswith(".jack") else jack_full_file_name
+            vm_code[file_name] = file_vm_code
+
+            if keep_syntax_trees:
+                syntax_trees[file_name] = class_node
+
+        for file_name, file_vm_code in (vm_sources or {}).items():
+            vm_code[file_name[:-len(".vm")] if file_name.endswith(".vm") else file_name] = file_vm_code
+
+        asm_file = io.StringIO()
+        VirtualMachineTranslator(add_bootstrap_code, cache, optimizations=optimizations).translate_program(vm_code, asm_file)
+        asm_code = asm_file.getvalue()
+
+        return CompileResult(vm_code, asm_code, Assembler(cache).assemble_program(asm_code), syntax_trees, None if peephole is None else peephole.hits)
@@ -0,0 +1,97 @@
+# A polling watcher, recompiling a project whenever one of its source files changes. @DimitarYordanov17
+
+from lib.build_cache.cacheFiles import CacheFiles
+import os
+import time
+
+
+class ProjectWatcher:
+    """
+    Main class, polling a project directory (no inotify or other platform specific dependencies) and recompiling it whenever a source file changes.
+    A file is considered changed only if its content changed - modification times and sizes are only used to skip hashing untouched files.
+    Only the changed classes (and the ones calling a changed signature) are translated again, as long as the compilation uses a BuildCache
+    """
+
+    POLL_INTERVAL = 0.5 # Seconds
+
+    def __init__(self, path, compile_project, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.compile_project = compile_project # Called without arguments to compile the project
+        self.poll_interval = poll_interval
+
+        self.file_states = {} # {file_name: (modification time, size, content hash)}
+
+    def watch(self):
+        """
+        Compile the project, then recompile it on every change, until interrupted
+        """
+
+        print(f"Watching {os.path.abspath(self.path)} for changes (Ctrl+C to stop)")
+
+        ProjectWatcher.get_changed_files(self)
+        ProjectWatcher._compile(self)
+
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+
+                changed_files = ProjectWatcher.get_changed_files(self)
+
+                if changed_files:
+                    print(f"Changed: {', '.join(sorted(changed_files))}")
+                    ProjectWatcher._compile(self)
+
+        except KeyboardInterrupt:
+            pass
+
+    def get_changed_files(self):
+        """
+        Return the names of the source files (.jack files and .vm files, which are not translated from a .jack file), which were added, removed or
+        whose content changed since the last call
+        """
+
+        with os.scandir(self.path) as entries:
+            source_files = [entry for entry in entries if entry.name.endswith((".jack", ".vm")) and entry.is_file()]
+
+        jack_file_names = {entry.name[:-len(".jack")] for entry in source_files if entry.name.endswith(".jack")}
+
+        file_states = {}
+        changed_files = set()
+
+        for entry in source_files:
+            if entry.name.endswith(".vm") and entry.name[:-len(".vm")] in jack_file_names: # Written by the compilation itself
+                continue
+
+            try:
+                file_stat = entry.stat()
+                previous_state = self.file_states.get(entry.name)
+
+                if previous_state is not None and previous_state[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+                    file_states[entry.name] = previous_state
+                    continue
+
+                with open(entry.path, 'rb') as source_file:
+                    content_hash = CacheFiles.get_content_hash(source_file.read())
+
+            except OSError: # Removed in the meantime
+                continue
+
+            file_states[entry.name] = (file_stat.st_mtime_ns, file_stat.st_size, content_hash)
+
+            if previous_state is None or previous_state[2] != content_hash:
+                changed_files.add(entry.name)
+
+        changed_files.update(set(self.file_states) - set(file_states))
+        self.file_states = file_states
+
+        return changed_files
+
+    def _compile(self):
+        """
+        Compile the project, reporting (instead of raising) errors in the sources
+        """
+
+        try:
+            self.compile_project()
+        except Exception as error:
+            print(f"The compilation failed - {type(error).__name__}: {error}")
@@ -0,0 +1,83 @@
+# A persistent, project-wide index of the subroutine signatures of every parsed .jack file. @DimitarYordanov17
+
+from lib.build_cache.buildCache import BuildCache
+from lib.build_cache.cacheFiles import CacheFiles
+import json
+import os
+
+
+class JackSignatureIndex:
+    """
+    Stores the subroutines of every class, in the format of the formatted standard library, keyed by the hash of the file they were parsed from:
+    {content_hash: {class_name: {subroutine_name: [subroutine_kind, subroutine_type, subroutine_parameter_list]}}}
+
+    The index is kept in {cache_directory}/signatures.json, so an unchanged file never has to be parsed only to learn its signatures.
+    Saving keeps only the entries used since the index was loaded, so stale hashes do not pile up.
+
+    The index lives in the compiled project, so it is untrusted like the BuildCache: it is bound to the compiler version (changing the parser discards it),
+    an index of unexpected shape is an empty index and an entry of unexpected shape (or of another class than the expected one) is never returned
+    """
+
+    FILE_NAME = "signatures.json"
+
+    def __init__(self, cache_directory):
+        self.file_path = os.path.join(cache_directory, JackSignatureIndex.FILE_NAME)
+        self.entries = {}
+        self.used_entries = {}
+
+        try:
+            with open(self.file_path, 'r') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError): # A missing or corrupted index is just empty
+            return
+
+        if isinstance(index, dict) and index.get("version") == BuildCache.get_compiler_version() and isinstance(index.get("files"), dict):
+            self.entries = index["files"]
+
+    def get(self, content_hash, class_name=None):
+        """
+        Return the file subroutines stored for a content hash (only if they are the subroutines of the given class, if a class name is given),
+        None if the content was never indexed or its entry is malformed
+        """
+
+        file_subroutines = self.entries.get(content_hash)
+
+        if not JackSignatureIndex._is_file_subroutines(file_subroutines) or (class_name is not None and list(file_subroutines) != [class_name]):
+            return None
+
+        self.used_entries[content_hash] = file_subroutines
+
+        return file_subroutines
+
+    def add(self, content_hash, file_subroutines):
+        """
+        Index the file subroutines of a content hash
+        """
+
+        self.entries[content_hash] = file_subroutines
+        self.used_entries[content_hash] = file_subroutines
+
+    def save(self):
+        """
+        Write the used entries to the index file (an unwritable cache directory only disables the index)
+        """
+
+        CacheFiles.write_atomically(self.file_path, json.dumps({"version": BuildCache.get_compiler_version(), "files": self.used_entries}))
+
+    def _is_file_subroutines(file_subroutines):
+        """
+        Return whether an entry has the shape of file subroutines - {class_name: {subroutine_name: [subroutine_kind, subroutine_type, subroutine_parameter_list]}}
+        """
+
+        if not isinstance(file_subroutines, dict):
+            return False
+
+        for class_name, class_subroutines in file_subroutines.items():
+            if not isinstance(class_subroutines, dict):
+                return False
+
+            for subroutine_name, signature in class_subroutines.items():
+                if not (isinstance(signature, list) and len(signature) == 3 and all(isinstance(part, str) for part in signature)):
+                    return False
+
+        return True
@@ -1,5 +1,8 @@
 # A library file containing Jack Standard Library function declarations and methods used to work with them. @DimitarYordanov17
 
+from lib.build_cache.cacheFiles import CacheFiles
+import json
+import os
 import re
 
 class JackStandardLibrary:
@@ -14,13 +17,60 @@ class JackStandardLibrary:
 
     Full subroutine names:
     [class_name1.subroutine_name1, class_name1.subroutine_name2..., class_name2.subroutine_name1, class_name2.subroutine_name2...]
+
+    Standard library compiled:
+    The formatted library, stored as .json next to the raw text (together with the hash of the raw text it was built from),
+    so that the regexes are not run on every compilation. Use JackStandardLibrary.load() to get the (once per process) loaded library
     """
     
-    def __init__(self, file_name='lib/front_end_translator/jackStandardLibraryRaw.txt'):
-        self.standard_library_raw = open(file_name, 'r').read()
-        self.standard_library_formatted = JackStandardLibrary.construct_formatted_library(self.standard_library_raw)
+    RAW_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jackStandardLibraryRaw.txt')
+    COMPILED_FILE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jackStandardLibrary.json')
+
+    _loaded_library = None
+
+    def __init__(self, file_name=RAW_FILE_NAME, standard_library_formatted=None):
+        self.standard_library_raw = None # Only read, if the library is formatted from it
+
+        if standard_library_formatted is None:
+            with open(file_name, 'r') as raw_file:
+                self.standard_library_raw = raw_file.read()
+
+            standard_library_formatted = JackStandardLibrary.construct_formatted_library(self.standard_library_raw)
+
+        self.standard_library_formatted = standard_library_formatted
         self.full_subroutine_names = JackStandardLibrary.construct_full_subroutine_names(self.standard_library_formatted)
 
+    def load():
+        """
+        Return the standard library, loaded only once per process from its compiled form (the compiled form is rebuilt if it is missing or outdated)
+        """
+
+        if JackStandardLibrary._loaded_library is None:
+            with open(JackStandardLibrary.RAW_FILE_NAME, 'rb') as raw_file:
+                raw_hash = CacheFiles.get_content_hash(raw_file.read())
+
+            try:
+                with open(JackStandardLibrary.COMPILED_FILE_NAME, 'r') as compiled_file:
+                    compiled_library = json.load(compiled_file)
+            except (OSError, ValueError):
+                compiled_library = {}
+
+            if compiled_library.get("source_hash") == raw_hash:
+                JackStandardLibrary._loaded_library = JackStandardLibrary(standard_library_formatted=compiled_library["library"])
+            else:
+                JackStandardLibrary._loaded_library = JackStandardLibrary()
+                JackStandardLibrary.compile(JackStandardLibrary._loaded_library, raw_hash)
+
+        return JackStandardLibrary._loaded_library
+
+    def compile(standard_library, raw_hash):
+        """
+        Store the formatted library as .json, ignoring a read-only installation
+        """
+
+        CacheFiles.write_atomically(JackStandardLibrary.COMPILED_FILE_NAME,
+                                    json.dumps({"source_hash": raw_hash, "library": standard_library.standard_library_formatted}, indent=1) + '\n')
+
     def construct_formatted_library(text):
         """
         Format the raw library text into class segments dictionaries
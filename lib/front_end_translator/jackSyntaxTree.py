@@ -0,0 +1,247 @@
+# Abstract syntax tree nodes of the Jack language, built by the JackTranslatorLibraryParser. @DimitarYordanov17
+
+# Every node is a slotted class which only keeps the values needed by the later stages (names, types and constants are
+# plain - interned - strings). Lists of children keep the source order. Nodes are walked with visitors - node.accept(visitor)
+# calls the visitor's visit_{node kind} method (e.g. visit_let_statement) with the node.
+
+
+class JackClassNode:
+    """
+    class name { variables subroutines }
+    """
+
+    __slots__ = ("name", "variables", "subroutines")
+
+    def __init__(self, name, variables, subroutines):
+        self.name = name
+        self.variables = variables
+        self.subroutines = subroutines
+
+    def accept(self, visitor):
+        return visitor.visit_class(self)
+
+
+class JackVariableDeclarationNode:
+    """
+    kind type name1, name2...; - kind being one of static, field (class variables) or var (local variables)
+    """
+
+    __slots__ = ("kind", "type", "names")
+
+    def __init__(self, kind, type, names):
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+    def accept(self, visitor):
+        return visitor.visit_variable_declaration(self)
+
+
+class JackSubroutineNode:
+    """
+    kind return_type name (type1 parameter1, type2 parameter2...) { variables statements }
+    """
+
+    __slots__ = ("kind", "return_type", "name", "parameters", "variables", "statements")
+
+    def __init__(self, kind, return_type, name, parameters, variables, statements):
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters # [(type, name), (type, name)...]
+        self.variables = variables
+        self.statements = statements
+
+    def get_parameter_list(self):
+        """
+        Return the parameter list in the same format as the standard library ones - "(int x, int y)"
+        """
+
+        if not self.parameters:
+            return "( )"
+
+        return "(" + ", ".join(f"{parameter_type} {parameter_name}" for parameter_type, parameter_name in self.parameters) + ")"
+
+    def accept(self, visitor):
+        return visitor.visit_subroutine(self)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~ Statements ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class JackLetStatementNode:
+    """
+    let name = expression; | let name[index] = expression;
+    """
+
+    __slots__ = ("name", "index", "expression")
+
+    def __init__(self, name, index, expression):
+        self.name = name
+        self.index = index # None, if the variable is not indexed
+        self.expression = expression
+
+    def accept(self, visitor):
+        return visitor.visit_let_statement(self)
+
+
+class JackIfStatementNode:
+    """
+    if (condition) { statements } | if (condition) { statements } else { else_statements }
+    """
+
+    __slots__ = ("condition", "statements", "else_statements")
+
+    def __init__(self, condition, statements, else_statements):
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements # None, if there is no else block
+
+    def accept(self, visitor):
+        return visitor.visit_if_statement(self)
+
+
+class JackWhileStatementNode:
+    """
+    while (condition) { statements }
+    """
+
+    __slots__ = ("condition", "statements")
+
+    def __init__(self, condition, statements):
+        self.condition = condition
+        self.statements = statements
+
+    def accept(self, visitor):
+        return visitor.visit_while_statement(self)
+
+
+class JackDoStatementNode:
+    """
+    do subroutine_call;
+    """
+
+    __slots__ = ("call",)
+
+    def __init__(self, call):
+        self.call = call
+
+    def accept(self, visitor):
+        return visitor.visit_do_statement(self)
+
+
+class JackReturnStatementNode:
+    """
+    return; | return expression;
+    """
+
+    __slots__ = ("expression",)
+
+    def __init__(self, expression):
+        self.expression = expression # None, if nothing is returned
+
+    def accept(self, visitor):
+        return visitor.visit_return_statement(self)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~ Expressions ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class JackExpressionNode:
+    """
+    term1 operation1 term2 operation2 term3... - there is no operator priority, so the terms are kept in a flat list
+    """
+
+    __slots__ = ("terms", "operations")
+
+    def __init__(self, terms, operations):
+        self.terms = terms
+        self.operations = operations # len(operations) == len(terms) - 1
+
+    def accept(self, visitor):
+        return visitor.visit_expression(self)
+
+
+class JackConstantTermNode:
+    """
+    An integer, string or keyword (true, false, null, this) constant
+    """
+
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind, value):
+        self.kind = kind # JackTranslatorLibraryToken kind code
+        self.value = value
+
+    def accept(self, visitor):
+        return visitor.visit_constant_term(self)
+
+
+class JackVariableTermNode:
+    """
+    name
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def accept(self, visitor):
+        return visitor.visit_variable_term(self)
+
+
+class JackArrayTermNode:
+    """
+    name[index]
+    """
+
+    __slots__ = ("name", "index")
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+    def accept(self, visitor):
+        return visitor.visit_array_term(self)
+
+
+class JackSubroutineCallNode:
+    """
+    name(arguments) | receiver.name(arguments) - receiver being a class or a variable name
+    """
+
+    __slots__ = ("receiver", "name", "arguments")
+
+    def __init__(self, receiver, name, arguments):
+        self.receiver = receiver # None, if the subroutine is called without a receiver
+        self.name = name
+        self.arguments = arguments
+
+    def accept(self, visitor):
+        return visitor.visit_subroutine_call(self)
+
+
+class JackBracketTermNode:
+    """
+    (expression)
+    """
+
+    __slots__ = ("expression",)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+    def accept(self, visitor):
+        return visitor.visit_bracket_term(self)
+
+
+class JackUnaryTermNode:
+    """
+    operation term - operation being - or ~
+    """
+
+    __slots__ = ("operation", "term")
+
+    def __init__(self, operation, term):
+        self.operation = operation
+        self.term = term
+
+    def accept(self, visitor):
+        return visitor.visit_unary_term(self)
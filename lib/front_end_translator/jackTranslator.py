@@ -3,73 +3,280 @@
 # To run: python3 jackTranslator.py {path} {generate corresponding XML files, yes/no}
 
 from lib.front_end_translator.jackTranslatorLibrary import JackTranslatorLibrary
+from lib.front_end_translator.jackSignatureIndex import JackSignatureIndex
+from lib.front_end_translator.jackTranslatorWorkers import JackTranslatorWorkers
+from lib.build_cache.cacheFiles import CacheFiles
 import os
 import sys
 
 
 class JackTranslator:
     """
-    Main class, capable of translating/parsing a full directory, with .jack files, resulting in corresponding .vm files and eventually .xml files
+    Main class, capable of translating/parsing a full directory, with .jack files, resulting in corresponding .vm files and eventually .xml files.
+    An instance only holds its configuration (the BuildCache and the number of jobs), every translation keeps its state to itself, so
+    an instance can be used by many threads at once
     """
 
+    CACHE_DIRECTORY = ".jackcache"
 
-    def translate(path, generate_xml=False):
+    def __init__(self, cache=None, jobs=1, use_signature_index=True, profiler=None, peephole=None):
+        self.cache = cache # If a BuildCache is given, classes which (together with the signatures they call) did not change are not translated again
+        self.jobs = jobs # If jobs > 1, the files are parsed and translated by up to jobs worker processes (see JackTranslatorWorkers)
+        self.use_signature_index = use_signature_index # Keep the signatures of the files in {project directory}/.jackcache/signatures.json
+        self.profiler = profiler # If a CompileProfiler is given, every phase is measured (the files are then translated by a single process)
+        self.peephole = peephole # If a VirtualMachinePeephole is given, the VM code of every file is optimized by it (the BuildCache keeps the unoptimized code)
+
+    def translate(self, path, generate_xml=False, write_vm=True, output_directory=None):
         """
-        Translate a directory/file, .jack -> .vm. A middle .xml file is used and if generate_xml=True, we keep it
+        Translate a directory/file, .jack -> .vm, returning {file_name: VM code} (file names without extension). If generate_xml=True, a .xml file with the parsed structure
+        is written for every .jack file. The .vm (if write_vm) and .xml files are written in the output directory (the directory of the .jack files by default)
         """
        
         jack_files = []
-        global_scope_subroutines = {}
 
         if ".jack" in path: # Single file
             jack_files.append(path)
+            project_directory = os.path.dirname(path)
 
         else:
             for root, dirs, files in os.walk(path):
                 for file_name in files:
                     if file_name.endswith(".jack"):
-                      jack_files.append(file_name)
+                      jack_files.append(os.path.join(root, file_name))
                 break        
-        # Construct global scope subroutines table and create xml files
-        for jack_full_file_name in jack_files:
-            jack_xml_file_name = jack_full_file_name.split(".")[0] + ".xml"
+            project_directory = path
 
-            JackTranslator._generate_xml(jack_full_file_name, tabularize=False)
-             
-            file_subroutines = JackTranslatorLibrary.get_file_subroutines(jack_xml_file_name)
-            global_scope_subroutines.update(file_subroutines)
+        if output_directory is None:
+            output_directory = project_directory
+
+        profiler = self.profiler
+        jack_sources = {}
 
-        # Translate each file
         for jack_full_file_name in jack_files:
-            jack_file_name = jack_full_file_name.split(".")[0]
+            if profiler is None:
+                jack_sources[jack_full_file_name] = JackTranslator._read_file(jack_full_file_name)
+            else:
+                with profiler.measure("io", JackTranslator._get_class_name(jack_full_file_name)):
+                    jack_sources[jack_full_file_name] = JackTranslator._read_file(jack_full_file_name)
+
+        if not self.use_signature_index:
+            signature_index = None
+        elif profiler is None:
+            signature_index = JackSignatureIndex(os.path.join(project_directory, JackTranslator.CACHE_DIRECTORY))
+        else:
+            with profiler.measure("signatures"):
+                signature_index = JackSignatureIndex(os.path.join(project_directory, JackTranslator.CACHE_DIRECTORY))
+
+        translated_files = JackTranslator.translate_sources(self, jack_sources, signature_index, keep_syntax_tree=generate_xml)
+
+        vm_files = {}
+
+        for jack_full_file_name, (class_node, vm_code) in translated_files.items():
+            jack_file_name = JackTranslator._get_class_name(jack_full_file_name)
+            vm_files[jack_file_name] = vm_code
+
+            if profiler is None:
+                JackTranslator._write_files(os.path.join(output_directory, jack_file_name), class_node, vm_code, generate_xml, write_vm)
+            else:
+                with profiler.measure("io", jack_file_name):
+                    JackTranslator._write_files(os.path.join(output_directory, jack_file_name), class_node, vm_code, generate_xml, write_vm)
+
+        return vm_files
+
+    def translate_sources(self, jack_sources, signature_index=None, keep_syntax_tree=False):
+        """
+        Translate the texts of .jack files in memory - {file_name: Jack code}, returning {file_name: (abstract syntax tree, VM code)} in the same order.
+        The abstract syntax trees are only returned if keep_syntax_tree (None otherwise). The JackSignatureIndex is optional
+        """
+
+        cache = self.cache
+        profiler = self.profiler
+        global_scope_subroutines = {}
+        workers = JackTranslatorWorkers(self.jobs) if self.jobs > 1 and len(jack_sources) > 1 and profiler is None else None
+
+        try:
+            # Construct global scope subroutines table. Files, whose content is already in the signature index, are not parsed here
+            file_hashes = {}
+            files_subroutines = {}
+            parsed_files = {}
+            unindexed_files = []
+
+            for jack_full_file_name, file_text in jack_sources.items():
+                file_hashes[jack_full_file_name] = CacheFiles.get_content_hash(file_text)
+
+                file_subroutines = None if signature_index is None else signature_index.get(file_hashes[jack_full_file_name], JackTranslator._get_class_name(jack_full_file_name))
+
+                if file_subroutines is None:
+                    unindexed_files.append(jack_full_file_name)
+                else:
+                    files_subroutines[jack_full_file_name] = file_subroutines
+
+            if workers is None:
+                for jack_full_file_name in unindexed_files:
+                    class_node = JackTranslator._parse(jack_sources[jack_full_file_name], profiler, JackTranslator._get_class_name(jack_full_file_name))
+                    parsed_files[jack_full_file_name] = class_node
+
+                    if profiler is None:
+                        files_subroutines[jack_full_file_name] = JackTranslatorLibrary.get_file_subroutines(class_node)
+                    else:
+                        with profiler.measure("signatures", JackTranslator._get_class_name(jack_full_file_name)):
+                            files_subroutines[jack_full_file_name] = JackTranslatorLibrary.get_file_subroutines(class_node)
+
+            elif unindexed_files:
+                files_subroutines.update(workers.parse({jack_full_file_name: jack_sources[jack_full_file_name] for jack_full_file_name in unindexed_files}))
+
+            if signature_index is not None:
+                for jack_full_file_name in unindexed_files:
+                    signature_index.add(file_hashes[jack_full_file_name], files_subroutines[jack_full_file_name])
+
+                if profiler is None:
+                    signature_index.save()
+                else:
+                    with profiler.measure("signatures"):
+                        signature_index.save()
+
+            for jack_full_file_name in jack_sources:
+                global_scope_subroutines.update(files_subroutines[jack_full_file_name])
+
+            # Translate each file (parsing the ones, which were not parsed yet), unless it is cached
+            translated_files = {}
+            worker_files = {} # The files left to the workers
+            keep_worker_syntax_tree = keep_syntax_tree or (cache is not None and cache.KEEPS_SYNTAX_TREES)
+
+            for jack_full_file_name, file_text in jack_sources.items():
+                class_name = JackTranslator._get_class_name(jack_full_file_name)
+                cache_entry = None if cache is None else cache.get_class(class_name, file_hashes[jack_full_file_name], global_scope_subroutines)
+
+                if cache_entry is not None:
+                    class_node = cache_entry.get("ast")
+
+                    if class_node is None and keep_syntax_tree: # The cache does not keep the syntax trees, only the translation is saved
+                        class_node = parsed_files.get(jack_full_file_name) or JackTranslator._parse(file_text, profiler, class_name)
+
+                    translated_files[jack_full_file_name] = (class_node, cache_entry["vm"], None)
+
+                    if profiler is not None:
+                        profiler.count(class_name, "cached_classes", 1)
+
+                elif workers is None:
+                    translated_files[jack_full_file_name] = JackTranslator._translate_file(file_text, global_scope_subroutines, parsed_files.get(jack_full_file_name),
+                                                                                          profiler=profiler, class_name=class_name)
+
+                else:
+                    translated_files[jack_full_file_name] = None # Keeps the order of the files
+                    worker_files[jack_full_file_name] = file_text
+
+            if worker_files:
+                translated_files.update(workers.translate(worker_files, global_scope_subroutines, keep_worker_syntax_tree))
+
+            for jack_full_file_name, translated_file in translated_files.items():
+                class_node, vm_code, dependencies = translated_file
+
+                if cache is not None and dependencies is not None:
+                    cache.add_class(JackTranslator._get_class_name(jack_full_file_name), file_hashes[jack_full_file_name], dependencies, class_node, vm_code)
 
-            output_file_name = jack_file_name + ".vm"
-            jack_xml_file_name = jack_file_name + ".xml"
-          
-            vm_code = JackTranslatorLibrary.translate_file(jack_xml_file_name, global_scope_subroutines)
+                if self.peephole is not None:
+                    vm_code = JackTranslator._optimize_vm_code(self, vm_code, JackTranslator._get_class_name(jack_full_file_name))
 
-            JackTranslatorLibrary.tabularize(jack_xml_file_name)
+                translated_files[jack_full_file_name] = (class_node, vm_code)
 
-            if not generate_xml:
-                os.system(f"rm {jack_xml_file_name}")
- 
-            with open(output_file_name, 'w') as output_file:
-                for line in vm_code:
-                    output_file.write(line)
+        finally:
+            if workers is not None:
+                workers.close()
 
-                output_file.truncate()
+        return translated_files
 
-    def _generate_xml(input_file_name, tabularize=True):
+    def _optimize_vm_code(self, vm_code, class_name):
         """
-        Parses a single .jack file, resulting in a .xml file
+        Optimize the VM code of a file with the peephole optimizer, counting the hits of its rules in the profiler as peephole_{rule name}
         """
 
-        output_file_name = input_file_name.split(".")[0] + ".xml"
-        os.system(f"cp {input_file_name} {output_file_name}")
-        JackTranslatorLibrary.clean(output_file_name)
-        JackTranslatorLibrary.tokenize(output_file_name)
+        profiler = self.profiler
 
-        JackTranslatorLibrary.parse_file(output_file_name)
+        if profiler is None:
+            return self.peephole.optimize(vm_code)[0]
+
+        with profiler.measure("peephole", class_name):
+            vm_code, hits = self.peephole.optimize(vm_code)
+
+        for rule_name, count in hits.items():
+            profiler.count(class_name, f"peephole_{rule_name}", count)
+
+        return vm_code
+
+    def _get_class_name(jack_full_file_name):
+        """
+        Return the name of a .jack file without its directory and extension
+        """
+
+        return os.path.splitext(os.path.basename(jack_full_file_name))[0]
+
+    def _translate_file(file_text, global_scope_subroutines, class_node=None, keep_syntax_tree=True, profiler=None, class_name=None):
+        """
+        Translate the text of a single .jack file (parsing it, if its abstract syntax tree is not given), returning its abstract syntax tree
+        (None, if not keep_syntax_tree), its VM code and the global scope signatures the VM code depends on. The class name identifies the file in the profiler
+        """
+
+        if class_node is None:
+            class_node = JackTranslator._parse(file_text, profiler, class_name)
+
+        dependencies = {}
+
+        if profiler is None:
+            vm_code = "".join(JackTranslatorLibrary.translate_file(class_node, global_scope_subroutines, dependencies))
+        else:
+            with profiler.measure("codegen", class_name):
+                vm_commands = JackTranslatorLibrary.translate_file(class_node, global_scope_subroutines, dependencies)
+                vm_code = "".join(vm_commands)
+
+            profiler.count(class_name, "vm_commands", len(vm_commands))
+
+        return class_node if keep_syntax_tree else None, vm_code, dependencies
+
+    def _parse(file_text, profiler=None, class_name=None):
+        """
+        Tokenize and parse the text of a single .jack file, returning its abstract syntax tree. The class name identifies the file in the profiler
+        """
+
+        if profiler is None:
+            tokens = JackTranslatorLibrary.tokenize(file_text)
+
+            return JackTranslatorLibrary.parse(tokens, file_text)
+
+        with profiler.measure("tokenize", class_name):
+            tokens = JackTranslatorLibrary.tokenize(file_text)
+
+        with profiler.measure("parse", class_name):
+            class_node = JackTranslatorLibrary.parse(tokens, file_text)
+
+        profiler.count(class_name, "tokens", len(tokens))
+        profiler.count(class_name, "ast_nodes", JackTranslatorLibrary.count_nodes(class_node))
+
+        return class_node
+
+    def _read_file(file_name):
+        """
+        Return the text of a file
+        """
+
+        with open(file_name, 'r') as input_file:
+            return input_file.read()
+
+    def _write_files(output_file_name, class_node, vm_code, generate_xml, write_vm):
+        """
+        Write the .xml (if generate_xml) and .vm (if write_vm) files of a translated .jack file - the output file name is given without extension
+        """
+
+        if generate_xml:
+            JackTranslator._generate_xml(output_file_name + ".xml", class_node)
+
+        if write_vm:
+            with open(output_file_name + ".vm", 'w') as output_file:
+                output_file.write(vm_code)
+
+    def _generate_xml(output_file_name, class_node):
+        """
+        Write the abstract syntax tree of a single .jack file, resulting in a .xml file
+        """
 
-        if tabularize:
-            JackTranslatorLibrary.tabularize(output_file_name)
+        JackTranslatorLibrary.write_xml(output_file_name, class_node)
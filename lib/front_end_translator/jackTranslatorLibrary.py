@@ -1,8 +1,13 @@
 # An intermediate code library for the Jack > Intermediate (VM) code translation. @DimitarYordanov17
 
 from lib.front_end_translator.jackStandardLibrary import JackStandardLibrary
+from lib.front_end_translator.jackSyntaxTree import (JackClassNode, JackVariableDeclarationNode, JackSubroutineNode,
+                                                     JackLetStatementNode, JackIfStatementNode, JackWhileStatementNode,
+                                                     JackDoStatementNode, JackReturnStatementNode, JackExpressionNode,
+                                                     JackConstantTermNode, JackVariableTermNode, JackArrayTermNode,
+                                                     JackSubroutineCallNode, JackBracketTermNode, JackUnaryTermNode)
 import re
-import copy
+import sys
 
 class JackTranslatorLibrary:
     """
@@ -29,227 +34,186 @@ class JackTranslatorLibrary:
                      'if', 'else', 'while', 'return'],
     }
 
-    def translate_file(input_file_name, global_scope_subroutines):
+    def translate_file(class_node, global_scope_subroutines, dependencies=None):
         """
-        Handle the translation of a file
+        Handle the translation of a parsed file. If a dependencies dictionary is given, it is filled with the global scope signatures the translation relied on
         """
                 
-        jack_translator = JackTranslatorLibraryCodeGenerator(input_file_name, global_scope_subroutines)
+        jack_translator = JackTranslatorLibraryCodeGenerator(class_node, global_scope_subroutines)
         vm_code = jack_translator.translate()
 
+        if dependencies is not None:
+            dependencies.update(jack_translator.dependencies)
+
         return vm_code
 
-    def get_file_subroutines(input_file_name):
+    def get_file_subroutines(class_node):
         """
-        Return a classified dictionary of all subroutines in the file and their properties
+        Return a classified dictionary of all subroutines in the parsed file and their properties
         """
-        subroutines_lib = {}
-
-        jack_translator = JackTranslatorLibraryCodeGenerator(input_file_name, []) # Initialize with an empty global subroutines array
-
-        jack_translator._strip_input_commands()
-        jack_translator._get_class_info()
-        jack_translator._get_subroutines()
-        
-        class_name = jack_translator.class_info[0]
-        subroutines_lib[class_name] = {}
 
-        for subroutine_name, subroutine_declaration in jack_translator.subroutines.items():
-            properties = subroutine_declaration[0][:subroutine_declaration[0].index("<symbol> ) </symbol>") + 1]
-  
-            subroutine_kind, subroutine_type = JackTranslatorLibraryParser._get_tag_value("", properties[0]), JackTranslatorLibraryParser._get_tag_value("", properties[1])
-            subroutine_param_list = properties[properties.index("<symbol> ( </symbol>"):] 
+        class_subroutines = {}
 
-            subroutines_lib[class_name][subroutine_name] = [subroutine_kind, subroutine_type, subroutine_param_list]
+        for subroutine in class_node.subroutines:
+            class_subroutines[subroutine.name] = [subroutine.kind, subroutine.return_type, subroutine.get_parameter_list()]
         
-        return subroutines_lib
+        return {class_node.name: class_subroutines}
 
-    def parse_file(input_file_name):
+    def parse(tokens, file_text=""):
         """
-        Makes use of the JackTranslatorLibraryParser class to generate a .xml file from a .jack one
+        Makes use of the JackTranslatorLibraryParser class to build the abstract syntax tree of a .jack file
         """
 
-        jack_parser = JackTranslatorLibraryParser(input_file_name)
-        jack_parser.parse()
+        jack_parser = JackTranslatorLibraryParser(tokens, file_text)
 
+        return jack_parser.parse()
 
-    def tokenize(input_file_name):
+    def count_nodes(node):
         """
-        Tokenizes a file, spreading each keyword (token) on a newline
+        Return the number of nodes of an abstract syntax tree (or of a list of trees)
         """
 
-        with open(input_file_name, 'r+') as input_file:
-            input_file.seek(0)
-            file_text = input_file.read()
-
-            # Clean trailing spaces
-            file_text = file_text.strip()
+        if isinstance(node, (list, tuple)):
+            return sum(JackTranslatorLibrary.count_nodes(child) for child in node)
 
-            # Clean all \n
-            file_text = file_text.replace("\n", " ")
+        if not hasattr(node, "accept"): # Names, types and constants are plain values
+            return 0
 
-            # Clean spaces, without breaking the string
-            # BTW I spent too much time on this but in the end I see that
-            # I could use regex for the entire compiler...
-            # If I find time to rework the whole thing, I might find a way
-            # to do it with regexes for optimization.
-            # All the added complexity is here just so I can parse strings the correct way.
+        return 1 + sum(JackTranslatorLibrary.count_nodes(getattr(node, slot)) for slot in node.__slots__)
 
-            strings = re.findall(r'"[^"]*"', file_text)
-            non_string_file_text = re.split(r'(?:"[^"]*")', file_text)
+    def write_xml(output_file_name, class_node):
+        """
+        Write a parsed file as a .xml file
+        """
 
-            refactored_text = []
+        JackTranslatorLibraryXML.write(output_file_name, class_node)
 
-            for index, non_string in enumerate(non_string_file_text):
-                while "  " in non_string:
-                    non_string = non_string.replace("  ", " ")
+    def tokenize(file_text):
+        """
+        Tokenizes the text of a .jack file, returning a list of positioned tokens (comments and whitespaces are skipped)
+        """
 
-                for symbol in JackTranslatorLibrary.SYNTAX_ELEMENTS["symbols"]:
-                    widened_symbol = " " + symbol + " "
-                    non_string = non_string.replace(symbol, widened_symbol)
+        return JackTranslatorLibraryTokenizer.tokenize(file_text)
 
-                refactored_text.extend(non_string.split())
 
-                try:
-                    refactored_text.append(strings[index])
-                except:
-                    break
+class JackTranslatorLibraryToken:
+    """
+    A single lexical element of a .jack file - an integer kind code (see KINDS), an interned value (string constants are
+    kept without the enclosing double quotes) and the offset of the token in the source text. Slotted to keep large token
+    streams small; use JackTranslatorLibraryTokenizer.get_position to map the offset to a line and a column
+    """
 
-            input_file.seek(0)
+    __slots__ = ("kind", "value", "offset")
 
-            for token in refactored_text:
-                classified_token = JackTranslatorLibrary._classify_token(token)
-                input_file.write(classified_token + '\n')
+    KEYWORD, SYMBOL, INTEGER_CONSTANT, STRING_CONSTANT, IDENTIFIER = range(5)
+    KINDS = ("keyword", "symbol", "integerConstant", "stringConstant", "identifier")
 
-            input_file.truncate()
+    def __init__(self, kind, value, offset):
+        self.kind = kind
+        self.value = value
+        self.offset = offset
 
-    def clean(input_file_name):
+    def get_tag(self):
         """
-        Removes all comments in a file, but keeps line spacing
-        (have to be careful to not remove a line which contains
-        division, signed by '/' or string, containing it)
+        Return the classified (XML) form of the token
         """
 
-        with open(input_file_name, 'r+') as input_file:
-            lines = input_file.readlines()
-            input_file.seek(0)
+        kind_name = JackTranslatorLibraryToken.KINDS[self.kind]
 
-            in_comment = False
+        if self.kind == JackTranslatorLibraryToken.STRING_CONSTANT:
+            return f'<{kind_name}> "{self.value}" </{kind_name}>'
 
-            for line in lines:
-                if "/*" in line or "//" in line:
-                    comment = r"//" if "//" in line else r"/\*"
-                    string_to_write, enter_comment = JackTranslatorLibrary._proccess_comment(line, comment)
+        return f"<{kind_name}> {self.value} </{kind_name}>"
 
-                    in_comment = enter_comment
+    def __repr__(self):
+        return f"JackTranslatorLibraryToken({JackTranslatorLibraryToken.KINDS[self.kind]}, {self.value!r}, {self.offset})"
 
-                    if string_to_write != '\n' and string_to_write != '':
-                        input_file.write(string_to_write)
 
-                elif (len(line.strip()) >= 2) and ("*/" == (line.strip()[-2] + line.strip()[-1])):
-                    in_comment = False
+class JackTranslatorLibraryTokenizer:
+    """
+    Single-pass scanner, .jack text -> tokens.
 
-                elif (not in_comment) and line != '\n':
-                    input_file.write(line)
+    More information on the scanning logic:
+    // The whole source is matched against one compiled regex, in which every alternative is a named group. Whitespaces
+    // and comments are consumed but not emitted. Words are classified as keywords or identifiers with a single dictionary
+    // lookup, which also hands out the shared (interned) value. No temporary files and no rewriting of the text.
+    """
 
-            input_file.truncate()
+    TOKEN_PATTERN = re.compile(r"""
+        (?P<whitespace>\s+)
+        |(?P<line_comment>//[^\n]*)
+        |(?P<block_comment>/\*.*?(?:\*/|\Z))
+        |(?P<stringConstant>"[^"\n]*")
+        |(?P<integerConstant>[0-9]+)
+        |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+        |(?P<symbol>[{}()\[\].,;+\-*/&|<>=~])
+        |(?P<error>.)
+    """, re.VERBOSE | re.DOTALL)
 
+    KEYWORDS = {keyword: sys.intern(keyword) for keyword in JackTranslatorLibrary.SYNTAX_ELEMENTS["keywords"]}
+    SYMBOLS = {symbol: sys.intern(symbol) for symbol in JackTranslatorLibrary.SYNTAX_ELEMENTS["symbols"]}
 
-    def tabularize(input_file_name):
+    def tokenize(file_text):
         """
-        Indent every tag between two upper tags, keep nested depth
+        Return a list of JackTranslatorLibraryToken for the given .jack text
         """
 
-        with open(input_file_name, 'r+') as input_file:
-            lines = input_file.readlines()
-            input_file.seek(0)
-
-            depth = 0
-
-            for line in lines:
-                tabularized_line = ('\t' * depth) + line
+        tokens = []
+        append = tokens.append
 
-                if " " not in line:
-                    if "/" in line:
-                        depth -= 1
-                        tabularized_line = ('\t' * depth) + line
-                    else:
-                        depth += 1
+        Token = JackTranslatorLibraryToken
+        keywords = JackTranslatorLibraryTokenizer.KEYWORDS
+        symbols = JackTranslatorLibraryTokenizer.SYMBOLS
+        intern = sys.intern
 
-                input_file.write(tabularized_line)
+        for match in JackTranslatorLibraryTokenizer.TOKEN_PATTERN.finditer(file_text):
+            kind = match.lastgroup
 
+            if kind == "symbol":
+                append(Token(Token.SYMBOL, symbols[match.group()], match.start()))
 
-    def _classify_token(token):
-        """
-        Appends a certain type tags to a token 
-        """
+            elif kind == "word":
+                value = match.group()
+                keyword = keywords.get(value)
 
-        token_type = ""
-
-        if token in JackTranslatorLibrary.SYNTAX_ELEMENTS["keywords"]:
-            token_type = "keyword"
-
-        elif token in JackTranslatorLibrary.SYNTAX_ELEMENTS["symbols"]:
-            token_type = "symbol"
-
-        elif '"' in token:
-            token_type = "stringConstant"
+                if keyword is None:
+                    append(Token(Token.IDENTIFIER, intern(value), match.start()))
+                else:
+                    append(Token(Token.KEYWORD, keyword, match.start()))
 
-        elif token[0].isnumeric():
-            token_type = "integerConstant"
+            elif kind == "integerConstant":
+                append(Token(Token.INTEGER_CONSTANT, intern(match.group()), match.start()))
 
-        else:
-            token_type = "identifier"
+            elif kind == "stringConstant":
+                append(Token(Token.STRING_CONSTANT, match.group()[1:-1], match.start()))
 
-        classified_token = f"<{token_type}> {token} </{token_type}>"
+            elif kind == "error":
+                line, column = JackTranslatorLibraryTokenizer.get_position(file_text, match.start())
+                raise SyntaxError(f"Unexpected character {match.group()!r} at line {line}, column {column}")
 
-        return classified_token
+        return tokens
 
-
-    def _proccess_comment(line, comment):
+    def get_position(file_text, offset):
         """
-        Returns a string, that should be written and a boolan to indicate if we are entering a block comment
+        Return the (line, column) pair, both starting from 1, of an offset in the source text
         """
 
-        line = line.rstrip()
-        comment_occurrences = [occurence.span()[0] for occurence in re.finditer(comment, line)]
-
-        string_to_write = line + '\n'
-        enter_block_comment = False
-
-        for comment_start_index in comment_occurrences:
-            before_comment_segment = line[:comment_start_index]
-            double_quotes_count = before_comment_segment.count('"')
-
-            if double_quotes_count % 2 == 0:  # We have a comment, because all possible string are closed
-                if before_comment_segment.replace(" ", ""):
-                    string_to_write = before_comment_segment + '\n'
-
-                else:
-                    string_to_write = ""
+        line = file_text.count("\n", 0, offset) + 1
+        column = offset - file_text.rfind("\n", 0, offset)
 
-                if "/*" in line:
-                    last_two_chars = line[-2] + line[-1]
-                    enter_block_comment = True
-
-                    if last_two_chars == "*/":
-                        enter_block_comment = False
-
-                break
-
-        return string_to_write, enter_block_comment
+        return line, column
 
 
 class JackTranslatorLibraryCodeGenerator:
     """
     Responsible for the VM code generation of Jack commands and other auxiliary functions (such as building symbolic table)
-    XML -> VM.
+    Abstract syntax tree -> VM.
     
     More information on the translating logic:
-    // We have a basic initialization where each instance contains input_commands (all the XML tags) and
-    // subroutines (a dictionary - subroutine_name: [subroutine_declaration, subroutine_symbolic_table, vm_code]).
-    // Next, we translate all the class information (class variables...). After that we go through every
-    // subroutine and we translate it into VM code, using its own symbolic table. Technically to translate a file means
+    // The generator is a visitor - every node of the tree is visited exactly once (node.accept(generator)) and every visit method
+    // appends its VM commands directly to the instance's vm_code list, so there is no slicing or searching of sub-lists at any
+    // nesting level. We start with the class information (class symbolic table). After that we go through every subroutine,
+    // building its own symbolic table and translating its statements. Technically to translate a file means
     // to fill up instance's vm_code attribute
     """
 
@@ -258,1170 +222,1099 @@ class JackTranslatorLibraryCodeGenerator:
                     ">": "gt", "<": "lt", "=": "eq"
                 }
 
-    def __init__(self, input_file_name, global_scope_subroutines):
-        # KEEP IN MIND: There is a difference in the format of the global scope subroutine param lists and standard library param lists.
-        self.input_commands = open(input_file_name, 'r').readlines()
-        self.symbolic_table = []
+    SEGMENTS = {"var": "local", "field": "this", "static": "static", "argument": "argument"}
+
+    def __init__(self, class_node, global_scope_subroutines):
+        # KEEP IN MIND: global_scope_subroutines has the same format as the formatted standard library - {class_name: {subroutine_name: [kind, type, parameter_list]}}
+        self.class_node = class_node
         self.vm_code = []
 
         self.global_subroutines = global_scope_subroutines
-        self.global_identifiers = self._get_global_subroutine_identifiers()
 
-        self.subroutines = {}
-        self.class_info = []
+        self.class_name = class_node.name
+        self.class_symbolic_table = {}
+        self.class_subroutines = {}
+
+        self.subroutine = None
+        self.symbolic_table = {}
 
         self.translated_statements = 0
+        self.dependencies = {} # {"class_name.subroutine_name": return_type} of every global scope subroutine the generated code depends on
 
-        self.std_lib_init = JackStandardLibrary()
-        self.std_lib = self.std_lib_init.standard_library_formatted
-        self.std_lib_subroutines = self.std_lib_init.full_subroutine_names
+        self.std_lib = JackStandardLibrary.load().standard_library_formatted
         
     def translate(self):
         """
-        Get class and subroutines info. Generate symbolic table for every subroutine. Start parsing every subroutine
+        Get class and subroutines info. Generate symbolic table for every subroutine. Translate every subroutine
         """
-        self.not_class_subroutines_lib = self.global_subroutines
-        self.not_class_subroutines_lib.update(self.std_lib)
 
-        JackTranslatorLibraryCodeGenerator._strip_input_commands(self)
-        JackTranslatorLibraryCodeGenerator._get_class_info(self)        
-        JackTranslatorLibraryCodeGenerator._get_subroutines(self)
+        self.class_node.accept(self)
 
-        for subroutine_name in self.subroutines.keys():
-            symbolic_table = JackTranslatorLibraryCodeGenerator._generate_symbolic_table(self, subroutine_name)
-            self.subroutines[subroutine_name].append(symbolic_table)
-        
-        for subroutine_name in self.subroutines.keys():
-            subroutine_vm_code = JackTranslatorLibraryCodeGenerator._translate_subroutine(self, subroutine_name)
-            self.subroutines[subroutine_name].append(subroutine_vm_code)
-
-        vm_code = []
-
-        for subroutine_declaration, subroutine_symbolic_table, subroutine_vm_code in self.subroutines.values():
-            indented_vm_code = [vm_command + '\n' for vm_command in subroutine_vm_code]
-            vm_code.extend(indented_vm_code)
+        return [vm_command + '\n' for vm_command in self.vm_code]
 
-        return vm_code
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ Declarations ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    def _translate_subroutine(self, subroutine_name):
+    def visit_class(self, class_node):
         """
-        Return the vm code for a subroutine
+        Build the class symbolic table, then translate every subroutine
         """
-        
-        subroutine_declaration = self.subroutines[subroutine_name][0]
-        subroutine_symbolic_table = self.subroutines[subroutine_name][1]
-        class_name = self.class_info[0]
-
-        subroutine_vm_code = []
 
-        # Translate meta information
-        subroutine_title = f"function {class_name}.{subroutine_name}"
-        subroutine_kind = JackTranslatorLibraryParser._get_tag_value(self, subroutine_declaration[0])
-        locals_count = [x for y in list(subroutine_symbolic_table.values()) for x in y].count("var")
+        count = 0
+        last_kind = ""
 
-        subroutine_declaration_title = subroutine_title + f" {locals_count}"
-        subroutine_vm_code.append(subroutine_declaration_title)
+        for variable_declaration in class_node.variables:
+            if variable_declaration.kind != last_kind:
+                count = 0
 
-        # Add translation bootstrap code (setting the "this" segment)
-        if subroutine_kind == "method":
-            subroutine_vm_code.extend(["push argument 0", "pop pointer 0"])
-        
-        elif subroutine_kind == "constructor":
-            class_variables = [x for y in list(self.class_info[1].values()) for x in y].count("field")
-            subroutine_vm_code.extend([f"push constant {class_variables}", "call Memory.alloc 1", "pop pointer 0"])
+            for variable_name in variable_declaration.names:
+                self.class_symbolic_table[variable_name] = [variable_declaration.type, variable_declaration.kind, count]
+                count += 1
 
-        subroutine_body = subroutine_declaration[subroutine_declaration.index("<statements>"):JackTranslatorLibraryCodeGenerator._get_all_occurrences(subroutine_declaration, "</statements>")[-1]] 
-        statements_vm_code = JackTranslatorLibraryCodeGenerator._translate_statements(self, subroutine_body, subroutine_name)
-        subroutine_vm_code.extend(statements_vm_code)
+            last_kind = variable_declaration.kind
 
-        return subroutine_vm_code
+        for subroutine in class_node.subroutines:
+            self.class_subroutines[subroutine.name] = subroutine
 
+        for subroutine in self.class_subroutines.values():
+            subroutine.accept(self)
 
-    def _translate_statements(self, statement_declarations, subroutine_name):
+    def visit_subroutine(self, subroutine):
         """
-        Return the vm code for every statement in a subroutine body
+        Build the subroutine symbolic table, then translate the meta information and the statements of the subroutine
         """
 
-        statements_vm_code = []
+        self.subroutine = subroutine
+        self.symbolic_table = {}
 
-        statements = []
-        current_statement = []
-        stack = []
-
-        for index, tag in enumerate(statement_declarations):
-            
-            if "Statement" in tag and " " not in tag:
-                if "/" in tag:
-                    stack.pop()
-                else:
-                    stack.append(1)
-            
-            current_statement.append(tag)
+        # Parse arguments variables
+        first_argument = 1 if subroutine.kind == "method" else 0
 
-            if len(stack) == 0:
-                statements.append(current_statement)
-                current_statement = []
+        for count, (parameter_type, parameter_name) in enumerate(subroutine.parameters, first_argument):
+            self.symbolic_table[parameter_name] = [parameter_type, "argument", count]
 
-        # Translate the differentiated statements
-        for statement_declaration in statements:
-            self.translated_statements += 1
-            statement_type = statement_declaration[0][1:-1]
-            statement_vm_code = []
+        # Subroutine body variables
+        count = 0
 
-            if statement_type == "letStatement":
-                # Get identifier notation
-                identifier = JackTranslatorLibraryParser._get_tag_value(self, statement_declaration[2])
-                identifier = JackTranslatorLibraryCodeGenerator._get_identifier(self, identifier, subroutine_name)
+        for variable_declaration in subroutine.variables:
+            for variable_name in variable_declaration.names:
+                self.symbolic_table[variable_name] = [variable_declaration.type, variable_declaration.kind, count]
+                count += 1
 
-                # Get expression declaration
-                expression_declaration = statement_declaration[statement_declaration.index("<symbol> = </symbol>") + 2:-3]
-                
-                # Translate the expression
-                expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, expression_declaration, subroutine_name)
+        # Translate meta information
+        locals_count = [properties[1] for properties in self.symbolic_table.values()].count("var")
+        self.vm_code.append(f"function {self.class_name}.{subroutine.name} {locals_count}")
 
-                # Check if we our identifier is an array
-                array_indexing = JackTranslatorLibraryParser._get_tag_value(self, statement_declaration[3]) == "["
+        # Add translation bootstrap code (setting the "this" segment)
+        if subroutine.kind == "method":
+            self.vm_code.extend(["push argument 0", "pop pointer 0"])
 
-                # Construct statement code
-                if array_indexing:
-                    identifier_expression_declaration  = statement_declaration[5:statement_declaration.index("<symbol> = </symbol>") - 2]
-                    identifier_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, identifier_expression_declaration, subroutine_name)
+        elif subroutine.kind == "constructor":
+            class_variables = [properties[1] for properties in self.class_symbolic_table.values()].count("field")
+            self.vm_code.extend([f"push constant {class_variables}", "call Memory.alloc 1", "pop pointer 0"])
 
-                    # Calculate identifier address
-                    statement_vm_code.extend([f"push {identifier}"])
-                    statement_vm_code.extend(identifier_vm_code)
-                    statement_vm_code.append("add")
+        JackTranslatorLibraryCodeGenerator._translate_statements(self, subroutine.statements)
 
-                    # Push expression value
-                    statement_vm_code.extend(expression_vm_code)
+    def _translate_statements(self, statements):
+        """
+        Translate a sequence of statements, giving each one its own number (used for unique labels)
+        """
 
-                    # Pop the expression value into a temp register and the identifier address into pointer 0
-                    statement_vm_code.extend(["pop temp 0", "pop pointer 1"])
+        for statement in statements:
+            self.translated_statements += 1
+            statement.accept(self)
 
-                    # Pop the expression value into the desired address
-                    statement_vm_code.extend(["push temp 0", "pop that 0"])
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ Statements ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-                else:
-                    # Push expression value
-                    statement_vm_code.extend(expression_vm_code)
+    def visit_let_statement(self, statement):
+        """
+        let name = expression; | let name[index] = expression;
+        """
 
-                    # Pop into the desired segment
-                    statement_vm_code.append(f"pop {identifier}")
-                
+        identifier = JackTranslatorLibraryCodeGenerator._get_identifier(self, statement.name)
 
-            elif statement_type == "ifStatement":
-                # Get condition evaluation
-                cond_expression = statement_declaration[statement_declaration.index("<symbol> ( </symbol>") + 2:statement_declaration.index("<symbol> { </symbol>") - 2]
-                cond_expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, cond_expression, subroutine_name)
+        if statement.index is not None:
+            # Calculate identifier address
+            self.vm_code.append(f"push {identifier}")
+            statement.index.accept(self)
+            self.vm_code.append("add")
 
-                # Push condition evaluation and flip it
-                statement_vm_code.extend(cond_expression_vm_code)
-                statement_vm_code.append("not")
+            # Push expression value
+            statement.expression.accept(self)
 
+            # Pop the expression value into a temp register and the identifier address into pointer 1,
+            # then pop the expression value into the desired address
+            self.vm_code.extend(["pop temp 0", "pop pointer 1", "push temp 0", "pop that 0"])
 
-                # Differentiate into statements
-                if_statement_body = statement_declaration[statement_declaration.index("<symbol> { </symbol>") + 2: -3]
+        else:
+            # Push expression value and pop it into the desired segment
+            statement.expression.accept(self)
+            self.vm_code.append(f"pop {identifier}")
 
-                if_true_statements = []
-                if_false_statements = []
+    def visit_if_statement(self, statement):
+        """
+        if (condition) { statements } else { else_statements }
+        """
 
-                depth = 0
-                differentiating_else_index = 0
+        # Generate unique labels
+        label_prefix = f"{self.subroutine.name}:ifStatement:{self.translated_statements}"
+        end_label = f"{label_prefix}:END"
 
-                for inner_index, tag in enumerate(if_statement_body):
-                    tag_value = JackTranslatorLibraryParser._get_tag_value(self, tag)
+        # Push condition evaluation and flip it
+        statement.condition.accept(self)
+        self.vm_code.append("not")
 
-                    if " " not in tag and "Statement" in tag: # Opening/closing tag
-                        if "/" in tag:
-                            depth -= 1
-                        else:
-                            depth += 1
+        if statement.else_statements is not None:
+            second_statement_label = f"{label_prefix}:EXECUTE_SECOND_STATEMENT"
 
-                    if tag_value == "else" and depth == 0:
-                        differentiating_else_index = inner_index
-                        break
+            self.vm_code.append(f"if-goto {second_statement_label}")
+            JackTranslatorLibraryCodeGenerator._translate_statements(self, statement.statements)
 
-                # Branch on different types
-                if differentiating_else_index != 0: # In case we have an else
-                    if_true_statements = if_statement_body[:differentiating_else_index - 2]
+            # Jump to end label, declare false statement label and add its vm code
+            self.vm_code.extend([f"goto {end_label}", f"label {second_statement_label}"])
+            JackTranslatorLibraryCodeGenerator._translate_statements(self, statement.else_statements)
 
-                    # Generate unique labels
-                    end_label = f"{subroutine_name}:{statement_type}:{self.translated_statements}:END"
-                    second_statement_label = f"{subroutine_name}:{statement_type}:{self.translated_statements}:EXECUTE_SECOND_STATEMENT"
+        else:
+            self.vm_code.append(f"if-goto {end_label}")
+            JackTranslatorLibraryCodeGenerator._translate_statements(self, statement.statements)
 
-                    # Translate if true statements
-                    if_true_statements_vm_code = JackTranslatorLibraryCodeGenerator._translate_statements(self, if_true_statements, subroutine_name)
+        # Declare ending label
+        self.vm_code.append(f"label {end_label}")
 
-                    # Add condition
-                    statement_vm_code.append(f"if-goto {second_statement_label}")
+    def visit_while_statement(self, statement):
+        """
+        while (condition) { statements }
+        """
 
-                    # Translate if false statement
-                    if_false_statements = if_statement_body[differentiating_else_index + 3:]
-                    if_false_statements_vm_code = JackTranslatorLibraryCodeGenerator._translate_statements(self, if_false_statements, subroutine_name)
-    
-                    statement_vm_code.extend(if_true_statements_vm_code)
-    
-                    # Jump to end label
-                    statement_vm_code.append(f"goto {end_label}")
-    
-                    # Declare false statement label and add it's vm code
-                    statement_vm_code.append(f"label {second_statement_label}")
-                    statement_vm_code.extend(if_false_statements_vm_code)
-    
-                    # Declare end label
-                    statement_vm_code.append(f"label {end_label}")
+        # Generate unique labels
+        start_label = f"{self.subroutine.name}:whileStatement:{self.translated_statements}:START"
+        end_label = f"{self.subroutine.name}:whileStatement:{self.translated_statements}:END"
 
-                else:
-                    # Generate unique end label
-                    end_label = f"{subroutine_name}:{statement_type}:{self.translated_statements}:END"
+        # Declare starting label, add flipped condition evaluation and jump to end
+        self.vm_code.append(f"label {start_label}")
+        statement.condition.accept(self)
+        self.vm_code.extend(["not", f"if-goto {end_label}"])
 
-                    # Translate body
-                    if_statement_body_vm_code = JackTranslatorLibraryCodeGenerator._translate_statements(self, if_statement_body, subroutine_name)
+        # Add statement body
+        JackTranslatorLibraryCodeGenerator._translate_statements(self, statement.statements)
 
-                    # Add if goto end
-                    statement_vm_code.append(f"if-goto {end_label}")
+        # Add recursive jump and declare ending label
+        self.vm_code.extend([f"goto {start_label}", f"label {end_label}"])
 
-                    # Add translated if body
-                    statement_vm_code.extend(if_statement_body_vm_code)
+    def visit_do_statement(self, statement):
+        """
+        do subroutine_call;
+        """
 
-                    # Declare ending label
-                    statement_vm_code.append(f"label {end_label}")
+        statement.call.accept(self)
 
+        callee_class_name, callee_subroutine_name, variable_properties = JackTranslatorLibraryCodeGenerator._get_callee(self, statement.call)
 
-            elif statement_type == "whileStatement":
-                # Generate unique labels
-                start_label = f"{subroutine_name}:{statement_type}:{self.translated_statements}:START"
-                end_label = f"{subroutine_name}:{statement_type}:{self.translated_statements}:END"
+        if JackTranslatorLibraryCodeGenerator._get_return_type(self, callee_class_name, callee_subroutine_name) == "void": # Discard the returned value from a void subroutine
+            self.vm_code.append("pop temp 0")
 
-                # Get translated condition evaluation
-                cond_expression = statement_declaration[statement_declaration.index("<symbol> ( </symbol>") + 2:statement_declaration.index("<symbol> { </symbol>") - 2]
-                cond_expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, cond_expression, subroutine_name)
+    def visit_return_statement(self, statement):
+        """
+        return; | return expression;
+        """
 
-                # Get translated statement body
-                statement_body = statement_declaration[statement_declaration.index("<symbol> { </symbol>") + 2:-3]
-                statement_body_vm_code = JackTranslatorLibraryCodeGenerator._translate_statements(self, statement_body, subroutine_name)
+        if self.subroutine.return_type == "void":
+            self.vm_code.append("push constant 0")
 
-                # Declare starting lbel
-                statement_vm_code.append(f"label {start_label}")
+        elif statement.expression is not None:
+            statement.expression.accept(self)
 
-                # Add flipped condition evaluation
-                statement_vm_code.extend(cond_expression_vm_code)
-                statement_vm_code.append("not")
+        self.vm_code.append("return")
 
-                # Add jump to end
-                statement_vm_code.append(f"if-goto {end_label}")
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ Expressions ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-                # Add statement body
-                statement_vm_code.extend(statement_body_vm_code)
+    def visit_expression(self, expression):
+        """
+        Translate a sequence of terms to VM code.
+        /* KEEP IN MIND: Operator priority is not defined by the language, except that expressions in parentheses are evaluated first.
+        Thus an expression like 2+3*4 may yield either 20 or 14, whereas 2+(3*4) is guaranteed to yield 14.*/
+        """
 
-                # Add recursive jump
-                statement_vm_code.append(f"goto {start_label}")
+        terms = expression.terms
+        terms[0].accept(self)
 
-                # Declare ending label
-                statement_vm_code.append(f"label {end_label}")
+        for operation, term in zip(expression.operations, terms[1:]):
+            term.accept(self)
+            self.vm_code.append(JackTranslatorLibraryCodeGenerator.OPERATIONS[operation])
 
-            elif statement_type == "doStatement":
-                # We can use one small trick here - this statement can be just a term
-                statement_body = statement_declaration[2:-2]
-                statement_vm_code = JackTranslatorLibraryCodeGenerator._translate_term(self, statement_body, subroutine_name, statement='do')
-                callee_return_type = statement_vm_code.pop()
-      
-                if callee_return_type == "void": # Discard the returned value from a void subroutine
-                    statement_vm_code.append("pop temp 0")
+    def visit_constant_term(self, term):
+        """
+        Integer, string and keyword constants
+        """
 
-            elif statement_type == "ReturnStatement":
-                # Get return type
-                return_type = JackTranslatorLibraryParser._get_tag_value(self, self.subroutines[subroutine_name][0][1])
-                
-                # Branch on function type
-                if return_type == "void":
-                    statement_vm_code.append("push constant 0")
-                else:
-                    # Get translated return value and add it
-                    expression = statement_declaration[3:-3]
+        if term.kind == JackTranslatorLibraryToken.INTEGER_CONSTANT:
+            self.vm_code.append(f"push constant {term.value}")
 
-                    if expression:
-                        expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, expression, subroutine_name)
-                        statement_vm_code.extend(expression_vm_code)
+        elif term.kind == JackTranslatorLibraryToken.STRING_CONSTANT:
+            # Construct a new string object and for every char, append it to the string
+            self.vm_code.extend([f"push constant {len(term.value)}", "call String.new 1"])
 
-                # Add return
-                statement_vm_code.append("return")
+            for char in term.value:
+                self.vm_code.extend([f"push constant {ord(char)}", "call String.appendChar 2"])
 
-            else:
-                self.translated_statements -= 1
-                continue
+        elif term.value == "true":
+            self.vm_code.extend(["push constant 1", "neg"])
 
-            statements_vm_code.extend(statement_vm_code)
+        elif term.value == "this":
+            self.vm_code.append("push pointer 0")
 
-        return statements_vm_code
+        else: # null, false
+            self.vm_code.append("push constant 0")
 
-    def _translate_expression(self, expression_declaration, subroutine_name):
+    def visit_variable_term(self, term):
         """
-        Translate a sequence of terms to VM code.
-        /* KEEP IN MIND: Operator priority is not defined by the language, except that expressions in parentheses are evaluated first.
-        Thus an expression like 2+3*4 may yield either 20 or 14, whereas 2+(3*4) is guaranteed to yield 14.*/
+        name
         """
-        expression_vm_code = []
-
-        # Terms and operations will keep differentiated structures
-        terms = []
-        operations = []
-
-        # Differentiate into terms and operations
-        current_term = []
-        stack = []
 
-        for index, tag in enumerate(expression_declaration):
-            
-            if "term" in tag and " " not in tag:
-                if "/" in tag:
-                    stack.pop()
-                else:
-                    stack.append(1)
-            
-            if len(stack) > 0:
-                current_term.append(tag)
-            else:
-                tag_value = JackTranslatorLibraryParser._get_tag_value(self, tag)
-                if tag_value in JackTranslatorLibrary.SYNTAX_ELEMENTS["op"]:
-                    operations.append(tag_value)
-                else:
-                    terms.append(current_term[1:])
-                    current_term = []
+        self.vm_code.append(f"push {JackTranslatorLibraryCodeGenerator._get_identifier(self, term.name)}")
 
-        # Translate each term
-        terms_vm = []
+    def visit_array_term(self, term):
+        """
+        name[index]
+        """
 
-        for term in terms:
-            terms_vm.append(JackTranslatorLibraryCodeGenerator._translate_term(self, term, subroutine_name))
+        self.vm_code.append(f"push {JackTranslatorLibraryCodeGenerator._get_identifier(self, term.name)}")
+        term.index.accept(self)
+        self.vm_code.extend(["add", "pop pointer 1", "push that 0"])
 
-        # Construct expression VM code
+    def visit_subroutine_call(self, call):
+        """
+        name(arguments) | receiver.name(arguments)
+        """
 
-        expression_vm_code.extend(terms_vm[0])
+        callee_class_name, callee_subroutine_name, variable_properties = JackTranslatorLibraryCodeGenerator._get_callee(self, call)
+        args_count = len(call.arguments)
 
+        if call.receiver is None: # Method in current class
+            self.vm_code.append("push pointer 0")
+            args_count += 1
 
+        elif variable_properties is not None: # Method accessing outside current class (through a variable)
+            variable_type, variable_kind, variable_count = variable_properties
+            self.vm_code.append(f"push {JackTranslatorLibraryCodeGenerator.SEGMENTS[variable_kind]} {variable_count}")
+            args_count += 1
 
-        if len(terms_vm) > 1:
-            expression_vm_code.extend(terms_vm[1])
+        for argument in call.arguments:
+            argument.accept(self)
 
-            for index, operation in enumerate(operations):
-                operation_vm = JackTranslatorLibraryCodeGenerator.OPERATIONS[operation]
+        self.vm_code.append(f"call {callee_class_name}.{callee_subroutine_name} {args_count}")
 
-                expression_vm_code.append(operation_vm)
+    def visit_bracket_term(self, term):
+        """
+        (expression)
+        """
 
-                try:
-                    expression_vm_code.extend(terms_vm[index + 2])
-                except:
-                    break
+        term.expression.accept(self)
 
-        return expression_vm_code
+    def visit_unary_term(self, term):
+        """
+        -term | ~term
+        """
 
+        term.term.accept(self)
+        self.vm_code.append("neg" if term.operation == "-" else "not")
 
-    def _translate_term(self, term_declaration, subroutine_name, statement=""):
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ Auxiliary translation ~~~~~~~~~~~~~~~~~~~~~~~
+    def _get_identifier(self, identifier, info=False):
         """
-        Translate a term to VM code
+        Return the correct identifier properties, handle scoping. If info, return the identifier variable - properties
         """
-        term_vm_code = []
 
-        if len(term_declaration) == 1: # Single identifier/constant
-            term_type = term_declaration[0].split()[0][1:-1]
-            term_value = JackTranslatorLibraryParser._get_tag_value(self, term_declaration[0])
+        properties = self.symbolic_table.get(identifier) # Search for the identifier declaration in current scope
 
-            if term_type == "identifier":
-                term_vm_code.append(f"push {JackTranslatorLibraryCodeGenerator._get_identifier(self, term_value, subroutine_name)}")
+        if properties is None: # Search in class scope
+            properties = self.class_symbolic_table.get(identifier)
 
-            elif term_type == "keyword":
-                if term_value in ["null", "false"]:
-                    term_vm_code.append("push constant 0")
-                elif term_value == "true":
-                    term_vm_code.extend(["push constant 1", "neg"])
-                else:
-                    term_vm_code.append("push pointer 0")
+            if properties is None:
+                raise NameError(f"Undefined variable {identifier} in {self.class_name}.{self.subroutine.name}")
 
-            elif term_type == "integerConstant":
-                term_vm_code.append(f"push constant {term_value}")
+        if info:
+            return properties
 
-            elif term_type == "stringConstant":
-                # WARNING: Not fully tested
-                string_length = len(term_value)
+        identifier_type, identifier_kind, identifier_count = properties
 
-                # Construct a new string object
-                term_vm_code.extend([f"push constant {string_length}", "call String.new 1"])
+        return f"{JackTranslatorLibraryCodeGenerator.SEGMENTS[identifier_kind]} {identifier_count}"
 
-                # For every char, append it to the string
-                for char in term_value:
-                    term_vm_code.extend([f"push constant {ord(char)}", "call String.appendChar 2"])
+    def _get_callee(self, call):
+        """
+        Return the class and the subroutine name of a called subroutine, as well as the properties of the variable it is called through (if any)
+        """
 
-        else:
-            term_value = JackTranslatorLibraryParser._get_tag_value(self, term_declaration[0])
-            next_token = JackTranslatorLibraryParser._get_tag_value(self, term_declaration[1])
+        if call.receiver is None or call.receiver == self.class_name:
+            return self.class_name, call.name, None
 
-            if  next_token in [".", "("]: # Subroutine call
-                expression_list = term_declaration[term_declaration.index("<symbol> ( </symbol>") + 2: -2]
-                expression_list_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression_list(self, expression_list, subroutine_name)
+        if call.receiver in self.symbolic_table or call.receiver in self.class_symbolic_table: # Calling a method of a variable
+            variable_properties = JackTranslatorLibraryCodeGenerator._get_identifier(self, call.receiver, info=True)
 
-                callee_class_name = term_value if next_token == '.' else ""
-                callee_subroutine_name = JackTranslatorLibraryParser._get_tag_value(self, term_declaration[2]) if next_token == '.' else term_value
-                callee = callee_class_name + '.' + callee_subroutine_name
-                
-                args_count = 0
-                subroutine_return_type = "NONE" # Start with some default value and eventually change it
-            
-                if not callee_class_name: # Method in current class
-                    term_vm_code.append('push pointer 0')
-                    callee_class_name = self.class_info[0]
-
-                    subroutine_return_type = JackTranslatorLibraryParser._get_tag_value(self, self.subroutines[callee_subroutine_name][0][1])
-                    args_count += 1
-
-                elif callee_class_name == self.class_info[0]: # Function/constructor in current class
-                    subroutine_return_type = JackTranslatorLibraryParser._get_tag_value(self, self.subroutines[callee_subroutine_name][0][1])
-
-                else: # Accessing outside current_class
-                    if callee_class_name in self.subroutines[subroutine_name][1].keys() or callee_class_name in self.class_info[1].keys(): # Method accessing outside current class 
-                        var_name = callee_class_name
-                        method = callee_subroutine_name
-                        var_properties = JackTranslatorLibraryCodeGenerator._get_identifier(self, var_name, subroutine_name, info=True)
-               
-                        callee_class_name = var_properties[0]
-                        term_vm_code.extend([f"push {'local' if var_properties[1] == 'var' else ('this' if var_properties[1] == 'field' else var_properties[1])} {var_properties[2]}"])
-                    
-                        if callee_class_name in self.std_lib.keys():
-                            subroutine_return_type = self.std_lib[callee_class_name][method][1]
-                        elif callee_class_name in self.subroutines.keys():
-                            subroutine_return_type = JackTranslatorLibraryParser._get_tag_value(self, self.subroutines[callee_subroutine_name][0][1])
-                        else:
-                            outside_class = self.global_subroutines[callee_class_name]
-                            outside_subroutine_properties = outside_class[method]
-
-                            subroutine_return_type = outside_subroutine_properties[1]
-
-                        args_count += 1
-
-                    else: # Function/constructor accessing outside current class
-                        if callee_class_name in self.std_lib.keys(): # Function/constructor in stdlib
-                            subroutine_return_type = self.std_lib[callee_class_name][callee_subroutine_name][1]
-                        else: # Function/constructor in global scope
-                            subroutine_return_type = self.global_subroutines[callee_class_name][callee_subroutine_name][1]
-               
-                for vm_command in expression_list_vm_code:
-                    term_vm_code.extend(vm_command)
-
-                args_count += len(expression_list_vm_code)
-                
-                term_vm_code.append(f"call {callee_class_name}.{callee_subroutine_name} {args_count}")
-                
-                if statement == 'do':
-                    term_vm_code.append(subroutine_return_type)
+            return variable_properties[0], call.name, variable_properties
 
-            elif next_token == "[": # varName indexing
-                array_indexing_expression = term_declaration[term_declaration.index("<symbol> [ </symbol>") + 2: -2]
-                array_indexing_expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, array_indexing_expression, subroutine_name)
+        return call.receiver, call.name, None
 
-                identifier = JackTranslatorLibraryCodeGenerator._get_identifier(self, term_value, subroutine_name)
+    def _get_return_type(self, class_name, subroutine_name):
+        """
+        Return the return type of a subroutine, searching the current class, the standard library and the global scope subroutines
+        """
 
-                term_vm_code.extend([f"push {identifier}"])
-                term_vm_code.extend(array_indexing_expression_vm_code)
-                term_vm_code.append("add")
+        if class_name == self.class_name and subroutine_name in self.class_subroutines:
+            return self.class_subroutines[subroutine_name].return_type
 
-                term_vm_code.append("pop pointer 1")
+        for subroutines_lib in [self.std_lib, self.global_subroutines]:
+            if class_name in subroutines_lib and subroutine_name in subroutines_lib[class_name]:
+                return_type = subroutines_lib[class_name][subroutine_name][1]
 
-                term_vm_code.append("push that 0")
+                if subroutines_lib is self.global_subroutines:
+                    self.dependencies[f"{class_name}.{subroutine_name}"] = return_type
 
-            elif term_value in JackTranslatorLibrary.SYNTAX_ELEMENTS["op"]: # unaryOp term
-                term_expression = term_declaration[1:]
-                
-                term_expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, term_expression, subroutine_name)
+                return return_type
 
-                term_vm_code.extend(term_expression_vm_code)
+        raise NameError(f"Unknown subroutine {class_name}.{subroutine_name} called in {self.class_name}.{self.subroutine.name}")
 
-                command_expression = "neg" if term_value == "-" else "not"
 
-                term_vm_code.append(command_expression)
+class JackTranslatorLibraryParser:
+    """
+    Parse a tokenized file (Jack) and return the corresponding abstract syntax tree (see jackSyntaxTree)
+
+    More information on the parsing logic:
+    // We start with the initializing of the class - make an instance, containing tokens (JackTranslatorLibraryToken objects) and a row_pointer (used to
+    // indicate the current working index). Then we are parsing a file - call a parsing function (in this case _parse_class()), which returns the class node.
+    // Every grammar rule is a method which consumes its tokens (only ever moving the row_pointer forward) and returns its node, calling the methods of
+    // its inner rules (e.g. expression parsing is recursive). Every token is looked at a constant number of times, so parsing is linear in the file size.
+    """
 
-            elif term_value == "(": # Bracket expression
-                term_expression = term_declaration[2:-2]
-                term_expression_vm_code = JackTranslatorLibraryCodeGenerator._translate_expression(self, term_expression, subroutine_name)
+    SUBROUTINE_KINDS = frozenset(JackTranslatorLibrary.SYNTAX_ELEMENTS["subroutines"])
+    PRIMITIVE_TYPES = frozenset(["int", "char", "boolean"])
+    KEYWORD_CONSTANTS = frozenset(["true", "false", "null", "this"])
+    BINARY_OPERATIONS = frozenset(["+", "-", "*", "/", "&", "|", "<", ">", "="])
+    UNARY_OPERATIONS = frozenset(["-", "~"])
 
-                term_vm_code.extend(term_expression_vm_code)
+    def __init__(self, tokens, file_text=""):
+        self.tokens = tokens
+        self.file_text = file_text # Only used to locate syntax errors
 
-        return term_vm_code
+        self.row_pointer = 0
 
-    def _translate_expression_list(self, expression_list_declaration, subroutine_name):
+    def parse(self):
         """
-        Translate a sequence of expressions to VM code.
-        /* WARNNING: Method not tested*/
+        Parse a single file
         """
 
-        expression_list_vm_code = []
+        return JackTranslatorLibraryParser._parse_class(self)
 
-        # expressions will contain every separate expression
-        expressions = []
+    # ~~~~~~~~~~~~~ File parsing nodes ~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        # Differentiate into expressions and operations
-        current_expression = []
-        stack = []
+    def _parse_class(self):
+        """
+        Parse a class (actually file parsing, but we know that there is only a single class in a file)
+        """
 
-        for index, tag in enumerate(expression_list_declaration):
-            
-            if "expression" in tag and " " not in tag:
-                if "/" in tag:
-                    stack.pop()
-                else:
-                    stack.append(1)
-            
-            if len(stack) > 0:
-                current_expression.append(tag)
-            else:
-                tag_value = JackTranslatorLibraryParser._get_tag_value(self, tag)
-                expressions.append(current_expression[1:])
-                current_expression = []
+        JackTranslatorLibraryParser._expect_keyword(self, "class")
+        class_name = JackTranslatorLibraryParser._expect_identifier(self)
+        JackTranslatorLibraryParser._expect_symbol(self, "{")
 
-        # Extend the expression list VM code with which individual expression VM code
+        variables = []
 
-        for expression in expressions:
-            if expression:
-                expression_list_vm_code.append(JackTranslatorLibraryCodeGenerator._translate_expression(self, expression, subroutine_name))
+        while JackTranslatorLibraryParser._get_keyword(self) in ("static", "field"):
+            variables.append(JackTranslatorLibraryParser._parse_variableDeclaration(self))
 
-        return expression_list_vm_code
+        subroutines = []
 
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~ Auxiliary translation ~~~~~~~~~~~~~~~~~~~~~~~
-    def _get_identifier(self, identifier, subroutine_name, info=False):
-        """
-        Return the correct identifier properties, handle scoping. If info, return the identifier variable - properties
-        """
-        
-        try: # Search for the identifier declaration in current scope
-            identifier = self.subroutines[subroutine_name][1][identifier]
-            
-        except KeyError: # Search in class scope
-            identifier = self.class_info[1][identifier]
-        
-        if info:
-            return identifier
+        while JackTranslatorLibraryParser._get_keyword(self) in JackTranslatorLibraryParser.SUBROUTINE_KINDS:
+            subroutines.append(JackTranslatorLibraryParser._parse_subroutineDeclaration(self))
 
-        identifier_type, identifier_kind, identifier_count = identifier[0], identifier[1], identifier[2]
-        identifier_segment = identifier_kind
-        
-        if identifier_kind == "var":
-            identifier_segment = "local"
-        elif identifier_kind == "field":
-            identifier_segment = "this"
+        JackTranslatorLibraryParser._expect_symbol(self, "}")
+
+        if self.row_pointer != len(self.tokens):
+            JackTranslatorLibraryParser._raise_error(self, "end of file")
+
+        return JackClassNode(class_name, variables, subroutines)
 
-        identifier_vm = f"{identifier_segment} {identifier_count}"
-        
-        return identifier_vm
 
-    def _get_subroutines(self):
+    def _parse_variableDeclaration(self):
         """
-        Find all name and declaration for subroutines and add them to self.subroutines
+        Node of _parse_class;_parse_subroutineDeclaration
         """
 
-        subroutine_declarations = JackTranslatorLibraryCodeGenerator._get_tag_body(self, "<subroutineDec>")
+        variable_kind = self.tokens[self.row_pointer].value
+        self.row_pointer += 1
+
+        variable_type = JackTranslatorLibraryParser._parse_type(self)
+        variable_names = [JackTranslatorLibraryParser._expect_identifier(self)]
+
+        while JackTranslatorLibraryParser._get_symbol(self) == ",":
+            self.row_pointer += 1
+            variable_names.append(JackTranslatorLibraryParser._expect_identifier(self))
 
-        for subroutine_declaration in subroutine_declarations:
-            subroutine_name = JackTranslatorLibraryParser._get_tag_value(self, subroutine_declaration[2])
+        JackTranslatorLibraryParser._expect_symbol(self, ";")
 
-            self.subroutines[subroutine_name] = [subroutine_declaration]
+        return JackVariableDeclarationNode(variable_kind, variable_type, variable_names)
 
 
-    def _get_class_info(self):
+    def _parse_subroutineDeclaration(self):
         """
-        Get class name and generate class symbolic table, which are going to be used in translation later
+        Node of _parse_class
         """
 
-        class_name = JackTranslatorLibraryParser._get_tag_value(self, self.input_commands[2])
-        
-        class_symbolic_table = {}
+        subroutine_kind = self.tokens[self.row_pointer].value
+        self.row_pointer += 1
 
-        variable_declarations = JackTranslatorLibraryCodeGenerator._get_tag_body(self, "<classVarDec>")
+        return_type = JackTranslatorLibraryParser._parse_type(self, allow_void=True)
+        subroutine_name = JackTranslatorLibraryParser._expect_identifier(self)
 
-        count = 0
-        last_kind = ""
+        # Parameter list
+        JackTranslatorLibraryParser._expect_symbol(self, "(")
 
-        for variable_declaration in variable_declarations:
-            variable_declaration = [JackTranslatorLibraryParser._get_tag_value(self, tag) for tag in variable_declaration]
+        parameters = []
 
-            variable_kind = variable_declaration[0]
+        if JackTranslatorLibraryParser._get_symbol(self) != ")":
+            parameters.append((JackTranslatorLibraryParser._parse_type(self), JackTranslatorLibraryParser._expect_identifier(self)))
 
-            if variable_kind != last_kind:
-                count = 0
+            while JackTranslatorLibraryParser._get_symbol(self) == ",":
+                self.row_pointer += 1
+                parameters.append((JackTranslatorLibraryParser._parse_type(self), JackTranslatorLibraryParser._expect_identifier(self)))
 
-            variable_type = variable_declaration[1]
+        JackTranslatorLibraryParser._expect_symbol(self, ")")
 
-            variable_names = [name for name in variable_declaration[2:] if name != ',']
+        # Subroutine body
+        JackTranslatorLibraryParser._expect_symbol(self, "{")
 
-            for variable_name in variable_names:
-                class_symbolic_table[variable_name] = [variable_type, variable_kind, count]
-                count += 1
+        variables = []
+
+        while JackTranslatorLibraryParser._get_keyword(self) == "var":
+            variables.append(JackTranslatorLibraryParser._parse_variableDeclaration(self))
 
-            last_kind = variable_kind
-            
+        statements = JackTranslatorLibraryParser._parse_statements(self)
 
-        self.class_info = [class_name, class_symbolic_table]
+        JackTranslatorLibraryParser._expect_symbol(self, "}")
 
+        return JackSubroutineNode(subroutine_kind, return_type, subroutine_name, parameters, variables, statements)
 
-    def _get_tag_body(self, tag, gap=1, field_to_search="input_commands"):
+
+    def _parse_statements(self):
         """
-        /* WARNING: Do not use this when there are possible nested structures, e.g. expression parsing */
-        Return all the statements (tags) between an opening and closing tag (the argument) in a given field (the default being self.input_commands), for every tag combination.
-        Gap is used for the cleaning of e.g. statement ending semicolons
+        Node of _parse_subroutineDeclaration;_parse_if;_parse_while
         """
 
-        if field_to_search == "input_commands":
-            field_to_search = self.input_commands
+        statements = []
+
+        while True:
+            current_token = JackTranslatorLibraryParser._get_keyword(self)
+
+            if current_token == "let":
+                statements.append(JackTranslatorLibraryParser._parse_let(self))
+
+            elif current_token == "do":
+                statements.append(JackTranslatorLibraryParser._parse_do(self))
 
-        starting_indices = JackTranslatorLibraryCodeGenerator._get_all_occurrences(field_to_search, tag)
-        ending_indices = JackTranslatorLibraryCodeGenerator._get_all_occurrences(field_to_search, JackTranslatorLibraryParser._get_closed_tag(self, tag))
+            elif current_token == "if":
+                statements.append(JackTranslatorLibraryParser._parse_if(self))
 
-        declarations = []
+            elif current_token == "while":
+                statements.append(JackTranslatorLibraryParser._parse_while(self))
 
-        for starting_index, ending_index in zip(starting_indices, ending_indices):
-            declaration = field_to_search[starting_index + 1: ending_index - gap] 
-            declarations.append(declaration)
+            elif current_token == "return":
+                statements.append(JackTranslatorLibraryParser._parse_return(self))
 
-        return declarations
+            else:
+                return statements
 
+    # ~~~~~~~~~~~~~~ General statement parsing ~~~~~~~~~~~~~~~~~
 
-    def _generate_symbolic_table(self, subroutine_name):
+    def _parse_let(self):
         """
-        Build up symbolic table for subroutine delcarations to handle identifiers type and scope problems
+        Node of _parse_statements
         """
 
-        subroutine_declaration = self.subroutines[subroutine_name][0]
-        symbolic_table = dict()
+        self.row_pointer += 1
 
-        # Parse arguments variables
-        parameter_list = JackTranslatorLibraryCodeGenerator._get_tag_body(self, "<parameterList>", gap=0, field_to_search=subroutine_declaration)
+        variable_name = JackTranslatorLibraryParser._expect_identifier(self)
+        index = None
 
-        subroutine_type = JackTranslatorLibraryParser._get_tag_value(self, subroutine_declaration[0])
+        if JackTranslatorLibraryParser._get_symbol(self) == "[":
+            self.row_pointer += 1
+            index = JackTranslatorLibraryParser._parse_expression(self)
+            JackTranslatorLibraryParser._expect_symbol(self, "]")
 
-        if subroutine_type == "method":
-            subroutine_kind = JackTranslatorLibraryParser._get_tag_value(self, subroutine_declaration[1])
-            symbolic_table["this"] = [self.class_info[0], "argument", 0]
+        JackTranslatorLibraryParser._expect_symbol(self, "=")
+        expression = JackTranslatorLibraryParser._parse_expression(self)
+        JackTranslatorLibraryParser._expect_symbol(self, ";")
 
-        if parameter_list:
-            parameter_list = parameter_list[0] # There is only one parameterList tags pair
+        return JackLetStatementNode(variable_name, index, expression)
 
-            parameter_variables = list(filter(lambda symbol: symbol != "<symbol> , </symbol>", parameter_list))
 
-            parameter_variables = [[parameter_variables[index], parameter_variables[index + 1]] for index in range(0, len(parameter_variables), 2)]
-            # /\ Transforms [type, identifier, ',', type, identifier...] into [[type, identifier], [type, identifier]...] /\
+    def _parse_do(self):
+        """
+        Node of _parse_statements
+        """
 
-            for count, var_pair in enumerate(parameter_variables):
-                if subroutine_type == "method":
-                    count += 1
+        self.row_pointer += 1
 
-                var_type, var_name = var_pair[0], var_pair[1]
-                symbolic_table[JackTranslatorLibraryParser._get_tag_value(self, var_name)] = [JackTranslatorLibraryParser._get_tag_value(self, var_type), "argument", count]
+        subroutine_call = JackTranslatorLibraryParser._parse_subroutine_call(self)
+        JackTranslatorLibraryParser._expect_symbol(self, ";")
 
+        return JackDoStatementNode(subroutine_call)
 
-        # Subroutine body variables
-        variable_declarations = JackTranslatorLibraryCodeGenerator._get_tag_body(self, "<varDec>", field_to_search=subroutine_declaration)
 
-        count = 0
+    def _parse_if(self):
+        """
+        Node of _parse_statements
+        """
 
-        for variable_declaration in variable_declarations:
-            variable_declaration = [JackTranslatorLibraryParser._get_tag_value(self, tag) for tag in variable_declaration]
+        self.row_pointer += 1
 
-            variable_type = variable_declaration[1]
-            variable_kind = variable_declaration[0]
+        condition = JackTranslatorLibraryParser._parse_condition(self)
+        statements = JackTranslatorLibraryParser._parse_block(self)
+        else_statements = None
 
-            variable_names = [name for name in variable_declaration[2:] if name != ',']
+        if JackTranslatorLibraryParser._get_keyword(self) == "else":
+            self.row_pointer += 1
+            else_statements = JackTranslatorLibraryParser._parse_block(self)
 
-            for variable_name in variable_names:
-                symbolic_table[variable_name] = [variable_type, variable_kind, count]
-                count += 1
+        return JackIfStatementNode(condition, statements, else_statements)
 
-        return symbolic_table
 
-    def _strip_input_commands(self):
+    def _parse_while(self):
         """
-        Remove every \n for easier work
+        Node of _parse_statements
         """
 
-        for index, line in enumerate(self.input_commands):
-            self.input_commands[index] = line.rstrip()
+        self.row_pointer += 1
 
-    def _get_all_occurrences(elements_list, element):
-        """
-        Return all occurrences of a given element in elements_list
-        """
-        
-        index_list = []
-        index_position = 0
+        condition = JackTranslatorLibraryParser._parse_condition(self)
+        statements = JackTranslatorLibraryParser._parse_block(self)
 
-        while True:
-            try:
-                index_position = elements_list.index(element, index_position)
-                index_list.append(index_position)
-                index_position += 1
-            except ValueError as e:
-                break
+        return JackWhileStatementNode(condition, statements)
 
-        return index_list
 
-    def _get_global_subroutine_identifiers(self):
+    def _parse_return(self):
         """
-        Construct global scope subroutine identifiers
+        Node of _parse_statements
         """
 
-        identifiers = []
-        
-        if str(type(self.global_subroutines)) == "<class 'dict'>":
-            for class_name, subroutine_declarations in self.global_subroutines.items():
-                for subroutine_name in subroutine_declarations.keys():
-                    identifiers.append(f"{class_name}.{subroutine_name}")
+        self.row_pointer += 1
 
-        return identifiers
+        expression = None
 
-class JackTranslatorLibraryParser:
-    """
-    Parse a cleaned, tokenized and classified file (Jack) and return the corresponding XML code
+        if JackTranslatorLibraryParser._get_symbol(self) != ";":
+            expression = JackTranslatorLibraryParser._parse_expression(self)
 
-    More information on the parsing logic:
-    // We start with the initializing of the class - make an instance, containing tokens (classified Jack keywords) and a row_pointer (used to
-    // indicate the current working index).Then we are parsing a file - call a parsing function (in this case _parse_class()) and then write the
-    // modified tokens to the file. The work of the _parse_class() function on the other side is pretty interesting - we start calling another
-    // inner functions, which call another inner functions. The whole proccess of parsing a file is sequential
-    // with recursive elements (e.g. expression parsing).
-    """
+        JackTranslatorLibraryParser._expect_symbol(self, ";")
 
-    def __init__(self, input_file_name):
-        self.input_file_name = input_file_name
-        self.input_file = open(input_file_name, 'r')
-        self.tokens = self.input_file.readlines()
+        return JackReturnStatementNode(expression)
 
-        self.row_pointer = 0
+    # ~~~~~~~~~~~~ Statement auxiliary parsing ~~~~~~~~~~~~~~~~~
 
-    def parse(self):
+    def _parse_condition(self):
         """
-        Parse a single file
+        Node of _parse_if;_parse_while - (expression)
         """
 
-        JackTranslatorLibraryParser._parse_class(self)
+        JackTranslatorLibraryParser._expect_symbol(self, "(")
+        condition = JackTranslatorLibraryParser._parse_expression(self)
+        JackTranslatorLibraryParser._expect_symbol(self, ")")
+
+        return condition
+
 
-        with open(self.input_file_name, 'w') as input_file:
-            input_file.seek(0)
+    def _parse_block(self):
+        """
+        Node of _parse_if;_parse_while - { statements }
+        """
 
-            for line in self.tokens:
-                input_file.write(line)
+        JackTranslatorLibraryParser._expect_symbol(self, "{")
+        statements = JackTranslatorLibraryParser._parse_statements(self)
+        JackTranslatorLibraryParser._expect_symbol(self, "}")
 
-            input_file.truncate()
+        return statements
 
-    # ~~~~~~~~~~~~~ File parsing nodes ~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    def _parse_class(self):
+    def _parse_expression(self):
         """
-        Parse a class (actually file parsing, but we know that there is only a single class in a file)
+        Node of _parse_let;if;while;return;_parse_expression_list;_parse_term
         """
 
-        tag = "<class>\n"
+        terms = [JackTranslatorLibraryParser._parse_term(self)]
+        operations = []
 
-        self.tokens.insert(self.row_pointer, tag)
-        self.tokens.insert(len(self.tokens), JackTranslatorLibraryParser._get_closed_tag(self, tag))
+        while JackTranslatorLibraryParser._get_symbol(self) in JackTranslatorLibraryParser.BINARY_OPERATIONS:
+            operations.append(self.tokens[self.row_pointer].value)
+            self.row_pointer += 1
 
-        self.row_pointer += 4
+            terms.append(JackTranslatorLibraryParser._parse_term(self))
 
-        JackTranslatorLibraryParser._parse_variableDeclarations(self, class_vars=True)
-        JackTranslatorLibraryParser._parse_subroutineDeclarations(self)
+        return JackExpressionNode(terms, operations)
 
 
-    def _parse_variableDeclarations(self, class_vars=False):
+    def _parse_expression_list(self):
         """
-        Node of _parse_class
+        Node of _parse_subroutine_call
         """
 
-        tag = "<classVarDec>\n" if class_vars else "<varDec>\n"
-        body = self.tokens[self.row_pointer:]
-
-        for token in body:
-            token_value = JackTranslatorLibraryParser._get_tag_value(self, token)
+        expressions = []
 
-            if token_value == "var" or token_value == "static" or token_value == "field":
-                self.tokens.insert(self.row_pointer, tag)
-                self.row_pointer += 1
+        if JackTranslatorLibraryParser._get_symbol(self) == ")":
+            return expressions
 
-            if token_value == ";":
-                self.tokens.insert(self.row_pointer + 1, JackTranslatorLibraryParser._get_closed_tag(self, tag))
-                self.row_pointer += 1
+        expressions.append(JackTranslatorLibraryParser._parse_expression(self))
 
+        while JackTranslatorLibraryParser._get_symbol(self) == ",":
             self.row_pointer += 1
+            expressions.append(JackTranslatorLibraryParser._parse_expression(self))
 
-            if class_vars:
-                if token_value in JackTranslatorLibrary.SYNTAX_ELEMENTS["subroutines"]:
-                    self.row_pointer -= 1
-                    break
-            else:
-                if token_value in JackTranslatorLibrary.SYNTAX_ELEMENTS["statements"]:
-                    self.row_pointer -= 1
-                    break
+        return expressions
 
 
-    def _parse_subroutineDeclarations(self):
+    def _parse_subroutine_call(self):
         """
-        Node of _parse_class
+        Node of _parse_do;_parse_term
         """
 
-        current_token = self.tokens[self.row_pointer]
+        subroutine_name = JackTranslatorLibraryParser._expect_identifier(self)
+        receiver = None
 
-        while current_token != "</class>\n" and current_token != "<symbol> } </symbol>\n":
-            JackTranslatorLibraryParser._parse_subroutineDeclaration(self)
-            current_token = self.tokens[self.row_pointer]
+        if JackTranslatorLibraryParser._get_symbol(self) == ".":
+            self.row_pointer += 1
+            receiver = subroutine_name
+            subroutine_name = JackTranslatorLibraryParser._expect_identifier(self)
 
+        JackTranslatorLibraryParser._expect_symbol(self, "(")
+        arguments = JackTranslatorLibraryParser._parse_expression_list(self)
+        JackTranslatorLibraryParser._expect_symbol(self, ")")
 
-    def _parse_subroutineDeclaration(self):
+        return JackSubroutineCallNode(receiver, subroutine_name, arguments)
+
+
+    def _parse_term(self):
         """
-        Node of _parse_subroutineDeclarations
+        Node of _parse_expression
         """
 
-        dec_tag = "<subroutineDec>\n"
-        param_list_tag = "<parameterList>\n"
+        if self.row_pointer >= len(self.tokens):
+            JackTranslatorLibraryParser._raise_error(self, "a term")
 
-        self.tokens.insert(self.row_pointer, dec_tag)
-        self.row_pointer += 1
+        current_token = self.tokens[self.row_pointer]
+        token_kind = current_token.kind
 
-        subroutine_tokens = self.tokens[self.row_pointer:]
+        if token_kind == JackTranslatorLibraryToken.INTEGER_CONSTANT or token_kind == JackTranslatorLibraryToken.STRING_CONSTANT or \
+           (token_kind == JackTranslatorLibraryToken.KEYWORD and current_token.value in JackTranslatorLibraryParser.KEYWORD_CONSTANTS): # Constant
+            self.row_pointer += 1
+            return JackConstantTermNode(token_kind, current_token.value)
 
-        for index, token in enumerate(subroutine_tokens):
-            token_value = JackTranslatorLibraryParser._get_tag_value(self, token)
+        if token_kind == JackTranslatorLibraryToken.SYMBOL:
+            if current_token.value == "(": # Expression in brackets
+                self.row_pointer += 1
+                expression = JackTranslatorLibraryParser._parse_expression(self)
+                JackTranslatorLibraryParser._expect_symbol(self, ")")
 
-            if token_value == "(":
-                if JackTranslatorLibraryParser._get_tag_value(self, subroutine_tokens[index + 1]) == ")":
-                    self.row_pointer += 3
-                    break
-                else:
-                    self.row_pointer += 1
-                    self.tokens.insert(self.row_pointer, param_list_tag)
-            elif token_value == ")":
-                self.tokens.insert(self.row_pointer,
-                                   JackTranslatorLibraryParser._get_closed_tag(self, param_list_tag))
-                self.row_pointer += 3
-                break
+                return JackBracketTermNode(expression)
 
-            self.row_pointer += 1
+            if current_token.value in JackTranslatorLibraryParser.UNARY_OPERATIONS: # Unary op
+                self.row_pointer += 1
+                return JackUnaryTermNode(current_token.value, JackTranslatorLibraryParser._parse_term(self))
+
+        if token_kind != JackTranslatorLibraryToken.IDENTIFIER:
+            JackTranslatorLibraryParser._raise_error(self, "a term")
+
+        next_token = self.tokens[self.row_pointer + 1].value if self.row_pointer + 1 < len(self.tokens) else None
 
-        JackTranslatorLibraryParser._parse_subroutineBody(self)
+        if next_token == "[": # Array accessing
+            self.row_pointer += 2
+            index = JackTranslatorLibraryParser._parse_expression(self)
+            JackTranslatorLibraryParser._expect_symbol(self, "]")
+
+            return JackArrayTermNode(current_token.value, index)
+
+        if next_token == "(" or next_token == ".": # Subroutine call
+            return JackTranslatorLibraryParser._parse_subroutine_call(self)
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, dec_tag))
+        # Single variable
         self.row_pointer += 1
+        return JackVariableTermNode(current_token.value)
 
 
-    def _parse_subroutineBody(self):
+    def _parse_type(self, allow_void=False):
         """
-        Node of _parse_subroutineDeclaration
+        Node of _parse_variableDeclaration;_parse_subroutineDeclaration - a primitive type (or void) or a class name
         """
 
-        tag = "<subroutineBody>\n"
+        if self.row_pointer < len(self.tokens):
+            current_token = self.tokens[self.row_pointer]
 
-        self.tokens.insert(self.row_pointer, tag)
+            if (current_token.kind == JackTranslatorLibraryToken.IDENTIFIER) or (current_token.kind == JackTranslatorLibraryToken.KEYWORD and
+               (current_token.value in JackTranslatorLibraryParser.PRIMITIVE_TYPES or (allow_void and current_token.value == "void"))):
+                self.row_pointer += 1
+                return current_token.value
 
-        self.row_pointer += 1
+        JackTranslatorLibraryParser._raise_error(self, "a type")
 
-        JackTranslatorLibraryParser._parse_variableDeclarations(self)
+    # ~~~~~~~~~~~ Token auxiliary ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        JackTranslatorLibraryParser._parse_statements(self)
+    def _get_symbol(self):
+        """
+        Return the value of the current token if it is a symbol, None otherwise
+        """
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, tag))
-        self.row_pointer += 1
+        if self.row_pointer < len(self.tokens):
+            current_token = self.tokens[self.row_pointer]
 
+            if current_token.kind == JackTranslatorLibraryToken.SYMBOL:
+                return current_token.value
 
-    def _parse_statements(self, stop_value = "</subroutineDec>\n"):
-        """
-        Node of _parse_subroutineBody
-        """
+        return None
 
-        tag = "<statements>\n"
 
-        self.tokens.insert(self.row_pointer, tag)
-        self.row_pointer += 1
-        
-       
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
-        current_token_full = self.tokens[self.row_pointer]
+    def _get_keyword(self):
+        """
+        Return the value of the current token if it is a keyword, None otherwise
+        """
 
-        while current_token_full != stop_value:
-            statement_type = current_token + "Statement" if current_token != "return" else "ReturnStatement"
-            statement_tag = f"<{statement_type}>\n"
+        if self.row_pointer < len(self.tokens):
+            current_token = self.tokens[self.row_pointer]
 
-            self.tokens.insert(self.row_pointer, statement_tag)
-            self.row_pointer += 1
+            if current_token.kind == JackTranslatorLibraryToken.KEYWORD:
+                return current_token.value
 
-            if current_token == "let":
-                JackTranslatorLibraryParser._parse_let(self)
+        return None
 
-            elif current_token == "do":
-                JackTranslatorLibraryParser._parse_do(self)
 
-            elif current_token == "if":
-                JackTranslatorLibraryParser._parse_if(self)
+    def _expect_symbol(self, symbol):
+        """
+        Consume the current token, which should be the given symbol
+        """
 
-            elif current_token == "while":
-                JackTranslatorLibraryParser._parse_while(self)
+        if JackTranslatorLibraryParser._get_symbol(self) != symbol:
+            JackTranslatorLibraryParser._raise_error(self, f"'{symbol}'")
 
-            elif current_token == "return":
-                JackTranslatorLibraryParser._parse_return(self)
+        self.row_pointer += 1
 
-                current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
-                next_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer + 1])
-                self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, statement_tag))
 
-                # Find out if this is an ending subroutine declaration return
-                if next_token in ["function", "method", "constructor", "</class>\n"]: # Ending statement
-                    self.row_pointer += 2
-                else:
-                    self.row_pointer += 1
-                
-                # It is meaningless to have statements after the current return, so we just skip them
-                # WARNING: The program might break if you try to parse statements in the current statements block after a return
-                break
+    def _expect_keyword(self, keyword):
+        """
+        Consume the current token, which should be the given keyword
+        """
 
-            self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, statement_tag))
-            self.row_pointer += 1
+        if JackTranslatorLibraryParser._get_keyword(self) != keyword:
+            JackTranslatorLibraryParser._raise_error(self, f"'{keyword}'")
 
-            current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
-            current_token_full = self.tokens[self.row_pointer]
+        self.row_pointer += 1
 
-            if current_token == "}": # In case we don't have a return
-                next_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer + 1])
 
-                if next_token in ["function", "method", "constructor", "</class>\n"]: # Ending subroutine declaration statement
-                    self.row_pointer += 1
+    def _expect_identifier(self):
+        """
+        Consume the current token, which should be an identifier, and return its value
+        """
 
-                break
+        if self.row_pointer >= len(self.tokens) or self.tokens[self.row_pointer].kind != JackTranslatorLibraryToken.IDENTIFIER:
+            JackTranslatorLibraryParser._raise_error(self, "an identifier")
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, tag))
         self.row_pointer += 1
 
-    # ~~~~~~~~~~~~~~ General statement parsing ~~~~~~~~~~~~~~~~~
+        return self.tokens[self.row_pointer - 1].value
 
-    def _parse_let(self):
+
+    def _raise_error(self, expected):
         """
-        Node of _parse_statements
+        Raise a SyntaxError, pointing at the current token
         """
 
-        self.row_pointer += 2
+        if self.row_pointer >= len(self.tokens):
+            raise SyntaxError(f"Expected {expected}, reached the end of the file")
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+        current_token = self.tokens[self.row_pointer]
+        line, column = JackTranslatorLibraryTokenizer.get_position(self.file_text, current_token.offset)
 
-        if current_token == "=":
-            if JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer + 1]) == "new":
-                self.row_pointer += 1
+        raise SyntaxError(f"Expected {expected}, got '{current_token.value}' at line {line}, column {column}")
 
-            self.row_pointer += 1
-            JackTranslatorLibraryParser._parse_expression(self)
-            self.row_pointer += 1
 
-        else:
-            self.row_pointer += 1
-            JackTranslatorLibraryParser._parse_expression(self)
-            self.row_pointer += 2
+class JackTranslatorLibraryXML:
+    """
+    Serialize an abstract syntax tree as a .xml file - the tokens of the class wrapped in their structural tags
+
+    More information on the writing logic:
+    // The tree is walked by generators, which yield the lines of the document one by one - structural tags ("<letStatement>") and
+    // classified tokens ("<keyword> let </keyword>"). The writer indents every line while consuming them and sends it to a buffered
+    // file, so the whole document is never kept in memory. The layout is the one the compiler has always produced - e.g. the closing
+    // bracket of a subroutine is placed inside its <statements> tag, unless it is the last subroutine of the class (then it is placed
+    // right before the closing bracket of the class).
+    """
 
-            JackTranslatorLibraryParser._parse_expression(self)
-            self.row_pointer += 1
+    BUFFER_SIZE = 1 << 16
 
+    SYMBOL_TAGS = {symbol: f"<symbol> {symbol} </symbol>" for symbol in JackTranslatorLibrary.SYNTAX_ELEMENTS["symbols"]}
+    KEYWORD_TAGS = {keyword: f"<keyword> {keyword} </keyword>" for keyword in JackTranslatorLibrary.SYNTAX_ELEMENTS["keywords"]}
 
-    def _parse_do(self):
+    def write(output_file_name, class_node):
         """
-        Node of _parse_statements
+        Write the .xml file of a class, indenting every tag between two upper tags (keeping the nested depth)
         """
 
-        self.row_pointer += 1
+        indentations = [""]
 
-        next_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer + 1])
+        with open(output_file_name, 'w', buffering=JackTranslatorLibraryXML.BUFFER_SIZE) as output_file:
+            write = output_file.write
+            depth = 0
 
-        if next_token == ".":  # Method call
-            self.row_pointer += 4
-        else:  # Function call
-            self.row_pointer += 2
+            for line in JackTranslatorLibraryXML._iterate_class(class_node):
+                if " " in line: # Token
+                    write(indentations[depth] + line + "\n")
 
-        JackTranslatorLibraryParser._parse_expression_list(self)
+                elif line[1] == "/": # Closing tag
+                    depth -= 1
+                    write(indentations[depth] + line + "\n")
 
-        self.row_pointer += 2
+                else: # Opening tag
+                    write(indentations[depth] + line + "\n")
+                    depth += 1
 
+                    if depth == len(indentations):
+                        indentations.append("\t" * depth)
 
-    def _parse_if(self):
+    def _iterate_class(class_node):
         """
-        Node of _parse_statements
+        class name { variables subroutines }
         """
 
-        self.row_pointer += 2
-
-        JackTranslatorLibraryParser._parse_expression(self)
+        yield "<class>"
+        yield JackTranslatorLibraryXML.KEYWORD_TAGS["class"]
+        yield JackTranslatorLibraryXML._get_identifier(class_node.name)
+        yield JackTranslatorLibraryXML.SYMBOL_TAGS["{"]
 
-        self.row_pointer += 2
+        for variable_declaration in class_node.variables:
+            yield from JackTranslatorLibraryXML._iterate_variable_declaration(variable_declaration, "classVarDec")
 
-        JackTranslatorLibraryParser._parse_statements(self, stop_value="<symbol> } </symbol>\n")
+        for index, subroutine in enumerate(class_node.subroutines):
+            yield from JackTranslatorLibraryXML._iterate_subroutine(subroutine, index == len(class_node.subroutines) - 1)
 
-        self.row_pointer += 1
+        yield JackTranslatorLibraryXML.SYMBOL_TAGS["}"]
+        yield "</class>"
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+    def _iterate_variable_declaration(variable_declaration, tag):
+        """
+        kind type name1, name2...;
+        """
 
-        if current_token == "else":
-            self.row_pointer += 2
+        yield f"<{tag}>"
+        yield JackTranslatorLibraryXML.KEYWORD_TAGS[variable_declaration.kind]
+        yield JackTranslatorLibraryXML._get_type(variable_declaration.type)
 
-            JackTranslatorLibraryParser._parse_statements(self, stop_value="<symbol> } </symbol>\n")
+        for index, variable_name in enumerate(variable_declaration.names):
+            if index:
+                yield JackTranslatorLibraryXML.SYMBOL_TAGS[","]
 
-            self.row_pointer += 1
+            yield JackTranslatorLibraryXML._get_identifier(variable_name)
 
+        yield JackTranslatorLibraryXML.SYMBOL_TAGS[";"]
+        yield f"</{tag}>"
 
-    def _parse_while(self):
+    def _iterate_subroutine(subroutine, last_subroutine):
         """
-        Node of _parse_statements
+        kind type name (parameters) { variables statements }
         """
 
-        self.row_pointer += 2
+        symbols = JackTranslatorLibraryXML.SYMBOL_TAGS
 
-        JackTranslatorLibraryParser._parse_expression(self)
+        yield "<subroutineDec>"
+        yield JackTranslatorLibraryXML.KEYWORD_TAGS[subroutine.kind]
+        yield JackTranslatorLibraryXML._get_type(subroutine.return_type)
+        yield JackTranslatorLibraryXML._get_identifier(subroutine.name)
+        yield symbols["("]
 
-        self.row_pointer += 2
+        if subroutine.parameters:
+            yield "<parameterList>"
 
-        JackTranslatorLibraryParser._parse_statements(self, stop_value="<symbol> } </symbol>\n")
+            for index, (parameter_type, parameter_name) in enumerate(subroutine.parameters):
+                if index:
+                    yield symbols[","]
 
-        self.row_pointer += 1
+                yield JackTranslatorLibraryXML._get_type(parameter_type)
+                yield JackTranslatorLibraryXML._get_identifier(parameter_name)
 
+            yield "</parameterList>"
 
-    def _parse_return(self):
-        """
-        Node of _parse_statements
-        """
-
-        self.row_pointer += 1
+        yield symbols[")"]
+        yield symbols["{"]
+        yield "<subroutineBody>"
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+        for variable_declaration in subroutine.variables:
+            yield from JackTranslatorLibraryXML._iterate_variable_declaration(variable_declaration, "varDec")
 
-        if current_token == ";":
-            self.row_pointer += 1
-            return
+        yield "<statements>"
+        yield from JackTranslatorLibraryXML._iterate_statements(subroutine.statements)
 
-        JackTranslatorLibraryParser._parse_expression(self)
-        self.row_pointer += 1
-        
-    # ~~~~~~~~~~~~ Statement auxiliary parsing ~~~~~~~~~~~~~~~~~
+        if last_subroutine:
+            yield from ["</statements>", "</subroutineBody>", "</subroutineDec>", symbols["}"]]
+        else:
+            yield from [symbols["}"], "</statements>", "</subroutineBody>", "</subroutineDec>"]
 
-    def _parse_expression(self):
+    def _iterate_block(statements):
         """
-        Node of _parse_expressionList
+        { statements }
         """
 
-        tag = "<expression>\n"
+        yield JackTranslatorLibraryXML.SYMBOL_TAGS["{"]
+        yield "<statements>"
+        yield from JackTranslatorLibraryXML._iterate_statements(statements)
+        yield "</statements>"
+        yield JackTranslatorLibraryXML.SYMBOL_TAGS["}"]
 
-        self.tokens.insert(self.row_pointer, tag)
-        self.row_pointer += 1
+    def _iterate_statements(statements):
+        """
+        Every statement, wrapped in its own tag
+        """
 
-        JackTranslatorLibraryParser._parse_term(self)
+        symbols = JackTranslatorLibraryXML.SYMBOL_TAGS
+        keywords = JackTranslatorLibraryXML.KEYWORD_TAGS
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+        for statement in statements:
+            statement_class = statement.__class__
 
-        while current_token in JackTranslatorLibrary.SYNTAX_ELEMENTS["op"]:
-            self.row_pointer += 1
+            if statement_class is JackLetStatementNode:
+                yield "<letStatement>"
+                yield keywords["let"]
+                yield JackTranslatorLibraryXML._get_identifier(statement.name)
 
-            JackTranslatorLibraryParser._parse_term(self)
-            current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+                if statement.index is not None:
+                    yield symbols["["]
+                    yield from JackTranslatorLibraryXML._iterate_expression(statement.index)
+                    yield symbols["]"]
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, tag))
-        self.row_pointer += 1
+                yield symbols["="]
+                yield from JackTranslatorLibraryXML._iterate_expression(statement.expression)
+                yield symbols[";"]
+                yield "</letStatement>"
 
+            elif statement_class is JackIfStatementNode:
+                yield "<ifStatement>"
+                yield keywords["if"]
+                yield symbols["("]
+                yield from JackTranslatorLibraryXML._iterate_expression(statement.condition)
+                yield symbols[")"]
+                yield from JackTranslatorLibraryXML._iterate_block(statement.statements)
 
-    def _parse_expression_list(self):
-        """
-        Node of _parse_let;do;if;while;return
-        """
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+                if statement.else_statements is not None:
+                    yield keywords["else"]
+                    yield from JackTranslatorLibraryXML._iterate_block(statement.else_statements)
 
-        if current_token == ")":
-            return
+                yield "</ifStatement>"
 
-        tag = "<expressionList>\n"
+            elif statement_class is JackWhileStatementNode:
+                yield "<whileStatement>"
+                yield keywords["while"]
+                yield symbols["("]
+                yield from JackTranslatorLibraryXML._iterate_expression(statement.condition)
+                yield symbols[")"]
+                yield from JackTranslatorLibraryXML._iterate_block(statement.statements)
+                yield "</whileStatement>"
 
-        self.tokens.insert(self.row_pointer, tag)
-        self.row_pointer += 1
+            elif statement_class is JackDoStatementNode:
+                yield "<doStatement>"
+                yield keywords["do"]
+                yield from JackTranslatorLibraryXML._iterate_subroutine_call(statement.call)
+                yield symbols[";"]
+                yield "</doStatement>"
 
-        JackTranslatorLibraryParser._parse_expression(self)
+            else:
+                yield "<ReturnStatement>"
+                yield keywords["return"]
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+                if statement.expression is not None:
+                    yield from JackTranslatorLibraryXML._iterate_expression(statement.expression)
 
-        while current_token == ",":
-            self.row_pointer += 1
+                yield symbols[";"]
+                yield "</ReturnStatement>"
+
+    def _iterate_expression(expression):
+        """
+        term1 operation1 term2...
+        """
 
-            JackTranslatorLibraryParser._parse_expression(self)
-            current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
+        yield "<expression>"
+        yield from JackTranslatorLibraryXML._iterate_term(expression.terms[0])
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, tag))
-        self.row_pointer += 1
+        for operation, term in zip(expression.operations, expression.terms[1:]):
+            yield JackTranslatorLibraryXML.SYMBOL_TAGS[operation]
+            yield from JackTranslatorLibraryXML._iterate_term(term)
 
+        yield "</expression>"
 
-    def _parse_term(self):
+    def _iterate_subroutine_call(subroutine_call):
         """
-        Node of _parse_expression
+        receiver.name(expression1, expression2...)
         """
 
-        tag = "<term>\n"
+        symbols = JackTranslatorLibraryXML.SYMBOL_TAGS
 
-        current_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer])
-        current_token_type = self.tokens[self.row_pointer].split(" ")[0][1:-1]
+        if subroutine_call.receiver is not None:
+            yield JackTranslatorLibraryXML._get_identifier(subroutine_call.receiver)
+            yield symbols["."]
 
-        next_token = JackTranslatorLibraryParser._get_tag_value(self, self.tokens[self.row_pointer + 1])
+        yield JackTranslatorLibraryXML._get_identifier(subroutine_call.name)
+        yield symbols["("]
 
-        self.tokens.insert(self.row_pointer, tag)
-        self.row_pointer += 1
+        if subroutine_call.arguments:
+            yield "<expressionList>"
 
-        if next_token == '[': # Array accessing
-            self.row_pointer += 2
+            for index, argument in enumerate(subroutine_call.arguments):
+                if index:
+                    yield symbols[","]
 
-            JackTranslatorLibraryParser._parse_expression(self)
-            self.row_pointer += 1
+                yield from JackTranslatorLibraryXML._iterate_expression(argument)
 
-        elif current_token == "(": # Expression in brackets
-            self.row_pointer += 1
+            yield "</expressionList>"
 
-            JackTranslatorLibraryParser._parse_expression(self)
-            self.row_pointer += 1
+        yield symbols[")"]
 
-        elif current_token == "-" or current_token == "~":  # Unary op
-            self.row_pointer += 1
-            JackTranslatorLibraryParser._parse_term(self)
+    def _iterate_term(term):
+        """
+        A single term, wrapped in a term tag
+        """
 
-        elif next_token == "(" or next_token == ".":  # Subroutine call
-            if next_token == ".":  # Method call
-                self.row_pointer += 4
-            else:  # Function call
-                self.row_pointer += 2
+        symbols = JackTranslatorLibraryXML.SYMBOL_TAGS
+        term_class = term.__class__
 
-            JackTranslatorLibraryParser._parse_expression_list(self)
-            self.row_pointer += 1
+        yield "<term>"
 
-        else: # Single variable
-            self.row_pointer += 1
+        if term_class is JackConstantTermNode:
+            yield JackTranslatorLibraryToken(term.kind, term.value, -1).get_tag()
 
-        self.tokens.insert(self.row_pointer, JackTranslatorLibraryParser._get_closed_tag(self, tag))
-        self.row_pointer += 1
+        elif term_class is JackVariableTermNode:
+            yield JackTranslatorLibraryXML._get_identifier(term.name)
+
+        elif term_class is JackArrayTermNode:
+            yield JackTranslatorLibraryXML._get_identifier(term.name)
+            yield symbols["["]
+            yield from JackTranslatorLibraryXML._iterate_expression(term.index)
+            yield symbols["]"]
+
+        elif term_class is JackSubroutineCallNode:
+            yield from JackTranslatorLibraryXML._iterate_subroutine_call(term)
 
-    # ~~~~~~~~~~~ Tag auxiliary ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        elif term_class is JackBracketTermNode:
+            yield symbols["("]
+            yield from JackTranslatorLibraryXML._iterate_expression(term.expression)
+            yield symbols[")"]
 
-    def _get_closed_tag(self, tag):
+        else:
+            yield symbols[term.operation]
+            yield from JackTranslatorLibraryXML._iterate_term(term.term)
+
+        yield "</term>"
+
+    def _get_identifier(name):
         """
-        Appends '/' in the second place of the input
+        Return a classified identifier
         """
 
-        tag_list = list(tag)
-        tag_list.insert(1, "/")
-        return "".join(tag_list)
+        return f"<identifier> {name} </identifier>"
 
-
-    def _get_tag_value(self, tag):
+    def _get_type(type_name):
         """
-        Returns mediocre keyword
+        Return a classified type - a keyword for the primitive types and void, an identifier for class names
         """
-        try:
-            splitted_tag = tag.split()
 
-            tag_type = splitted_tag[0]
+        keyword_tag = JackTranslatorLibraryXML.KEYWORD_TAGS.get(type_name)
 
-            if tag_type == "<stringConstant>":
-                tag_part = tag[tag.index(">") + 3:]
-                return tag_part[:tag_part.index("<") - 2]
-            else:
-                return splitted_tag[1]
-        except:
-            return tag
+        return keyword_tag if keyword_tag is not None else JackTranslatorLibraryXML._get_identifier(type_name)
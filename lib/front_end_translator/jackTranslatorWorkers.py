@@ -0,0 +1,170 @@
+# Worker processes of the parallel (jobs > 1) Jack translation. @DimitarYordanov17
+
+from lib.front_end_translator.jackTranslatorLibrary import JackTranslatorLibrary
+import multiprocessing
+
+
+class JackTranslatorWorkers:
+    """
+    Main class, translating .jack files with up to jobs long-lived worker processes. The translation needs the signatures of every file before any file
+    can be translated, so every worker works in two steps:
+
+    parse: the worker parses its share of the files and sends back only their subroutines, keeping the abstract syntax trees
+    translate: the worker receives the global scope subroutines (once per worker) and translates its share of the files - the files it parsed
+    (with the kept trees) and a share of the files, which were not parsed (e.g. ones already in the signature index)
+
+    So every file is tokenized and parsed exactly once and neither the trees nor the global scope subroutines are sent per file. The shares are
+    balanced by the length of the file texts. Nothing is started until there is work - an instance, which was not used, costs nothing
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.workers = [] # [(process, connection, the files it parsed)]
+
+    def parse(self, file_texts):
+        """
+        Parse {file_name: Jack code} in the workers, returning {file_name: file subroutines}. An error in a file is raised (the first one, in file order)
+        """
+
+        JackTranslatorWorkers._start(self, JackTranslatorWorkers._split(file_texts, min(self.jobs, len(file_texts))))
+
+        return JackTranslatorWorkers._receive(self, file_texts)
+
+    def translate(self, file_texts, global_scope_subroutines, keep_syntax_tree):
+        """
+        Translate {file_name: Jack code} in the workers (reusing the trees of the parsed files), returning {file_name: (abstract syntax tree (None, if not
+        keep_syntax_tree), VM code, dependencies)} - the results of JackTranslator._translate_file
+        """
+
+        if not self.workers:
+            JackTranslatorWorkers._start(self, [{} for _ in range(min(self.jobs, len(file_texts)))])
+            JackTranslatorWorkers._receive(self, {})
+
+        shares = [{file_name: file_texts[file_name] for file_name in parsed_files if file_name in file_texts} for _, _, parsed_files in self.workers]
+        unparsed_files = {file_name: file_text for file_name, file_text in file_texts.items() if not any(file_name in share for share in shares)}
+
+        for share, unparsed_share in zip(shares, JackTranslatorWorkers._split(unparsed_files, len(shares), shares)):
+            share.update(unparsed_share)
+
+        for (_, connection, _), share in zip(self.workers, shares):
+            connection.send((global_scope_subroutines, share, keep_syntax_tree))
+
+        return JackTranslatorWorkers._receive(self, file_texts)
+
+    def close(self):
+        """
+        Stop the workers (the ones still waiting for files to translate are told to quit)
+        """
+
+        for process, connection, _ in self.workers:
+            try:
+                connection.send(None)
+            except OSError: # The worker already finished
+                pass
+
+            connection.close()
+            process.join()
+
+        self.workers = []
+
+    def _start(self, shares):
+        """
+        Start a worker for every share of files to parse
+        """
+
+        for share in shares:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=JackTranslatorWorkers._work, args=(worker_connection, share), daemon=True)
+            process.start()
+            worker_connection.close()
+
+            self.workers.append((process, connection, set(share)))
+
+    def _receive(self, file_texts):
+        """
+        Receive a result of every worker, returning the merged {file_name: result} in the order of the files, raising the first error (in file order)
+        """
+
+        results = {}
+        errors = {}
+
+        for process, connection, _ in self.workers:
+            try:
+                worker_results, error = connection.recv()
+            except EOFError:
+                raise RuntimeError(f"A translation worker process exited unexpectedly (exit code {process.exitcode})")
+
+            results.update(worker_results)
+
+            if error is not None:
+                errors[error[0]] = error[1]
+
+        for file_name in file_texts:
+            if file_name in errors:
+                raise errors[file_name]
+
+        return {file_name: results[file_name] for file_name in file_texts}
+
+    def _split(file_texts, count, shares=None):
+        """
+        Split {file_name: Jack code} into count shares of about the same total text length (added to the lengths of the given shares)
+        """
+
+        new_shares = [{} for _ in range(count)]
+        lengths = [sum(map(len, share.values())) for share in shares] if shares is not None else [0] * count
+
+        for file_name in sorted(file_texts, key=lambda file_name: len(file_texts[file_name]), reverse=True):
+            shortest = lengths.index(min(lengths))
+            new_shares[shortest][file_name] = file_texts[file_name]
+            lengths[shortest] += len(file_texts[file_name])
+
+        return new_shares
+
+    def _work(connection, file_texts):
+        """
+        The worker process - parse the files and send their subroutines, then translate the files it receives (until it receives None).
+        An error in a file is sent as (file_name, error) instead of stopping the worker silently
+        """
+
+        from lib.front_end_translator.jackTranslator import JackTranslator # Imported here - jackTranslator imports this module
+
+        class_nodes = {}
+
+        try:
+            files_subroutines = {}
+            error = None
+
+            for file_name, file_text in file_texts.items():
+                try:
+                    class_nodes[file_name] = JackTranslator._parse(file_text)
+                    files_subroutines[file_name] = JackTranslatorLibrary.get_file_subroutines(class_nodes[file_name])
+                except Exception as file_error:
+                    error = (file_name, file_error)
+                    break
+
+            connection.send((files_subroutines, error))
+
+            message = connection.recv()
+
+            if message is None:
+                return
+
+            global_scope_subroutines, file_texts, keep_syntax_tree = message
+            translated_files = {}
+            error = None
+
+            for file_name, file_text in file_texts.items():
+                try:
+                    translated_files[file_name] = JackTranslator._translate_file(file_text, global_scope_subroutines, class_nodes.pop(file_name, None),
+                                                                                 keep_syntax_tree)
+                except Exception as file_error:
+                    error = (file_name, file_error)
+                    break
+
+            connection.send((translated_files, error))
+
+        except (EOFError, OSError): # The main process stopped waiting
+            pass
+
+        finally:
+            connection.close()
@@ -9,113 +9,254 @@ import sys
 
 class VirtualMachineTranslator:
     """
-    Main class, capable of processing a full directory, with .vm files resulting in one .asm file
+    Main class, capable of processing a full directory, with .vm files resulting in one .asm file.
+    An instance only holds its configuration, every translation keeps its state to itself, so an instance can be used by many threads at once
     """
 
     BOOTSTRAP_CODE = ["@256", "D=A", "@SP", "M=D"]
+    BUFFER_SIZE = 1 << 16
 
-    def translate(path, keep_disctint_files, add_bootstrap_code):
+    # Optional code generation modes, none of them is used by default:
+    # shared_calls - every call/return jumps to a single shared routine instead of saving/restoring the frame inline (a call site is 10-12 instructions instead of ~45)
+    # shared_comparisons - eq/gt/lt call a shared routine per comparison kind (6 instructions instead of 22), unless they only decide a branch - then they are a compare-and-jump
+    # direct_memory - push/pop address their segment directly, without the R13 round trip (e.g. push constant 5 is 5 instructions instead of 10)
+    # cache_stack_top - the stack top is kept in D within straight-line code (until a label, goto, call, function, return or comparison), so pushes, pops and
+    #                   arithmetic do not write it to the stack and read it back
+    OPTIMIZATIONS = ("shared_calls", "shared_comparisons", "direct_memory", "cache_stack_top")
+    SHARED_ROUTINES = ("$CALL", "$RETURN", "$EQ", "$GT", "$LT") # Emitted once, at the end of the program, if the translated code uses them
+
+    def __init__(self, add_bootstrap_code=True, cache=None, profiler=None, optimizations=()):
+        self.add_bootstrap_code = add_bootstrap_code
+        self.cache = cache # If a BuildCache is given, unchanged .vm files are not translated again
+        self.profiler = profiler # If a CompileProfiler is given, the translation of every file is measured
+        self.optimizations = VirtualMachineTranslator.get_optimizations(optimizations)
+
+    def translate(self, path, keep_disctint_files=False, output_file_name="out.asm", output_directory=None):
         """
-        Translate a path - create out.asm, add? bootstrap code, add? translated Sys.vm, add remaining translated .vm files
+        Translate a path - create the output file (out.asm in the directory of the .vm files by default), add? bootstrap code, add? translated Sys.vm,
+        add remaining translated .vm files. Distinct .asm files are written in the output directory as well
         """
 
-        vm_files = []
+        vm_sources = {}
 
         for root, dirs, files in os.walk(path):
             for file_name in files:
                 if ".vm" in file_name:
-                    vm_files.append(file_name)
+                    with open(os.path.join(root, file_name), "r") as vm_file:
+                        vm_sources[file_name.split(".")[0]] = vm_file.read()
             break
 
-        with open("out.asm", "w") as output_file:
-            if add_bootstrap_code:
-                output_file.write("// bootstrap code \n")
-                for instruction in VirtualMachineTranslator.BOOTSTRAP_CODE:
+        if output_directory is None:
+            output_directory = path
+
+        with open(os.path.join(output_directory, output_file_name), "w", buffering=VirtualMachineTranslator.BUFFER_SIZE) as output_file:
+            VirtualMachineTranslator.translate_program(self, vm_sources, output_file, keep_disctint_files, output_directory)
+
+    def translate_program(self, vm_sources, output_file, keep_disctint_files=False, output_directory="."):
+        """
+        Translate a whole program - {file_name: VM code (text or an iterable of lines)} - writing the assembly into a single output file (anything with a write method),
+        bootstrap code and Sys first, the shared routines used by the optimizations last. If keep_disctint_files, a {file_name}.asm file is written in the output directory for every translated file as well
+        """
+
+        if self.add_bootstrap_code:
+            output_file.write("// bootstrap code \n")
+            for instruction in VirtualMachineTranslator.BOOTSTRAP_CODE:
+                output_file.write(instruction + "\n")
+
+        file_names = sorted(vm_sources, key=lambda file_name: file_name != "Sys") # Stable, so the rest keep their order
+        shared_routines = set()
+
+        for file_name in file_names:
+            asm_code = VirtualMachineTranslator.translate_file(self, file_name, vm_sources[file_name])
+            output_file.write(asm_code)
+
+            if self.optimizations:
+                shared_routines.update(routine_name for routine_name in VirtualMachineTranslator.SHARED_ROUTINES if f"@{routine_name}\n" in asm_code)
+
+            if keep_disctint_files:
+                if self.profiler is None:
+                    VirtualMachineTranslator._write_file(os.path.join(output_directory, file_name + ".asm"), asm_code)
+                else:
+                    with self.profiler.measure("io", file_name):
+                        VirtualMachineTranslator._write_file(os.path.join(output_directory, file_name + ".asm"), asm_code)
+
+        for routine_name in VirtualMachineTranslator.SHARED_ROUTINES: # In a fixed order
+            if routine_name in shared_routines:
+                output_file.write(f"// shared routine {routine_name} \n")
+
+                for instruction in VirtualMachineLibrary.get_shared_routine(routine_name):
                     output_file.write(instruction + "\n")
 
-            if "Sys.vm" in vm_files:
-                VirtualMachineTranslator.translate_file("Sys.vm")
-                sys_file = open("Sys.asm", "r")
-                output_file.write(sys_file.read())
-                vm_files.remove("Sys.vm")
-                if not keep_disctint_files:
-                    os.system("rm Sys.asm")
-
-            for vm_file_name in vm_files:
-                VirtualMachineTranslator.translate_file(vm_file_name)
-                vm_file = open(vm_file_name.split(".")[0] + ".asm", "r")
-                output_file.write(vm_file.read())
-        
-        if not keep_disctint_files:
-            for file_name in vm_files:
-                asm_file_name = file_name.split(".")[0] + ".asm"
-                os.system(f"rm {asm_file_name}")
-
-    def translate_file(input_file_name):
+    def translate_file(self, file_name, vm_code):
+        """
+        Fully translate a file - VM code (text or an iterable of lines), returning the assembly code text. Only text VM code is cached
+        """
+
+        cache = self.cache
+        profiler = self.profiler
+        vm_hash = None
+
+        if cache is not None and isinstance(vm_code, str):
+            vm_hash = cache.get_hash(vm_code)
+
+            if self.optimizations: # The same VM code is translated differently
+                vm_hash += ":" + ",".join(sorted(self.optimizations))
+            asm_code = cache.get_assembly(file_name + ".asm", vm_hash)
+
+            if asm_code is not None:
+                if profiler is not None:
+                    profiler.count(file_name, "cached_vm_files", 1)
+
+                return asm_code
+
+        if isinstance(vm_code, str):
+            vm_code = vm_code.splitlines(keepends=True)
+
+        if profiler is None:
+            asm_code = "".join(VirtualMachineTranslator.translate_instructions(vm_code, file_name, self.optimizations))
+        else:
+            with profiler.measure("vm_translation", file_name):
+                asm_lines = list(VirtualMachineTranslator.translate_instructions(vm_code, file_name, self.optimizations))
+                asm_code = "".join(asm_lines)
+
+            asm_instructions = sum(not line.startswith(("//", "(")) for line in asm_lines)
+            profiler.count(file_name, "vm_lines", len(vm_code))
+            profiler.count(file_name, "asm_instructions", asm_instructions)
+
+        if vm_hash is not None:
+            cache.add_assembly(file_name + ".asm", vm_hash, asm_code)
+
+        return asm_code
+
+    def _write_file(output_file_name, asm_code):
+        """
+        Write the assembly of a single file
         """
-        Fully translate a file
+
+        with open(output_file_name, "w") as asm_file:
+            asm_file.write(asm_code)
+
+    def get_optimizations(optimizations):
         """
+        Return the optimizations (an iterable of names, see OPTIMIZATIONS) as a frozenset, raising ValueError for an unknown one
+        """
+
+        optimizations = frozenset(optimizations)
+
+        for optimization in optimizations:
+            if optimization not in VirtualMachineTranslator.OPTIMIZATIONS:
+                raise ValueError(f"Unknown optimization {optimization}, expected some of {', '.join(VirtualMachineTranslator.OPTIMIZATIONS)}")
 
-        output_file_name = input_file_name.split(".")[0] + ".asm"
-        os.system(f"cp {input_file_name} {output_file_name}")
-        VirtualMachineTranslator.clean(output_file_name)
-        VirtualMachineTranslator.parse_file(output_file_name) 
+        return optimizations
 
-    def parse_file(input_file_name):
+    def translate_instructions(instructions, file_name, optimizations=frozenset()):
         """
-        Parse every instruction and write the requested and further translated equivalent
+        Translate VM instructions (an iterable of lines), yielding the lines of the translated assembly - every instruction is preceded by a comment with its VM line.
+        Unnecessary whitespaces and comments are skipped. The code uses the shared routines of the given optimizations, which have to be emitted with it
         """
 
-        with open(input_file_name, "r+") as input_file:
-            last_function = ""
-            instructions = input_file.readlines()
-            input_file.seek(0)
-            total_instructions = 0
+        shared_calls = "shared_calls" in optimizations
+        shared_comparisons = "shared_comparisons" in optimizations
+        direct_memory = "direct_memory" in optimizations
+        cache_stack_top = "cache_stack_top" in optimizations
+
+        last_function = ""
+        total_instructions = 0
+        stack_top_in_d = False
+
+        vm_lines = list(VirtualMachineTranslator._get_instruction_lines(instructions))
+        line_index = 0
+
+        while line_index < len(vm_lines):
+            line, instruction_structure = vm_lines[line_index]
+            line_index += 1
+
+            instruction = instruction_structure[0]
+            translated_lines = [line]
+
+            bytecode_instruction = None
+            stack_top_flush = []
+
+            if cache_stack_top:
+                bytecode_instruction, stack_top_in_d = VirtualMachineLibrary.get_stack_top_cached(instruction_structure, file_name, last_function, stack_top_in_d)
 
-            for line in instructions: 
-                instruction_structure = line.split()
-                instruction = instruction_structure[0]
+                if bytecode_instruction is None and stack_top_in_d: # Anything else expects the whole stack in memory
+                    stack_top_flush = VirtualMachineLibrary.get_stack_top_flush(True)
+                    stack_top_in_d = False
 
-                bytecode_instruction = []
-                
-                if len(instruction_structure) == 1 and instruction != "return":  # Stack arithmetic
-                    bytecode_instruction = VirtualMachineLibrary.get_arithmetic(instruction, last_function, input_file_name.split(".")[0], total_instructions)
+            if bytecode_instruction is not None:  # Translated with the stack top in D
+                pass
 
-                elif instruction in ["pop", "push"]:  # Memory access
-                    bytecode_instruction = VirtualMachineLibrary.get_memory(line, input_file_name.split(".")[0])
+            elif shared_comparisons and instruction in VirtualMachineLibrary.COMPARISONS and len(instruction_structure) == 1:  # Comparison
+                # A comparison, whose result only decides a branch (if-goto, possibly after not), is inlined as a compare-and-jump - smaller than a call of the shared
+                # routine and without its overhead. Any other comparison calls the shared routine
+                negate = line_index < len(vm_lines) and vm_lines[line_index][1] == ["not"]
+                branch_index = line_index + negate
 
-                elif len(instruction_structure) == 2:  # Program flow
-                    label = instruction_structure[1]
-                    bytecode_instruction = VirtualMachineLibrary.get_program_flow(instruction, label, last_function)
+                if branch_index < len(vm_lines) and vm_lines[branch_index][1][0] == "if-goto" and len(vm_lines[branch_index][1]) == 2:
+                    translated_lines.extend(vm_line for vm_line, _ in vm_lines[line_index:branch_index + 1])
+                    line_index = branch_index + 1
 
-                else:  # Function calling
-                    if instruction == "function":
-                        last_instruction = instruction_structure[1]
+                    label = vm_lines[branch_index][1][1]
+                    bytecode_instruction = VirtualMachineLibrary.get_comparison_branch(instruction, label, last_function, negate, bool(stack_top_flush))
+                    stack_top_flush = [] # The second operand is taken from D
+                else:
+                    bytecode_instruction = VirtualMachineLibrary.get_shared_comparison(instruction, file_name, total_instructions)
 
-                    bytecode_instruction = VirtualMachineLibrary.get_function(instruction_structure, total_instructions, input_file_name.split(".")[0])
+            elif len(instruction_structure) == 1 and instruction != "return":  # Stack arithmetic
+                bytecode_instruction = VirtualMachineLibrary.get_arithmetic(instruction, last_function, file_name, total_instructions)
 
-                input_file.write(f"// {line}")
+            elif instruction in ["pop", "push"] and direct_memory:  # Memory access
+                bytecode_instruction = VirtualMachineLibrary.get_direct_memory(line, file_name)
 
-                for instruction in bytecode_instruction:
-                    total_instructions += 1
-                    input_file.write(instruction + "\n")
+            elif instruction in ["pop", "push"]:  # Memory access
+                bytecode_instruction = VirtualMachineLibrary.get_memory(line, file_name)
 
-            input_file.truncate()
+            elif len(instruction_structure) == 2:  # Program flow
+                label = instruction_structure[1]
+                bytecode_instruction = VirtualMachineLibrary.get_program_flow(instruction, label, last_function)
 
-    def clean(input_file):
+            else:  # Function calling
+                if instruction == "function":
+                    last_instruction = instruction_structure[1]
+
+                bytecode_instruction = VirtualMachineLibrary.get_function(instruction_structure, total_instructions, file_name, shared_calls, direct_memory)
+
+            if stack_top_flush:
+                bytecode_instruction = stack_top_flush + bytecode_instruction
+
+            for translated_line in translated_lines:
+                yield f"// {translated_line}"
+
+            for instruction in bytecode_instruction:
+                total_instructions += 1
+                yield instruction + "\n"
+
+        if stack_top_in_d: # The code falls through to the following file
+            for instruction in VirtualMachineLibrary.get_stack_top_flush(True):
+                yield instruction + "\n"
+
+    def _get_instruction_lines(instructions):
         """
-        Remove unnecesary whitespaces and comments
+        Yield every VM instruction (an iterable of lines) as (line, instruction structure) - the line without comments, ending with a new line, and its words.
+        Unnecessary whitespaces and comments are skipped
         """
 
-        with open(input_file, "r+") as f:
-            lines = f.readlines()
-            f.seek(0)
-            for line in lines:
-                if line != "\n":
-                    if "//" in line:
-                        line_elements = line.lstrip().split("//")
-                        if line_elements[0]:
-                            f.write(line_elements[0].rstrip() + "\n")
-                    else:
-                        f.write(line)
-            f.truncate()
+        for line in instructions:
+            if "//" in line:
+                line = line.lstrip().split("//")[0].rstrip()
+
+                if not line:
+                    continue
+
+                line += "\n"
+
+            elif not line.endswith("\n"):
+                line += "\n"
+
+            instruction_structure = line.split()
+
+            if not instruction_structure:
+                continue
+
+            yield line, instruction_structure
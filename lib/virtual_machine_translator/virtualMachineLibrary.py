@@ -5,6 +5,12 @@ class VirtualMachineLibrary:
     Main class to map the Virtual Machine intermediate language to Hack machine language
     """
 
+    COMPARISONS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+    DIRECT_POP_MAX_STEPS = 3 # Pops into local/argument/this/that entries up to this index walk A up from the segment pointer, the rest compute the address
+    NEGATED_JUMPS = {"JEQ": "JNE", "JGT": "JLE", "JLT": "JGE"}
+    BINARY_OPERATIONS = {"add": "+", "sub": "-", "and": "&", "or": "|"}
+    UNARY_OPERATIONS = {"neg": "-", "not": "!"}
+
     def _get_primary(operation, a=None, b=None, treat_a_as_pointer=True, treat_b_as_pointer=True):
         """
         Define primary operations, which are going to be main building "blocks" of higher instructions
@@ -13,6 +19,8 @@ class VirtualMachineLibrary:
         bytecode_dictionary = {
             "sp++": ["@SP", "M=M+1"],
             "sp--": ["@SP", "M=M-1"],
+            "*sp++=d": ["@SP", "AM=M+1", "A=A-1", "M=D"],
+            "d=*--sp": ["@SP", "AM=M-1", "D=M"],
         }
 
         if operation == "*a=*b":
@@ -100,6 +108,36 @@ class VirtualMachineLibrary:
 
         return final_bytecode
 
+    def get_shared_comparison(instruction, file_name, total_instructions):
+        """
+        Returns bytecode, which compares the two topmost stack values (eq, gt or lt) with the shared comparison routine - R15 holds the return address
+        """
+
+        return_label = ":".join([file_name, instruction.upper(), str(total_instructions), "RETURN"])
+
+        return [f"@{return_label}", "D=A", "@R15", "M=D", f"@${instruction.upper()}", "0;JMP", f"({return_label})"]
+
+    def get_comparison_branch(instruction, label, function_block, negate=False, stack_top_in_d=False):
+        """
+        Returns bytecode, which pops the two topmost stack values and jumps to the label if they compare (eq, gt or lt) - if they do not, if negate.
+        The same as the comparison, followed by if-goto label (or by not and if-goto label), without pushing the result. The topmost value may be in D
+        (see get_stack_top_cached)
+        """
+
+        jump = VirtualMachineLibrary.COMPARISONS[instruction]
+
+        if negate:
+            jump = VirtualMachineLibrary.NEGATED_JUMPS[jump]
+
+        if stack_top_in_d:
+            bytecode = ["@SP", "AM=M-1", "D=M-D"] # D = x - y
+        else:
+            bytecode = ["@SP", "AM=M-1", "D=M", "A=A-1", "D=M-D"] # D = x - y
+            bytecode.extend(VirtualMachineLibrary._get_primary("sp--"))
+        bytecode.extend([f"@{function_block}{('$' if function_block else '')}{label}", f"D;{jump}"])
+
+        return bytecode
+
     def get_memory(instruction, file_name):
         """
         Returns the full memory access bytecode, which consists of:
@@ -132,6 +170,133 @@ class VirtualMachineLibrary:
 
             return calculated_address_bytecode + decrement_sp + save_stack_into_R13
 
+    def get_direct_memory(instruction, file_name):
+        """
+        Returns memory access bytecode, which addresses the segment directly, without calculating the address in R13:
+        push | load the value into D (constants and fixed addresses - temp, static, pointer - with a single A-instruction), then push D
+        pop  | pop into D and store it at the fixed address, or through the segment pointer - walking A up for small indexes,
+               or computing the address into D and recovering it as (address + value) - value for the rest
+        """
+
+        instruction_type, segment, index = instruction.split()
+
+        if instruction_type == "push":
+            if segment == "constant" and index in ("0", "1"):
+                return ["@SP", "AM=M+1", "A=A-1", f"M={index}"]
+
+            return VirtualMachineLibrary._get_direct_load(segment, index, file_name) + VirtualMachineLibrary._get_primary("*sp++=d")
+
+        store_bytecode = VirtualMachineLibrary._get_direct_store(segment, index, file_name)
+
+        if store_bytecode is not None:
+            return VirtualMachineLibrary._get_primary("d=*--sp") + store_bytecode
+
+        # D = address, D = address + value, A = (address + value) - value, *A = (address + value) - address
+        return [f"@{VirtualMachineLibrary._get_symbolic_symbol(segment)}", "D=M", f"@{index}", "D=D+A", "@SP", "AM=M-1", "D=D+M", "A=D-M", "M=D-A"]
+
+    def get_stack_top_cached(instruction_structure, file_name, function_block, stack_top_in_d):
+        """
+        Returns (bytecode, whether the stack top is in D afterwards) of an instruction, translated with the stack top kept in the D register - if it is in D,
+        the stack in memory holds everything below it (SP is not incremented for it). Values are loaded into D instead of being pushed, binary operations take
+        their second operand from D and leave the result in D, and if-goto tests D directly. Returns (None, stack_top_in_d) for any other instruction -
+        it has to be translated with the stack top in memory (see get_stack_top_flush)
+        """
+
+        instruction = instruction_structure[0]
+        load_stack_top = [] if stack_top_in_d else VirtualMachineLibrary._get_primary("d=*--sp")
+
+        if instruction == "push":
+            segment, index = instruction_structure[1:]
+
+            bytecode = VirtualMachineLibrary.get_stack_top_flush(stack_top_in_d)
+
+            if segment == "constant" and index in ("0", "1"):
+                bytecode.append(f"D={index}")
+            else:
+                bytecode.extend(VirtualMachineLibrary._get_direct_load(segment, index, file_name))
+
+            return bytecode, True
+
+        if instruction == "pop":
+            segment, index = instruction_structure[1:]
+            store_bytecode = VirtualMachineLibrary._get_direct_store(segment, index, file_name)
+
+            if not stack_top_in_d:
+                return VirtualMachineLibrary.get_direct_memory(" ".join(instruction_structure), file_name), False
+
+            if store_bytecode is not None: # Straight from D
+                return store_bytecode, False
+
+            # *SP = value (just above the stack), then the same as a direct pop
+            return ["@SP", "A=M", "M=D", f"@{VirtualMachineLibrary._get_symbolic_symbol(segment)}", "D=M", f"@{index}", "D=D+A",
+                    "@SP", "A=M", "D=D+M", "A=D-M", "M=D-A"], False
+
+        if instruction in VirtualMachineLibrary.BINARY_OPERATIONS:
+            return load_stack_top + ["@SP", "AM=M-1", f"D=M{VirtualMachineLibrary.BINARY_OPERATIONS[instruction]}D"], True
+
+        if instruction in VirtualMachineLibrary.UNARY_OPERATIONS:
+            if stack_top_in_d:
+                return [f"D={VirtualMachineLibrary.UNARY_OPERATIONS[instruction]}D"], True
+
+            return ["@SP", "AM=M-1", f"D={VirtualMachineLibrary.UNARY_OPERATIONS[instruction]}M"], True
+
+        if instruction == "if-goto" and len(instruction_structure) == 2:
+            return load_stack_top + [f"@{function_block}{('$' if function_block else '')}{instruction_structure[1]}", "D;JNE"], False
+
+        return None, stack_top_in_d
+
+    def get_stack_top_flush(stack_top_in_d):
+        """
+        Returns bytecode, which pushes the stack top from D into memory, if it is in D
+        """
+
+        return VirtualMachineLibrary._get_primary("*sp++=d") if stack_top_in_d else []
+
+    def _get_direct_load(segment, index, file_name):
+        """
+        Returns bytecode, which loads a segment entry into D
+        """
+
+        if segment == "constant":
+            return [f"@{index}", "D=A"]
+
+        if segment in ("temp", "static", "pointer"):
+            return [f"@{VirtualMachineLibrary._get_direct_address(segment, index, file_name)}", "D=M"]
+
+        if index in ("0", "1"):
+            return [f"@{VirtualMachineLibrary._get_symbolic_symbol(segment)}", "A=M" if index == "0" else "A=M+1", "D=M"]
+
+        return [f"@{VirtualMachineLibrary._get_symbolic_symbol(segment)}", "D=M", f"@{index}", "A=D+A", "D=M"]
+
+    def _get_direct_store(segment, index, file_name):
+        """
+        Returns bytecode, which stores D into a segment entry, None if its address has to be computed (a large index of local, argument, this or that)
+        """
+
+        if segment in ("temp", "static", "pointer"):
+            return [f"@{VirtualMachineLibrary._get_direct_address(segment, index, file_name)}", "M=D"]
+
+        if int(index) > VirtualMachineLibrary.DIRECT_POP_MAX_STEPS:
+            return None
+
+        store_bytecode = [f"@{VirtualMachineLibrary._get_symbolic_symbol(segment)}", "A=M" if index == "0" else "A=M+1"]
+        store_bytecode.extend(["A=A+1"] * (int(index) - 1))
+
+        return store_bytecode + ["M=D"]
+
+    def _get_direct_address(segment, index, file_name):
+        """
+        Returns the symbol/address of a temp, static or pointer segment entry
+        """
+
+        if segment == "temp": # Temp starts at 5
+            return str(int(index) + 5)
+
+        if segment == "static":
+            return file_name + "." + index
+
+        return "THIS" if index == "0" else "THAT"
+
     def _get_address_calculation(segment, index, file_name):
         """
         Returns bytecode that loads address calculation (segment base address + index) in R13
@@ -202,12 +367,14 @@ class VirtualMachineLibrary:
 
         return bytecode
 
-    def get_function(instruction_structure, total_instructions, file_name):
+    def get_function(instruction_structure, total_instructions, file_name, shared_calls=False, direct_memory=False):
         """
         Returns full function instruction bytecode
         function function_name lVars
         call function_name nArgs
         return
+        If shared_calls, call and return jump to the shared $CALL and $RETURN routines (see get_shared_routine) instead of saving/restoring the frame inline.
+        If direct_memory, the local variables are initialized with get_direct_memory
         """
 
         state = ["LCL", "ARG", "THIS", "THAT"]
@@ -223,7 +390,24 @@ class VirtualMachineLibrary:
             bytecode.extend([f"({function_name})"])
 
             for _ in range(vars_count):
-                bytecode.extend(VirtualMachineLibrary.get_memory("push constant 0", file_name)) 
+                if direct_memory:
+                    bytecode.extend(VirtualMachineLibrary.get_direct_memory("push constant 0", file_name))
+                else:
+                    bytecode.extend(VirtualMachineLibrary.get_memory("push constant 0", file_name))
+
+        elif instruction == "call" and shared_calls:
+            function_name = instruction_structure[1]
+            args_count = instruction_structure[2]
+
+            return_label = ":".join([file_name, function_name, str(total_instructions), "RETURN"])
+
+            # R13 = nArgs, R14 = function address, D = return address
+            bytecode = ["@R13", f"M={args_count}"] if args_count in ("0", "1") else [f"@{args_count}", "D=A", "@R13", "M=D"]
+            bytecode.extend([f"@{function_name}", "D=A", "@R14", "M=D"])
+            bytecode.extend([f"@{return_label}", "D=A", "@$CALL", "0;JMP"])
+
+            # Set return label
+            bytecode.extend([f"({return_label})"])
 
         elif instruction == "call": 
             function_name = instruction_structure[1]
@@ -258,6 +442,9 @@ class VirtualMachineLibrary:
 
             bytecode = bytecode
 
+        elif shared_calls:
+            bytecode = ["@$RETURN", "0;JMP"]
+
         else:
             bytecode = []
 
@@ -282,3 +469,52 @@ class VirtualMachineLibrary:
             bytecode.extend(["@R14", "A=M", "0;JMP"])
         
         return bytecode
+
+    def get_shared_routine(routine_name):
+        """
+        Returns the bytecode of a routine, which is shared by the whole program (emitted once, at its end):
+        $CALL   | push D (the return address), push LCL, ARG, THIS, THAT, set ARG to SP - 5 - R13 (nArgs) and LCL to SP, jump to R14 (the function)
+        $RETURN | return from the current function - the same frame restore as an inline return, walking LCL down the saved frame
+        $EQ, $GT, $LT | replace the two topmost stack values x, y with -1 (true), if x - y is = 0, > 0, < 0 respectively, 0 (false) otherwise, jump to R15
+        """
+
+        if routine_name == "$CALL":
+            bytecode = ["($CALL)", "@SP", "A=M", "M=D"] # Push return address
+
+            # Save state
+            for address in ["LCL", "ARG", "THIS", "THAT"]:
+                bytecode.extend([f"@{address}", "D=M", "@SP", "AM=M+1", "M=D"])
+
+            # SP++, LCL = SP, ARG = SP - nArgs - 5, jump to the function
+            bytecode.extend(["@SP", "MD=M+1", "@LCL", "M=D", "@R13", "D=D-M", "@5", "D=D-A", "@ARG", "M=D", "@R14", "A=M", "0;JMP"])
+
+        elif routine_name == "$RETURN":
+            bytecode = ["($RETURN)"]
+
+            # Set R14 to return address (*(LCL - 5))
+            bytecode.extend(["@5", "D=A", "@LCL", "A=M-D", "D=M", "@R14", "M=D"])
+
+            # Set first callee"s argument to be return value and reposition SP to be after it
+            bytecode.extend(["@SP", "AM=M-1", "D=M", "@ARG", "A=M", "M=D", "@ARG", "D=M+1", "@SP", "M=D"])
+
+            # Restore registers - LCL itself is restored last
+            for address in ["THAT", "THIS", "ARG"]:
+                bytecode.extend(["@LCL", "AM=M-1", "D=M", f"@{address}", "M=D"])
+
+            bytecode.extend(["@LCL", "A=M-1", "D=M", "@LCL", "M=D"])
+
+            # Return jump
+            bytecode.extend(["@R14", "A=M", "0;JMP"])
+
+        elif routine_name[1:].lower() in VirtualMachineLibrary.COMPARISONS:
+            end_label = f"{routine_name}$END"
+            jump = VirtualMachineLibrary.COMPARISONS[routine_name[1:].lower()]
+
+            bytecode = [f"({routine_name})", "@SP", "AM=M-1", "D=M", "A=A-1", "D=M-D", "M=-1"] # D = x - y, *x = -1 (true)
+            bytecode.extend([f"@{end_label}", f"D;{jump}", "@SP", "A=M-1", "M=0"]) # *x = 0 (false), unless they compare
+            bytecode.extend([f"({end_label})", "@R15", "A=M", "0;JMP"])
+
+        else:
+            raise ValueError(f"Unknown shared routine {routine_name}")
+
+        return bytecode
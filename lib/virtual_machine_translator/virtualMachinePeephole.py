@@ -0,0 +1,106 @@
+# A pattern based peephole optimizer of VM code, run between the code generation and the VM translation. @DimitarYordanov17
+
+import threading
+
+
+class VirtualMachinePeephole:
+    """
+    Main class, rewriting redundant VM command sequences. Every rule of RULES replaces a window of consecutive commands with an equivalent, shorter one -
+    {name} in a pattern matches a single word, which has to be the same everywhere in the rule. The rules are matched at the end of the already optimized
+    commands after every command, so the result of a rule is matched again (e.g. push constant 1, neg, not -> push constant 0, not, not -> push constant 0).
+    Commands after goto/return, up to the next label/function, are unreachable and removed as well.
+
+    Every instance counts the hits of every rule (hits - {rule name: count}), over all of its optimizations. An instance can be used by many threads at once
+    """
+
+    RULES = (
+        ("true", ("push constant 1", "neg"), ("push constant 0", "not")), # -1 - lets the following rules see true as ~false
+        ("double_not", ("not", "not"), ()),
+        ("double_neg", ("neg", "neg"), ()),
+        ("add_zero", ("push constant 0", "add"), ()),
+        ("sub_zero", ("push constant 0", "sub"), ()),
+        ("or_zero", ("push constant 0", "or"), ()),
+        ("branch_always", ("push constant 0", "not", "if-goto {label}"), ("goto {label}",)),
+        ("branch_never", ("push constant 0", "if-goto {label}"), ()),
+        ("push_pop", ("push {segment} {index}", "pop {segment} {index}"), ()),
+        ("goto_next", ("goto {label}", "label {label}"), ("label {label}",)),
+    )
+
+    UNREACHABLE = "unreachable"
+
+    # (name, pattern as lists of words, replacement) - parsed once
+    _PARSED_RULES = tuple((name, tuple(command.split() for command in pattern), replacement) for name, pattern, replacement in RULES)
+
+    def __init__(self):
+        self.hits = dict.fromkeys([name for name, _, _ in VirtualMachinePeephole.RULES] + [VirtualMachinePeephole.UNREACHABLE], 0)
+        self.lock = threading.Lock()
+
+    def optimize(self, vm_code):
+        """
+        Optimize VM code (text), returning the optimized VM code and the hits of this optimization - {rule name: count} (only the rules, which hit)
+        """
+
+        optimized_commands = []
+        hits = {}
+
+        for line in vm_code.splitlines():
+            command = line.split("//")[0].split()
+
+            if not command:
+                continue
+
+            if optimized_commands and optimized_commands[-1][0] in ("goto", "return") and command[0] not in ("label", "function"):
+                hits[VirtualMachinePeephole.UNREACHABLE] = hits.get(VirtualMachinePeephole.UNREACHABLE, 0) + 1
+                continue
+
+            optimized_commands.append(command)
+            VirtualMachinePeephole._apply_rules(optimized_commands, hits)
+
+        with self.lock:
+            for name, count in hits.items():
+                self.hits[name] += count
+
+        return "".join(" ".join(command) + "\n" for command in optimized_commands), hits
+
+    def _apply_rules(commands, hits):
+        """
+        Rewrite the end of the commands (lists of words) with the first matching rule, as long as any rule matches
+        """
+
+        matched = True
+
+        while matched:
+            matched = False
+
+            for name, pattern, replacement in VirtualMachinePeephole._PARSED_RULES:
+                if len(commands) < len(pattern):
+                    continue
+
+                variables = VirtualMachinePeephole._match(commands[len(commands) - len(pattern):], pattern)
+
+                if variables is not None:
+                    commands[len(commands) - len(pattern):] = [command.format(**variables).split() for command in replacement]
+                    hits[name] = hits.get(name, 0) + 1
+                    matched = True
+                    break
+
+    def _match(commands, pattern):
+        """
+        Return the values of the pattern variables - {name: word}, if the commands match the pattern, None otherwise
+        """
+
+        variables = {}
+
+        for command, pattern_command in zip(commands, pattern):
+            if len(command) != len(pattern_command):
+                return None
+
+            for word, pattern_word in zip(command, pattern_command):
+                if pattern_word[0] == "{":
+                    if variables.setdefault(pattern_word[1:-1], word) != word:
+                        return None
+
+                elif word != pattern_word:
+                    return None
+
+        return variables
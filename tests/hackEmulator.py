@@ -0,0 +1,101 @@
+# A minimal Hack CPU emulator, running compiled programs in the tests. @DimitarYordanov17
+
+
+class HackEmulator:
+    """
+    Main class, running machine code words (no screen or keyboard - the RAM is plain memory) until the program writes STOP_VALUE to STOP_ADDRESS,
+    runs into an endless jump to itself, runs out of the ROM or exceeds the maximum number of steps
+    """
+
+    RAM_SIZE = 1 << 15
+
+    STOP_ADDRESS = 7999
+    STOP_VALUE = 12345
+
+    # The computation of every comp field (the a bit included) as a function of D, A and M
+    COMPUTATIONS = {
+        0b0101010: lambda d, a, m: 0,
+        0b0111111: lambda d, a, m: 1,
+        0b0111010: lambda d, a, m: -1,
+        0b0001100: lambda d, a, m: d,
+        0b0110000: lambda d, a, m: a,
+        0b1110000: lambda d, a, m: m,
+        0b0001101: lambda d, a, m: ~d,
+        0b0110001: lambda d, a, m: ~a,
+        0b1110001: lambda d, a, m: ~m,
+        0b0001111: lambda d, a, m: -d,
+        0b0110011: lambda d, a, m: -a,
+        0b1110011: lambda d, a, m: -m,
+        0b0011111: lambda d, a, m: d + 1,
+        0b0110111: lambda d, a, m: a + 1,
+        0b1110111: lambda d, a, m: m + 1,
+        0b0001110: lambda d, a, m: d - 1,
+        0b0110010: lambda d, a, m: a - 1,
+        0b1110010: lambda d, a, m: m - 1,
+        0b0000010: lambda d, a, m: d + a,
+        0b1000010: lambda d, a, m: d + m,
+        0b0010011: lambda d, a, m: d - a,
+        0b1010011: lambda d, a, m: d - m,
+        0b0000111: lambda d, a, m: a - d,
+        0b1000111: lambda d, a, m: m - d,
+        0b0000000: lambda d, a, m: d & a,
+        0b1000000: lambda d, a, m: d & m,
+        0b0010101: lambda d, a, m: d | a,
+        0b1010101: lambda d, a, m: d | m,
+    }
+
+    def run(words, max_steps=10_000_000):
+        """
+        Run the program, returning the RAM (signed 16 bit values), the number of executed instructions and whether the program stopped (False if it
+        exceeded the maximum number of steps)
+        """
+
+        program = []
+
+        for word in words:
+            if word & 0x8000: # C-instruction - (computation, dest bits, jump bits)
+                program.append((HackEmulator.COMPUTATIONS[(word >> 6) & 0x7F], (word >> 3) & 7, word & 7))
+            else:
+                program.append(word)
+
+        ram = [0] * HackEmulator.RAM_SIZE
+        a = d = pc = steps = 0
+
+        while steps < max_steps:
+            if pc >= len(program):
+                return ram, steps, True
+
+            instruction = program[pc]
+            steps += 1
+
+            if isinstance(instruction, int):
+                a = instruction
+                pc += 1
+                continue
+
+            computation, dest, jump = instruction
+            address = a & 0x7FFF
+            out = computation(d, a, ram[address]) & 0xFFFF
+            out = out - 0x10000 if out & 0x8000 else out
+
+            if dest & 1:
+                ram[address] = out
+
+                if address == HackEmulator.STOP_ADDRESS and out == HackEmulator.STOP_VALUE:
+                    return ram, steps, True
+
+            if dest & 2:
+                d = out
+
+            if dest & 4:
+                a = out
+
+            if (jump & 4 and out < 0) or (jump & 2 and out == 0) or (jump & 1 and out > 0):
+                if address == pc - 1 and program[pc - 1] == address: # @LOOP, 0;JMP at LOOP - the program ended
+                    return ram, steps, True
+
+                pc = address
+            else:
+                pc += 1
+
+        return ram, steps, False
@@ -0,0 +1,107 @@
+# Regression tests of the code generation modes - every combination has to compute exactly what the default translation computes. @DimitarYordanov17
+
+# To run: python3 -m unittest discover tests (or python3 -m pytest tests) from the repository directory
+
+from hackEmulator import HackEmulator
+from lib.build_system.jackCompiler import JackCompiler
+from lib.virtual_machine_translator.virtualMachine import VirtualMachineTranslator
+from lib.virtual_machine_translator.virtualMachinePeephole import VirtualMachinePeephole
+import itertools
+import os
+import unittest
+
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "code-generation-modes", "source")
+
+# What the program in code-generation-modes/source writes, in order, from address 8000 (Main.put) and from 8100 (the handwritten Sys.vm)
+EXPECTED_RESULTS = [34, 21, 197, -5, -4, -3, -2, -1, 0, 1, 2, 3, 4, 5, 6, 0, -1, 0, -1, 0, 0, -1, -1, -32768, -32768, 32767, 12, 1496, 10, -1, 7, 2, 17,
+                    11, -3, 1, 4, 145, 38]
+EXPECTED_SYS_RESULTS = [0, 3, 0]
+
+
+class CodeGenerationModesTest(unittest.TestCase):
+    """
+    Compiles the test program with every combination of VirtualMachineTranslator.OPTIMIZATIONS and the peephole optimizer, runs it in the HackEmulator
+    and compares the memory it wrote with the expected results
+    """
+
+    def setUpClass():
+        CodeGenerationModesTest.jack_sources = {}
+        CodeGenerationModesTest.vm_sources = {}
+
+        for file_name in sorted(os.listdir(SOURCE_DIRECTORY)):
+            with open(os.path.join(SOURCE_DIRECTORY, file_name), 'r') as source_file:
+                if file_name.endswith(".jack"):
+                    CodeGenerationModesTest.jack_sources[file_name] = source_file.read()
+                elif file_name.endswith(".vm"):
+                    CodeGenerationModesTest.vm_sources[file_name] = source_file.read()
+
+    def run_program(self, optimizations, peephole):
+        """
+        Compile and run the test program, returning the compile result and the RAM
+        """
+
+        compile_result = JackCompiler.compile_sources(CodeGenerationModesTest.jack_sources, CodeGenerationModesTest.vm_sources, optimizations=optimizations,
+                                                      peephole=peephole)
+        ram, steps, stopped = HackEmulator.run(compile_result.words)
+
+        self.assertTrue(stopped, f"The program did not stop within {steps} steps")
+
+        return compile_result, ram
+
+    def test_every_combination(self):
+        default_size = None
+
+        for peephole in (False, True):
+            for count in range(len(VirtualMachineTranslator.OPTIMIZATIONS) + 1):
+                for optimizations in itertools.combinations(VirtualMachineTranslator.OPTIMIZATIONS, count):
+                    with self.subTest(optimizations=optimizations, peephole=peephole):
+                        compile_result, ram = CodeGenerationModesTest.run_program(self, optimizations, peephole)
+
+                        self.assertEqual(ram[8000:8000 + len(EXPECTED_RESULTS)], EXPECTED_RESULTS)
+                        self.assertEqual(ram[8100:8100 + len(EXPECTED_SYS_RESULTS)], EXPECTED_SYS_RESULTS)
+
+                        if default_size is None:
+                            default_size = len(compile_result.words)
+                        else: # Every mode makes the program smaller
+                            self.assertLess(len(compile_result.words), default_size)
+
+    def test_peephole_hits(self):
+        compile_result, _ = CodeGenerationModesTest.run_program(self, (), True)
+
+        self.assertEqual(set(compile_result.peephole_hits), {rule_name for rule_name, _, _ in VirtualMachinePeephole.RULES} | {VirtualMachinePeephole.UNREACHABLE})
+        self.assertGreater(compile_result.peephole_hits["double_not"], 0)
+        self.assertGreater(compile_result.peephole_hits["branch_never"], 0) # while (true)
+
+
+class VirtualMachinePeepholeTest(unittest.TestCase):
+    """
+    Checks the rules, which the compiled Jack code of the test program does not hit
+    """
+
+    def assertOptimized(self, vm_code, expected_vm_code, expected_hits):
+        optimized_vm_code, hits = VirtualMachinePeephole().optimize(vm_code)
+
+        self.assertEqual(optimized_vm_code, expected_vm_code)
+        self.assertEqual(hits, expected_hits)
+
+    def test_true_not(self):
+        VirtualMachinePeepholeTest.assertOptimized(self, "push constant 1\nneg\nnot\npop local 0\n", "push constant 0\npop local 0\n", {"true": 1, "double_not": 1})
+
+    def test_branch_always(self):
+        VirtualMachinePeepholeTest.assertOptimized(self, "push constant 1\nneg\nif-goto L\npush local 0\nlabel L\n", "label L\n",
+                                                   {"true": 1, "branch_always": 1, "unreachable": 1, "goto_next": 1})
+
+    def test_goto_next(self):
+        VirtualMachinePeepholeTest.assertOptimized(self, "label L\ngoto M\nlabel M\nreturn\n", "label L\nlabel M\nreturn\n", {"goto_next": 1})
+
+    def test_push_pop(self):
+        VirtualMachinePeepholeTest.assertOptimized(self, "push that 0\npop that 0\npush this 1\npop that 1\n", "push this 1\npop that 1\n", {"push_pop": 1})
+
+    def test_unreachable(self):
+        VirtualMachinePeepholeTest.assertOptimized(self, "function A.f 0\npush constant 0\nreturn\npush constant 1\nreturn\nfunction A.g 0\n",
+                                                   "function A.f 0\npush constant 0\nreturn\nfunction A.g 0\n", {"unreachable": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()